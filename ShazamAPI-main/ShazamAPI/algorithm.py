@@ -36,7 +36,11 @@ class SignatureGenerator(object):
         # Used when storing input that will be processed when requiring to
         # generate a signature:
         self.input_pending_processing: List[int] = []  # Signed 16-bits, 16 KHz mono samples to be processed
-        self.samples_processed: int = 0  # Number of samples processed out of "self.input_pending_processing"
+        # Number of samples processed since the start of the input:
+        self.samples_processed: int = 0
+        # Absolute sample index of input_pending_processing[0]; processed input
+        # is discarded so that memory stays constant while streaming:
+        self.input_offset: int = 0
 
         # Used when processing input:
         self.ring_buffer_of_samples: RingBuffer[int] = RingBuffer(buffer_size=2048, default_value=0)
@@ -51,6 +55,9 @@ class SignatureGenerator(object):
         self.MAX_TIME_SECONDS = 3.1
         self.MAX_PEAKS = 255
 
+        # Drop consumed input once this many samples are behind us:
+        self.DISCARD_THRESHOLD = 16000 * 10
+
         # The object that will hold information about the next fingerpring to
         # be produced:
         self.next_signature = DecodedMessage()
@@ -76,7 +83,40 @@ class SignatureGenerator(object):
         """
         self.input_pending_processing += s16le_mono_samples
 
-    def get_next_signature(self) -> Optional[DecodedMessage]:
+    def pending_samples(self) -> int:
+        """
+        Number of fed samples that haven't been processed yet.
+        """
+        processed = self.samples_processed - self.input_offset
+        return len(self.input_pending_processing) - processed
+
+    def discard_processed_input(self, threshold: int = 0):
+        """
+        Forget input that was already processed (or skipped over), once at
+        least `threshold` samples of it have accumulated.
+        """
+        consumed = min(
+            self.samples_processed - self.input_offset,
+            len(self.input_pending_processing),
+        )
+        if consumed > 0 and consumed >= threshold:
+            del self.input_pending_processing[:consumed]
+            self.input_offset += consumed
+
+    def _signature_complete(self) -> bool:
+        signature = self.next_signature
+        seconds = signature.number_samples / signature.sample_rate_hz
+        if seconds < self.MAX_TIME_SECONDS:
+            return False
+        peaks = sum(
+            len(band_peaks)
+            for band_peaks in signature.frequency_band_to_sound_peaks.values()
+        )
+        return peaks >= self.MAX_PEAKS
+
+    def get_next_signature(
+        self, flush: bool = True,
+    ) -> Optional[DecodedMessage]:
         """
         Consume some of the samples fed to self.feed_input(), and return a
         Shazam signature (DecodedMessage object) to be sent to servers once
@@ -84,22 +124,26 @@ class SignatureGenerator(object):
 
         Except if there are no more samples to be consumed, in this case we
         will return None.
+
+        With flush=False (streaming), a signature is only returned once it is
+        complete; if the fed input runs out before that, the partial state is
+        kept, None is returned and processing resumes on the next call after
+        more input has been fed.
         """
-        if len(self.input_pending_processing) - self.samples_processed < 128:
+        pending = self.pending_samples()
+        if pending < 128 and not self.next_signature.number_samples:
             return None
 
-        while (
-            len(self.input_pending_processing) - self.samples_processed >= 128
-            and (
-                self.next_signature.number_samples / self.next_signature.sample_rate_hz < self.MAX_TIME_SECONDS
-                or sum(
-                    len(peaks) for peaks in self.next_signature.frequency_band_to_sound_peaks.values()
-                ) < self.MAX_PEAKS
-            )
-        ):
-            self.process_input(self.input_pending_processing[self.samples_processed:self.samples_processed + 128])
+        while self.pending_samples() >= 128 and not self._signature_complete():
+            start = self.samples_processed - self.input_offset
+            self.process_input(self.input_pending_processing[start:start + 128])
             self.samples_processed += 128
 
+        self.discard_processed_input(self.DISCARD_THRESHOLD)
+
+        if not flush and not self._signature_complete():
+            return None
+
         returned_signature = self.next_signature
 
         self.next_signature = DecodedMessage()
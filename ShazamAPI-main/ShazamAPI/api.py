@@ -1,8 +1,21 @@
+import array
+import os
+import shutil
+import subprocess
+import threading
 import time
 import types
 import uuid
 from io import BytesIO
-from typing import BinaryIO, Generator, Tuple, Union
+from typing import (
+    BinaryIO,
+    Callable,
+    Generator,
+    Iterator,
+    Optional,
+    Tuple,
+    Union,
+)
 
 try:
     from typing import Final  # noqa: WPS433
@@ -14,6 +27,7 @@ from pydub import AudioSegment
 
 from .algorithm import SignatureGenerator
 from .signature_format import DecodedMessage
+from .strategy import RecognitionStrategy
 
 LANG: Final = 'ru'
 REGION: Final = 'RU'
@@ -75,6 +89,93 @@ NORMALIZED_SAMPLE_WIDTH: Final = 2
 NORMALIZED_FRAME_RATE: Final = 16000
 NORMALIZED_CHANNELS: Final = 1
 
+# Streaming decode: ffmpeg resamples/downmixes to 16 kHz mono s16le and the
+# PCM is fed to the signature generator one block at a time.
+STREAM_BLOCK_SECONDS: Final = 1
+
+
+def _ffmpeg_available() -> bool:
+    return shutil.which('ffmpeg') is not None
+
+
+def probe_duration(path: str) -> Optional[float]:
+    """Duration of a media file in seconds (ffprobe), or None if unknown."""
+    try:
+        completed = subprocess.run(
+            [
+                'ffprobe', '-v', 'error', '-show_entries', 'format=duration',
+                '-of', 'default=noprint_wrappers=1:nokey=1', path,
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        return float(completed.stdout.decode().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _apply_skip(
+    signature_generator: SignatureGenerator,
+    skip_after: Optional[Callable[[], float]],
+):
+    if skip_after is None:
+        return
+    skip = skip_after()
+    if skip > 0:
+        skip_samples = int(skip * NORMALIZED_FRAME_RATE)
+        signature_generator.samples_processed += skip_samples
+        signature_generator.discard_processed_input()
+
+
+def iter_normalized_pcm(
+    path: str, block_seconds: float = STREAM_BLOCK_SECONDS,
+) -> Iterator[array.array]:
+    """
+    Decode a media file with ffmpeg to 16 kHz mono signed 16-bit samples and
+    yield them in blocks of block_seconds (the last block may be shorter).
+    Only one block is held in memory at a time.
+    """
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-i', path,
+        '-vn',
+        '-f', 's16le', '-acodec', 'pcm_s16le',
+        '-ac', str(NORMALIZED_CHANNELS), '-ar', str(NORMALIZED_FRAME_RATE),
+        'pipe:1',
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr_tail = []
+
+    def drain_stderr():
+        for line in proc.stderr:
+            stderr_tail.append(line)
+            del stderr_tail[:-20]
+
+    drainer = threading.Thread(target=drain_stderr, daemon=True)
+    drainer.start()
+
+    block_samples = int(block_seconds * NORMALIZED_FRAME_RATE)
+    block_bytes = block_samples * NORMALIZED_SAMPLE_WIDTH
+    finished = False
+    try:
+        while True:
+            data = proc.stdout.read(block_bytes)
+            if not data:
+                break
+            whole = len(data) - len(data) % NORMALIZED_SAMPLE_WIDTH
+            yield array.array('h', data[:whole])
+        finished = True
+    finally:
+        if not finished:
+            proc.kill()
+        proc.stdout.close()
+        returncode = proc.wait()
+        drainer.join()
+
+    if returncode != 0:
+        message = b''.join(stderr_tail).decode('utf-8', errors='ignore')
+        raise RuntimeError(message or f'ffmpeg exited with {returncode}')
+
 
 class Shazam(object):
     max_time_seconds = 8
@@ -90,17 +191,78 @@ class Shazam(object):
         self.timezone = timezone
 
     def recognize_song(
-        self, audio: Union[bytes, BinaryIO, AudioSegment],
+        self,
+        audio: Union[str, bytes, BinaryIO, AudioSegment],
+        strategy: Optional[RecognitionStrategy] = None,
     ) -> Generator[Tuple[float, dict], None, None]:
+        """
+        Send the signatures of the audio and yield (offset, response).
+        With a strategy, signatures inside an already confirmed track are
+        skipped instead of being sent (see strategy.RecognitionStrategy).
+        """
+        skip_after = strategy.skip_seconds if strategy is not None else None
+        signatures = self.iter_signatures(audio, skip_after=skip_after)
+        for current_offset, signature in signatures:
+            results = self.send_recognize_request(signature)
+            if strategy is not None:
+                seconds = signature.number_samples / signature.sample_rate_hz
+                strategy.observe(
+                    current_offset, results, signature_seconds=seconds,
+                )
+            yield current_offset, results
+
+    def iter_signatures(
+        self,
+        audio: Union[str, bytes, BinaryIO, AudioSegment],
+        skip_after: Optional[Callable[[], float]] = None,
+    ) -> Generator[Tuple[int, DecodedMessage], None, None]:
+        """
+        Yield (offset_seconds, signature) for the audio. File paths are
+        decoded and resampled by ffmpeg in a stream, with constant memory;
+        other inputs go through normalize_audio_data().
+
+        skip_after() is called after each yielded signature and returns how
+        many seconds of audio to skip before computing the next one.
+        """
+        if isinstance(audio, (str, os.PathLike)) and _ffmpeg_available():
+            yield from self._iter_signatures_streaming(
+                os.fspath(audio), skip_after,
+            )
+            return
+
         audio = self.normalize_audio_data(audio)
         signature_generator = self.create_signature_generator(audio)
         for signature in signature_generator:
-            results = self.send_recognize_request(signature)
             current_offset = int(
                 signature_generator.samples_processed // NORMALIZED_FRAME_RATE,
             )
+            yield current_offset, signature
+            _apply_skip(signature_generator, skip_after)
 
-            yield current_offset, results
+    def _iter_signatures_streaming(
+        self, path: str, skip_after: Optional[Callable[[], float]] = None,
+    ) -> Generator[Tuple[int, DecodedMessage], None, None]:
+        signature_generator = SignatureGenerator()
+        signature_generator.MAX_TIME_SECONDS = self.max_time_seconds
+        self._skip_ahead(signature_generator, probe_duration(path))
+
+        def current_offset() -> int:
+            processed = signature_generator.samples_processed
+            return int(processed // NORMALIZED_FRAME_RATE)
+
+        for block in iter_normalized_pcm(path):
+            signature_generator.feed_input(block)
+            # input before the skip-ahead point is never processed
+            signature_generator.discard_processed_input()
+            signature = signature_generator.get_next_signature(flush=False)
+            while signature is not None:
+                yield current_offset(), signature
+                _apply_skip(signature_generator, skip_after)
+                signature = signature_generator.get_next_signature(flush=False)
+
+        for signature in signature_generator:
+            yield current_offset(), signature
+            _apply_skip(signature_generator, skip_after)
 
     def normalize_audio_data(
         self, audio: Union[bytes, BinaryIO, AudioSegment],
@@ -121,14 +283,23 @@ class Shazam(object):
         signature_generator = SignatureGenerator()
         signature_generator.feed_input(audio.get_array_of_samples())
         signature_generator.MAX_TIME_SECONDS = self.max_time_seconds
+        self._skip_ahead(signature_generator, audio.duration_seconds)
+        return signature_generator
 
-        if audio.duration_seconds > 12 * 3:
-            signature_generator.samples_processed += NORMALIZED_FRAME_RATE * (
-                int(audio.duration_seconds / 16) - 6
+    def _skip_ahead(
+        self,
+        signature_generator: SignatureGenerator,
+        duration_seconds: Optional[float],
+    ):
+        # Long inputs start recognizing further in; clamped so that inputs
+        # shorter than 96 s don't get a negative offset (which used to index
+        # the input from its end).
+        if duration_seconds and duration_seconds > 12 * 3:
+            skip_seconds = max(0, int(duration_seconds / 16) - 6)
+            signature_generator.samples_processed += (
+                NORMALIZED_FRAME_RATE * skip_seconds
             )
 
-        return signature_generator
-
     def send_recognize_request(self, sig: DecodedMessage) -> dict:
         data = {
             'timezone': self.timezone,
@@ -182,9 +353,10 @@ class Shazam(object):
                 return None
 
 
-def detect_song(file_path):
+def detect_song(file_path, strategy: Optional[RecognitionStrategy] = None):
     shazam = Shazam()
-    recognize_generator = shazam.recognize_song(file_path)
+    strategy = strategy or RecognitionStrategy()
+    recognize_generator = shazam.recognize_song(file_path, strategy=strategy)
     
     retry_attempts = 0
     max_retries = 3  # Number of retries before giving up
@@ -209,6 +381,13 @@ def detect_song(file_path):
         else:
             print(f"No track detected at {offset} seconds.")
 
+    stats = strategy.stats()
+    print(
+        f"{stats['requests']} requests, {stats['skipped_seconds']} s skipped, "
+        f"{stats['tracks']} tracks confirmed",
+    )
+    return strategy.tracks
+
 
 # Example usage:
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+from typing import List, Optional
+
+try:
+    from typing import Final  # noqa: WPS433
+except ImportError:
+    from typing_extensions import Final  # noqa: WPS433, WPS440
+
+MODE_SEARCH: Final = 'search'
+MODE_CONFIRMED: Final = 'confirmed'
+
+
+def track_key(response: Optional[dict]) -> Optional[str]:
+    """Shazam track key of a recognition response, None when nothing matched."""
+    if isinstance(response, dict) and isinstance(response.get('track'), dict):
+        return response['track'].get('key') or response['track'].get('title')
+    return None
+
+
+class RecognitionStrategy(object):
+    """Decide which signatures of a recording are worth sending.
+
+    Recognition requests are sent densely until `confirmations` consecutive
+    responses agree on a track. The track is then considered known and the
+    next signatures are skipped:
+
+    - up to a margin before the predicted end of the track, when the response
+      carries the track duration and the match offset;
+    - otherwise by `default_skip_seconds` at a time, re-probing in between to
+      check that the same track is still playing.
+
+    Once a probe disagrees with the confirmed track a boundary is suspected
+    and every signature is sent again until the next track is confirmed.
+
+    Usage::
+
+        strategy = RecognitionStrategy()
+        for offset, response in shazam.recognize_song(path, strategy=strategy):
+            ...
+        strategy.tracks  # confirmed segments
+    """
+
+    def __init__(
+        self,
+        confirmations: int = 2,
+        default_skip_seconds: float = 30,
+        boundary_margin_seconds: float = 10,
+        max_skip_seconds: float = 300,
+    ):
+        self.confirmations = confirmations
+        self.default_skip_seconds = default_skip_seconds
+        self.boundary_margin_seconds = boundary_margin_seconds
+        self.max_skip_seconds = max_skip_seconds
+
+        self.mode = MODE_SEARCH
+        self.candidate: Optional[str] = None
+        self.agreeing = 0
+        self.last_offset = 0.0
+        self.expected_end: Optional[float] = None
+        self.tracks: List[dict] = []
+
+        self.requests = 0
+        self.skipped_seconds = 0.0
+
+    @staticmethod
+    def track_duration(response: dict) -> Optional[float]:
+        """Track duration in seconds if the response carries it."""
+        track = response.get('track') or {}
+        matches = response.get('matches') or [{}]
+        for source in (track, matches[0]):
+            duration = source.get('duration')
+            if isinstance(duration, (int, float)) and duration > 0:
+                # some payloads report milliseconds
+                return duration / 1000 if duration > 10000 else float(duration)
+        return None
+
+    @staticmethod
+    def match_offset(response: dict) -> Optional[float]:
+        """Position of the recorded excerpt inside the track, in seconds."""
+        matches = response.get('matches') or []
+        if matches and isinstance(matches[0].get('offset'), (int, float)):
+            return float(matches[0]['offset'])
+        return None
+
+    def observe(
+        self,
+        offset: float,
+        response: Optional[dict],
+        signature_seconds: float = 0,
+    ) -> Optional[dict]:
+        """Record the response for the signature ending at `offset` seconds.
+
+        Returns:
+            The track segment when this response confirms a new track.
+        """
+        self.requests += 1
+        self.last_offset = offset
+        key = track_key(response)
+
+        if self.mode == MODE_CONFIRMED:
+            if key is not None and key == self.candidate:
+                self.tracks[-1]['last_seen'] = offset
+                return None
+            # disagreement: the boundary is somewhere behind us, probe densely
+            self.mode = MODE_SEARCH
+            self.expected_end = None
+            self.candidate = key
+            self.agreeing = 1 if key is not None else 0
+        elif key is not None and key == self.candidate:
+            self.agreeing += 1
+        else:
+            self.candidate = key
+            self.agreeing = 1 if key is not None else 0
+
+        if key is None or self.agreeing < self.confirmations:
+            return None
+
+        self.mode = MODE_CONFIRMED
+        duration = self.track_duration(response)
+        match_offset = self.match_offset(response)
+        if duration is not None and match_offset is not None:
+            excerpt_start = offset - signature_seconds
+            self.expected_end = excerpt_start + duration - match_offset
+
+        segment = {
+            'key': key,
+            'title': response['track'].get('title'),
+            'subtitle': response['track'].get('subtitle'),
+            'confirmed_at': offset,
+            'last_seen': offset,
+            'expected_end': self.expected_end,
+            'response': response,
+        }
+        self.tracks.append(segment)
+        return segment
+
+    def skip_seconds(self) -> float:
+        """Seconds of audio to skip before the next signature is computed."""
+        if self.mode != MODE_CONFIRMED:
+            return 0
+
+        margin = self.boundary_margin_seconds
+        if (
+            self.expected_end is not None
+            and self.last_offset > self.expected_end + margin
+        ):
+            # still the same track well past its predicted end: the duration
+            # was off, fall back to periodic re-probing
+            self.expected_end = None
+
+        if self.expected_end is not None:
+            skip = self.expected_end - margin - self.last_offset
+        else:
+            skip = self.default_skip_seconds
+
+        skip = max(0, min(skip, self.max_skip_seconds))
+        self.skipped_seconds += skip
+        return skip
+
+    def stats(self) -> dict:
+        return {
+            'requests': self.requests,
+            'skipped_seconds': round(self.skipped_seconds, 1),
+            'tracks': len(self.tracks),
+        }
@@ -4,22 +4,25 @@ import os
 import uuid
 from flask import Flask, request, jsonify
 from werkzeug.utils import secure_filename
-from split_audio import split_audio_file
-from mutagen.mp3 import MP3
 from flask_cors import CORS
 import time
 import re
 from dotenv import load_dotenv
 import threading
 import clear 
-from flask import Flask, request, jsonify
+import audio_pool
+import scratch
+import jobs
+import tracing
+import gating
+import coalescing
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
-import boto3
-from botocore.exceptions import ClientError
-
 
-scheduler_thread = threading.Thread(target=clear.start_scheduler, daemon=True)
-scheduler_thread.start()
+# Heavy dependencies (boto3, mutagen, pydub, yt_dlp, librosa/scipy) are imported
+# lazily where they are used, so container cold starts and gunicorn worker
+# forks don't pay for them. Call warm_up() (or set APP_WARM_UP=1) to load them
+# ahead of the first request.
 
 
 print("running...")
@@ -29,9 +32,7 @@ CORS(app, resources={r"/*": {"origins": frontend_url}})
 app.config['UPLOAD_FOLDER'] = 'ShazamAPI/eps'
 app.config['CHUNKS_FOLDER'] = 'ShazamAPI/chunks'
 
-total_chunks = 0
-processed_chunks = 1
-video_duration = None  
+# Progress and timings are tracked per job in jobs.registry (see jobs.py)
 
 load_dotenv()
 AUDD_API_KEY = os.getenv("AUDD_API_KEY")
@@ -48,6 +49,90 @@ warnings.filterwarnings(
 )
 
 
+_background_tasks_lock = threading.Lock()
+_background_tasks_started = False
+
+
+def start_background_tasks():
+    """
+    Start the scratch-folder cleanup scheduler once per process.
+    Runs on the first request instead of at import time.
+    """
+    global _background_tasks_started
+    with _background_tasks_lock:
+        if _background_tasks_started:
+            return
+        _background_tasks_started = True
+    scheduler_thread = threading.Thread(target=clear.start_scheduler, daemon=True)
+    scheduler_thread.start()
+
+
+@app.before_request
+def _ensure_background_tasks():
+    if not _background_tasks_started:
+        start_background_tasks()
+
+
+def warm_up():
+    """
+    Optional warm-up hook: import the heavy dependencies and start the audio
+    pool workers now rather than on the first request that needs them.
+    """
+    started = time.perf_counter()
+    import boto3  # noqa: F401
+    import mutagen.mp3  # noqa: F401
+    import pydub  # noqa: F401
+    import yt_dlp  # noqa: F401
+    audio_pool.warm_up()
+    start_background_tasks()
+    print(f"Warm-up completed in {time.perf_counter() - started:.2f}s")
+
+
+def lease_scratch(job_id):
+    """
+    Protect a job's chunks/eps folders from the scratch sweeper until the
+    current request has finished.
+    """
+    try:
+        token = scratch.manager.acquire(job_id)
+    except ValueError as e:
+        print(f"Not leasing scratch for {job_id!r}: {e}")
+        return
+    g.setdefault('scratch_leases', []).append(token)
+
+
+@app.teardown_request
+def _release_scratch_leases(exc):
+    for token in g.pop('scratch_leases', []):
+        scratch.manager.release(token)
+
+
+@app.route('/progress/<job_id>', methods=['GET'])
+def job_progress(job_id):
+    state = jobs.registry.get(job_id)
+    if state is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(state.to_dict())
+
+
+@app.route('/progress/<job_id>/timeline', methods=['GET'])
+def job_timeline(job_id):
+    data = tracing.timeline(job_id)
+    if data is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(data)
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(tracing.metrics_text(), mimetype=tracing.CONTENT_TYPE_LATEST)
+
+
+@app.route('/api/scratch/usage', methods=['GET'])
+def scratch_usage():
+    return jsonify(scratch.usage())
+
+
 @app.route('/')
 def index():
     return "Hello, World!"
@@ -72,6 +157,54 @@ def extract_chunk_number(filename):
     match = re.search(r'chunk(\d+)', filename)
     return int(match.group(1)) if match else float('inf')  
 
+
+class GateChecks:
+    """
+    Local music / no-music checks (gating.py) of an episode's chunks, run on
+    the audio pool at most GATE_LOOKAHEAD chunks ahead of the detect loop so
+    a long episode doesn't queue hundreds of decodes in front of other jobs'
+    splits and partition points.
+    """
+
+    def __init__(self, chunk_paths, lookahead=None):
+        self.paths = list(chunk_paths) if gating.GATE_MODE != "off" else []
+        self.positions = {path: i for i, path in enumerate(self.paths)}
+        self.lookahead = gating.GATE_LOOKAHEAD if lookahead is None else lookahead
+        self.futures = {}
+        self.submitted = 0
+
+    def _fill(self, chunk_path):
+        # submit everything up to `lookahead` chunks past chunk_path
+        end = min(len(self.paths), self.positions[chunk_path] + 1 + max(0, self.lookahead))
+        while self.submitted < end:
+            path = self.paths[self.submitted]
+            self.futures[path] = audio_pool.submit(audio_pool.classify_chunk, path)
+            self.submitted += 1
+
+    def verdict(self, chunk_path, gate_stats):
+        """
+        Wait for the gate verdict of a chunk and count it in the episode stats.
+        None (send the chunk) when gating is off or the check failed.
+        """
+        if chunk_path not in self.positions:
+            return None
+        self._fill(chunk_path)
+        future = self.futures.pop(chunk_path)
+        try:
+            verdict = future.result()
+        except Exception as e:
+            print(f"Gate check failed for {chunk_path}: {e}")
+            verdict = None
+        gate_stats.record(verdict)
+        return verdict
+
+    def cancel(self, chunk_path):
+        """The chunk won't be checked (coalesced); keep the window moving."""
+        if chunk_path not in self.positions:
+            return
+        self._fill(chunk_path)
+        self.futures.pop(chunk_path).cancel()
+
 import subprocess
 from pathlib import Path
 
@@ -97,62 +230,82 @@ def convert_mp4_to_mp3(src_path: str, dst_path: str) -> None:
     if completed.returncode != 0:
         raise RuntimeError(completed.stderr.decode("utf-8", errors="ignore"))
 
-from yt import parse_links_field, download_youtube_audios, concat_mp3s
+from yt import (parse_links_field, download_youtube_audios_parallel,
+                audio_duration, AUDIO_FORMATS, YT_AUDIO_FORMAT)
 # (keep the rest of your imports)
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
-    global total_chunks, processed_chunks, video_duration
-
     # ---------- 1) YouTube links FIRST (parent -> fileUUID layout) ----------
     links_raw = request.form.get("links", "").strip()
     links = parse_links_field(links_raw)
 
     if links:
+        audio_format = (request.form.get("audio_format") or YT_AUDIO_FORMAT).strip().lower()
+        if audio_format not in AUDIO_FORMATS:
+            return jsonify({"error": f"audio_format must be one of {', '.join(AUDIO_FORMATS)}"}), 400
+        state = None
         try:
             # parent UUID (same as S3 flow)
             parent_uuid = str(uuid.uuid4())
+            lease_scratch(parent_uuid)
+            state = jobs.registry.create(parent_uuid, kind="youtube")
             parent_eps_folder = os.path.join(app.config['UPLOAD_FOLDER'], parent_uuid)
             parent_chunks_folder = os.path.join(app.config['CHUNKS_FOLDER'], parent_uuid)
             os.makedirs(parent_eps_folder, exist_ok=True)
             os.makedirs(parent_chunks_folder, exist_ok=True)
 
             total_duration_seconds = 0
-            produced_any = False 
 
+            # one UUID per URL (same as S3 file handling)
+            link_jobs = []
             for url in links:
-                # one UUID per URL (same as S3 file handling)
                 file_uuid  = str(uuid.uuid4())
                 eps_sub    = os.path.join(parent_eps_folder, file_uuid)
                 chunks_sub = os.path.join(parent_chunks_folder, file_uuid)
                 os.makedirs(eps_sub, exist_ok=True)
                 os.makedirs(chunks_sub, exist_ok=True)
-
-                # download THIS url directly into its own eps_sub
-                mp3_paths = download_youtube_audios([url], eps_sub)
-                if not mp3_paths:
-                    print(f"No MP3 produced for {url}")
+                link_jobs.append((url, eps_sub, chunks_sub))
+
+            # Links download concurrently; each file is handed to the audio pool
+            # for splitting as soon as it lands, overlapping network and CPU.
+            splits = {}
+
+            def on_downloaded(index, target_audio):
+                splits[index] = audio_pool.submit(audio_pool.split_audio, target_audio, link_jobs[index][2])
+
+            with tracing.span("youtube.download", job_id=parent_uuid, links=len(link_jobs)):
+                audio_paths = download_youtube_audios_parallel(
+                    [(url, eps_sub) for url, eps_sub, _ in link_jobs],
+                    on_downloaded=on_downloaded,
+                    audio_format=audio_format,
+                )
+            produced_any = any(audio_paths)
+
+            for index, target_audio in enumerate(audio_paths):
+                if not target_audio:
+                    print(f"No audio produced for {link_jobs[index][0]}")
                     continue
-                produced_any = True 
-                target_mp3 = mp3_paths[0]
 
                 # duration
                 try:
-                    audio = MP3(target_mp3)
-                    total_duration_seconds += audio.info.length
+                    total_duration_seconds += audio_duration(target_audio)
                 except Exception as e:
-                    print(f"Error calculating duration for {target_mp3}: {e}")
+                    print(f"Error calculating duration for {target_audio}: {e}")
 
-                # split into THIS url's chunks_sub
+                # wait for THIS url's split into its chunks_sub
                 try:
-                    split_audio_file(target_mp3, chunks_sub)
-                    print(f"Chunks saved to {chunks_sub}")
+                    with tracing.span("youtube.split_wait", job_id=parent_uuid):
+                        state.add_chunks(splits[index].result())
+                    print(f"Chunks saved to {link_jobs[index][2]}")
                 except Exception as e:
-                    print(f"Error splitting {target_mp3}: {e}")
+                    print(f"Error splitting {target_audio}: {e}")
 
             total_duration_seconds = round(total_duration_seconds)
+            state.update(duration_seconds=total_duration_seconds, status=jobs.STATUS_UPLOADED)
 
             if not produced_any:
+                state.fail("no audio downloaded")
                 # Clean up the empty parent folders we created
                 try:
                     if os.path.isdir(parent_eps_folder):  os.rmdir(parent_eps_folder)
@@ -169,10 +322,14 @@ def upload_file():
 
         except Exception as e:
             print(f"Error processing YouTube links: {e}")
+            if state is not None:
+                state.fail(e)
             return jsonify({"error": "Error processing YouTube links"}), 500
 
     # ---------- 2) Fallback: single file upload flow (unchanged) ----------
     user_id = str(uuid.uuid4())
+    lease_scratch(user_id)
+    state = jobs.registry.create(user_id, kind="upload")
     user_chunks_folder = os.path.join(app.config['CHUNKS_FOLDER'], user_id)
     user_eps_folder = os.path.join(app.config['UPLOAD_FOLDER'], user_id)
     os.makedirs(user_eps_folder, exist_ok=True)
@@ -181,14 +338,17 @@ def upload_file():
     file = request.files.get('file')
     if not file or file.filename == '':
         print("No file and no links provided")
+        jobs.registry.remove(user_id)
         return jsonify({"error": "Provide a .mp3/.mp4 file or one/more YouTube links"}), 400
 
     filename = secure_filename(file.filename)
     if not allowed_file(filename):
+        jobs.registry.remove(user_id)
         return jsonify({"error": "Unsupported file type. Please upload .mp3 or .mp4"}), 400
 
     upload_path = os.path.join(user_eps_folder, filename)
-    file.save(upload_path)
+    with tracing.span("upload.save", job_id=user_id):
+        file.save(upload_path)
     print(f"File saved at: {upload_path}")
 
     ext = Path(filename).suffix.lower()
@@ -199,7 +359,8 @@ def upload_file():
             mp3_name = f"{base}.mp3"
             mp3_path = os.path.join(user_eps_folder, mp3_name)
             print("Converting MP4 -> MP3...")
-            convert_mp4_to_mp3(upload_path, mp3_path)
+            with tracing.span("upload.convert", job_id=user_id):
+                convert_mp4_to_mp3(upload_path, mp3_path)
             audio_path = mp3_path
             try:
                 os.remove(upload_path)
@@ -208,14 +369,18 @@ def upload_file():
             print(f"Converted and using audio path: {audio_path}")
     except Exception as e:
         print(f"Error converting MP4 to MP3: {e}")
+        state.fail(e)
         return jsonify({"error": "Error converting MP4 to MP3"}), 500
 
     try:
-        audio = MP3(audio_path)
+        from mutagen.mp3 import MP3
+        with tracing.span("upload.probe", job_id=user_id):
+            audio = MP3(audio_path)
         video_duration_in_seconds = round(audio.info.length)
         print(f"Audio duration: {video_duration_in_seconds} seconds")
     except Exception as e:
         print(f"Error processing MP3 file: {e}")
+        state.fail(e)
         return jsonify({"error": "Error processing MP3 file"}), 500
 
     minutes, seconds = divmod(int(video_duration_in_seconds), 60)
@@ -223,14 +388,21 @@ def upload_file():
     video_duration = f"{str(hours).zfill(2)}:{str(minutes).zfill(2)}:{str(seconds).zfill(2)}"
 
     try:
-        split_audio_file(audio_path, user_chunks_folder)
+        with tracing.span("upload.split", job_id=user_id):
+            total_chunks = audio_pool.run(audio_pool.split_audio, audio_path, user_chunks_folder)
         print(f"Audio file split into chunks in: {user_chunks_folder}")
     except Exception as e:
         print(f"Error splitting audio file: {e}")
+        state.fail(e)
         return jsonify({"error": "Error splitting audio file"}), 500
 
-    total_chunks = len([f for f in os.listdir(user_chunks_folder) if f.endswith('.mp3')])
-    processed_chunks = 0
+    state.update(
+        status=jobs.STATUS_UPLOADED,
+        total_chunks=total_chunks,
+        processed_chunks=0,
+        video_duration=video_duration,
+        duration_seconds=video_duration_in_seconds,
+    )
     print(f"Total chunks created: {total_chunks}, {video_duration}")
 
     return jsonify({
@@ -260,7 +432,12 @@ def download_s3_folder_endpoint():
         
         local_directory = "ShazamAPI/eps"
 
-        parent_uuids, total_duration_seconds = download_s3_folder(bucket_name, folder_name, local_directory, access_key, secret_key)
+        kwargs = {}
+        if 'stream' in data:
+            # stream episodes through ffmpeg instead of staging them in eps/
+            kwargs['stream'] = bool(data.get('stream'))
+
+        parent_uuids, total_duration_seconds = download_s3_folder(bucket_name, folder_name, local_directory, access_key, secret_key, **kwargs)
 
         return jsonify({"message": "Files downloaded successfully!", "parent_uuids": parent_uuids, "total_duration_seconds": total_duration_seconds}), 200
 
@@ -268,17 +445,14 @@ def download_s3_folder_endpoint():
         print(f"Error: {e}")  
         return jsonify({"error": str(e)}), 500
 
-from detect_partition_point import detect_partition_point
-
 
 @app.route('/detect', methods=['POST'])
 def detect_songs():
-    global processed_chunks, video_duration
-
     user_id = request.json.get('userId')
     if not user_id:
         return jsonify({"error": "Missing userId in request"}), 400
 
+    lease_scratch(user_id)
     user_chunks_folder = os.path.join(app.config['CHUNKS_FOLDER'], user_id)
     user_eps_folder = os.path.join(app.config['UPLOAD_FOLDER'], user_id)
 
@@ -301,6 +475,15 @@ def detect_songs():
         print(f"No chunk files found in {user_chunks_folder}")
         return jsonify({'error': 'No chunk files found for user.'}), 400
 
+    state = jobs.registry.get_or_create(user_id, kind="upload")
+    state.update(status=jobs.STATUS_DETECTING, total_chunks=len(chunk_files), processed_chunks=0)
+
+    # chunks with no music (silence, noise, dialogue) are not sent to AudD
+    gate_stats = state.gate_stats(user_id)
+    gate_checks = GateChecks([os.path.join(user_chunks_folder, f) for f in chunk_files])
+    # chunks inside a track whose end AudD lets us predict are merged, not sent
+    coalescer = coalescing.TrackCoalescer()
+
     # --- NEW: keep previous chunk info so we can adjust boundary when title changes
     prev_entry = None
     prev_chunk_path = None
@@ -309,6 +492,7 @@ def detect_songs():
     total_duration = len(chunk_files) * chunk_duration
 
     for chunk_filename in chunk_files:
+        chunk_started = time.perf_counter()
         chunk_number = int(chunk_filename.split('chunk')[1].split('.mp3')[0])
         start_time = (chunk_number - 1) * chunk_duration
         end_time = chunk_number * chunk_duration
@@ -327,25 +511,47 @@ def detect_songs():
             'detected_with': 'AudD'
         }
 
-        try:
-            from test_basic import recognize_song
-            try:
-                audd_result = recognize_song(chunk_path, AUDD_API_KEY)
-                if isinstance(audd_result, tuple) and len(audd_result) == 4:
-                    title, artist, audd_link, label = audd_result
-                    curr_entry.update({
-                        'title': title,
-                        'artist': artist,
-                        'label': label,
-                        'song_link': audd_link
-                    })
-                    print(f"Song detected in {chunk_filename} by AudD: {title} by {artist}")
-                else:
-                    print(f"No definitive song detected in {chunk_filename} with AudD.")
-            except Exception as e:
-                print(f"Error using AudD for chunk {chunk_filename}: {e}")
-        except Exception as e:
-            print(f"Error importing recognize_song for chunk {chunk_filename}: {str(e)}")
+        action = coalescer.plan(start_time, end_time)
+        details = None
+        sent = False
+
+        if action == coalescing.SKIP:
+            gate_checks.cancel(chunk_path)
+            print(f"Coalesced {chunk_filename} into {prev_entry['title']} (predicted track end)")
+        else:
+            with tracing.span("detect.gate", job_id=user_id, chunk=chunk_number):
+                verdict = gate_checks.verdict(chunk_path, gate_stats)
+            gated = gating.should_skip(verdict)
+
+            if gated:
+                curr_entry['detected_with'] = 'gate'
+                print(f"Skipping {chunk_filename}: no music ({verdict['reason']})")
+            else:
+                try:
+                    from test_basic import recognize_song_details
+                    try:
+                        sent = True
+                        with tracing.span("detect.audd", job_id=user_id, chunk=chunk_number, action=action):
+                            details = recognize_song_details(chunk_path, AUDD_API_KEY)
+                        if details:
+                            curr_entry.update({
+                                'title': details['title'],
+                                'artist': details['artist'],
+                                'label': details['label'],
+                                'song_link': details['song_link']
+                            })
+                            print(f"Song detected in {chunk_filename} by AudD: {details['title']} by {details['artist']}")
+                        else:
+                            print(f"No definitive song detected in {chunk_filename} with AudD.")
+                    except Exception as e:
+                        print(f"Error using AudD for chunk {chunk_filename}: {e}")
+                except Exception as e:
+                    print(f"Error importing recognize_song for chunk {chunk_filename}: {str(e)}")
+
+        if action == coalescing.SKIP:
+            merged = True
+        else:
+            merged = coalescer.observe(start_time, details, action, sent=sent) and prev_entry is not None
 
         # --- NEW: if title changed from previous chunk, refine boundary using prev chunk
         def has_valid_title(entry):
@@ -355,7 +561,8 @@ def detect_songs():
             if prev_entry['title'] != curr_entry['title']:
                 print(f"[Partition] Sending to detect_partition_point: {prev_chunk_path}")
                 try:
-                    cut_sec = detect_partition_point(prev_chunk_path)  
+                    with tracing.span("detect.partition", job_id=user_id, chunk=chunk_number):
+                        cut_sec = audio_pool.run(audio_pool.partition_point, prev_chunk_path)
                     if cut_sec is None:
                         print(f"[Partition] detect_partition_point returned: None")
                     else:
@@ -375,17 +582,25 @@ def detect_songs():
                     print(f"Adjusted boundary via partition: {partition_global:.3f}s "
                           f"(prev={prev_entry['title']} → curr={curr_entry['title']})")
 
-        # we can now append the previous entry (after any adjustment),
-        # and move the sliding window forward
-        if prev_entry is not None:
-            detected_songs.append(prev_entry)
+        if merged:
+            # same track as the previous entry: extend it instead of adding a cue entry
+            prev_entry['end_time'] = curr_entry['end_time']
+        else:
+            # we can now append the previous entry (after any adjustment),
+            # and move the sliding window forward
+            if prev_entry is not None:
+                detected_songs.append(prev_entry)
+            prev_entry = curr_entry
 
-        prev_entry = curr_entry
         prev_chunk_path = chunk_path
         prev_start_time = start_time
 
-        time.sleep(2)
-        processed_chunks += 1
+        if sent:
+            # AudD rate limit; nothing was sent for gated or coalesced chunks
+            with tracing.span("detect.sleep", job_id=user_id, chunk=chunk_number):
+                time.sleep(2)
+        tracing.record("detect.chunk", chunk_started, job_id=user_id, chunk=chunk_number)
+        processed_chunks = state.advance()
         print(f"Processed chunks (increment): {processed_chunks}")
 
     # append the last entry
@@ -398,8 +613,15 @@ def detect_songs():
     clear_folder(user_eps_folder)
     os.rmdir(user_eps_folder)
 
-    print(f"Completed song detection for user: {user_id}")
-    return jsonify({'songs': detected_songs, 'videoDuration': total_duration})
+    state.update(status=jobs.STATUS_DONE)
+    print(f"Completed song detection for user: {user_id} "
+          f"(gate: {gate_stats.to_dict()}, coalescing: {coalescer.stats()})")
+    return jsonify({
+        'songs': detected_songs,
+        'videoDuration': total_duration,
+        'gating': gate_stats.to_dict(),
+        'coalescing': coalescer.stats(),
+    })
 
 
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -412,6 +634,9 @@ def detect_songs_s3():
     if not parent_uuids or not isinstance(parent_uuids, list):
         return jsonify({"error": "Missing or invalid parentUUIDs in request"}), 400
 
+    for parent_uuid in parent_uuids:
+        lease_scratch(parent_uuid)
+
     chunks_folder = os.path.join("ShazamAPI", "chunks")
     eps_folder = os.path.join("ShazamAPI", "eps")
     chunk_duration = 15  # kept here for consistency; per-folder function also uses 15s
@@ -455,7 +680,7 @@ def detect_songs_s3():
             return None, {}
 
     # -------- INTEGRATED VERSION (uses detect_partition_point on title changes) --------
-    def process_uuid_folder(uuid_folder_path, current_uuid, video_file_name, metadata, uuid_folder_results):
+    def process_uuid_folder(uuid_folder_path, current_uuid, video_file_name, metadata, uuid_folder_results, state):
         chunk_files = sorted(
             [f for f in os.listdir(uuid_folder_path) if f.endswith('.mp3')],
             key=extract_chunk_number
@@ -466,12 +691,19 @@ def detect_songs_s3():
 
         chunk_duration = 15  # seconds for S3 flow
 
+        # per-episode gate statistics; chunks with no music skip AudD
+        episode = os.path.basename(uuid_folder_path)
+        gate_stats = state.gate_stats(episode)
+        gate_checks = GateChecks([os.path.join(uuid_folder_path, f) for f in chunk_files])
+        coalescer = coalescing.TrackCoalescer()
+
         # keep previous so we can refine the boundary at title changes
         prev_entry = None
         prev_chunk_path = None
         prev_start_time = None
 
         for chunk_filename in chunk_files:
+            chunk_started = time.perf_counter()
             chunk_number = int(chunk_filename.split('chunk')[1].split('.mp3')[0])
             start_time = (chunk_number - 1) * chunk_duration
             end_time = chunk_number * chunk_duration
@@ -495,19 +727,39 @@ def detect_songs_s3():
                 'video_file_name': video_file_name
             }
 
-            from test_basic import recognize_song
-            try:
-                audd_result = recognize_song(chunk_path, AUDD_API_KEY)
-                if isinstance(audd_result, tuple) and len(audd_result) == 4:
-                    title, artist, audd_link, label = audd_result
-                    curr_entry.update({
-                        'title': title,
-                        'artist': artist,
-                        'label': label,
-                        'song_link': audd_link
-                    })
-            except Exception as e:
-                print(f"Error using AudD for chunk {chunk_filename}: {e}")
+            action = coalescer.plan(start_time, end_time)
+            details = None
+            sent = False
+
+            if action == coalescing.SKIP:
+                # inside the track predicted by an earlier chunk
+                gate_checks.cancel(chunk_path)
+            else:
+                with tracing.span("detect.gate", job_id=current_uuid, chunk=chunk_number):
+                    verdict = gate_checks.verdict(chunk_path, gate_stats)
+
+                if gating.should_skip(verdict):
+                    curr_entry['detected_with'] = 'gate'
+                else:
+                    from test_basic import recognize_song_details
+                    try:
+                        sent = True
+                        with tracing.span("detect.audd", job_id=current_uuid, chunk=chunk_number, action=action):
+                            details = recognize_song_details(chunk_path, AUDD_API_KEY)
+                        if details:
+                            curr_entry.update({
+                                'title': details['title'],
+                                'artist': details['artist'],
+                                'label': details['label'],
+                                'song_link': details['song_link']
+                            })
+                    except Exception as e:
+                        print(f"Error using AudD for chunk {chunk_filename}: {e}")
+
+            if action == coalescing.SKIP:
+                merged = True
+            else:
+                merged = coalescer.observe(start_time, details, action, sent=sent) and prev_entry is not None
 
             def has_valid_title(entry):
                 return entry and entry.get('title') and entry['title'] != "May contain music"
@@ -516,7 +768,9 @@ def detect_songs_s3():
             if prev_entry is not None and has_valid_title(prev_entry) and has_valid_title(curr_entry):
                 if prev_entry['title'] != curr_entry['title']:
                     try:
-                        cut_sec = detect_partition_point(prev_chunk_path)  # seconds within previous chunk
+                        # seconds within previous chunk
+                        with tracing.span("detect.partition", job_id=current_uuid, chunk=chunk_number):
+                            cut_sec = audio_pool.run(audio_pool.partition_point, prev_chunk_path)
                     except Exception as e:
                         print(f"detect_partition_point failed for {prev_chunk_path}: {e}")
                         cut_sec = None
@@ -531,17 +785,25 @@ def detect_songs_s3():
                         print(f"[S3] Adjusted boundary: {partition_global:.3f}s "
                               f"(prev={prev_entry['title']} → curr={curr_entry['title']})")
 
-            # push previous (after any adjustment), then advance window
-            if prev_entry is not None:
-                uuid_folder_results.append(prev_entry)
+            if merged:
+                # same track as the previous entry: extend it instead of adding a cue entry
+                prev_entry['end_time'] = curr_entry['end_time']
+            else:
+                # push previous (after any adjustment), then advance window
+                if prev_entry is not None:
+                    uuid_folder_results.append(prev_entry)
+                prev_entry = curr_entry
 
-            prev_entry = curr_entry
             prev_chunk_path = chunk_path
             prev_start_time = start_time
 
+            tracing.record("detect.chunk", chunk_started, job_id=current_uuid, chunk=chunk_number)
+            state.advance()
+
         # append the last one
         if prev_entry is not None:
             uuid_folder_results.append(prev_entry)
+        print(f"[S3] Gate stats for {episode}: {gate_stats.to_dict()}, coalescing: {coalescer.stats()}")
 
     def process_parent_uuid(parent_uuid):
         detected_songs = []
@@ -552,13 +814,30 @@ def detect_songs_s3():
             print(f"Parent UUID folder {parent_folder_path} not found")
             return detected_songs
 
-        for uuid_folder in os.listdir(parent_folder_path):
-            uuid_folder_path = os.path.join(parent_folder_path, uuid_folder)
-            if os.path.isdir(uuid_folder_path):
-                uuid_folder_results = []
-                video_file_name, metadata = get_video_file_and_metadata(user_eps_folder, uuid_folder)
-                process_uuid_folder(uuid_folder_path, parent_uuid, video_file_name, metadata, uuid_folder_results)
-                detected_songs.append(uuid_folder_results)
+        uuid_folders = [
+            os.path.join(parent_folder_path, uuid_folder)
+            for uuid_folder in os.listdir(parent_folder_path)
+            if os.path.isdir(os.path.join(parent_folder_path, uuid_folder))
+        ]
+        state = jobs.registry.get_or_create(parent_uuid, kind="s3")
+        state.update(
+            status=jobs.STATUS_DETECTING,
+            total_chunks=sum(len([f for f in os.listdir(path) if f.endswith('.mp3')]) for path in uuid_folders),
+            processed_chunks=0,
+        )
+
+        for uuid_folder_path in uuid_folders:
+            uuid_folder = os.path.basename(uuid_folder_path)
+            uuid_folder_results = []
+            video_file_name, metadata = get_video_file_and_metadata(user_eps_folder, uuid_folder)
+            try:
+                process_uuid_folder(uuid_folder_path, parent_uuid, video_file_name, metadata, uuid_folder_results, state)
+            except Exception as e:
+                state.fail(e)
+                raise
+            detected_songs.append(uuid_folder_results)
+
+        state.update(status=jobs.STATUS_DONE)
 
         if os.path.exists(parent_folder_path):
             clear_folder(parent_folder_path)
@@ -584,34 +863,8 @@ def detect_songs_s3():
     return jsonify({'songs': detected_songs})
 
 
-def list_s3_objects(access_key, secret_key, bucket_name, prefix=''):
-    try:
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-        )
-
-        response = s3_client.list_objects_v2(
-            Bucket=bucket_name,
-            Prefix=prefix,
-            Delimiter='/' 
-        )
-
-        folders = response.get('CommonPrefixes', [])
-        files = response.get('Contents', [])
+from s3_browser import list_s3_objects
 
-        folder_list = [folder['Prefix'] for folder in folders]
-        file_list = [file['Key'] for file in files if file['Key'] != prefix]
-
-        return {
-            'folders': folder_list,
-            'files': file_list
-        }
-
-    except ClientError as e:
-        print(f"Error accessing S3: {e}")
-        return {'error': str(e)}
 
 @app.route('/api/s3/fetch-s3', methods=['GET'])
 def fetch_s3_data():
@@ -619,15 +872,39 @@ def fetch_s3_data():
     secret_key = request.args.get('secretKey')
     bucket_name = request.args.get('bucketName')
     prefix = request.args.get('prefix', '')
+    # optional pagination: without these the full listing is returned
+    continuation_token = request.args.get('continuationToken') or None
+    max_keys = request.args.get('maxKeys', type=int)
+    refresh = request.args.get('refresh', 'false').lower() in ('1', 'true')
 
     if not access_key or not secret_key or not bucket_name:
         return jsonify({'error': 'Missing required parameters'}), 400
-    data = list_s3_objects(access_key, secret_key, bucket_name, prefix)
+    data = list_s3_objects(
+        access_key, secret_key, bucket_name, prefix,
+        continuation_token=continuation_token, max_keys=max_keys, refresh=refresh,
+    )
 
     if 'error' in data:
         return jsonify({'error': data['error']}), 500
 
-    return jsonify(data)
+    etag = data['etag']
+    if request.if_none_match.contains(etag):
+        not_modified = app.response_class(status=304)
+        not_modified.set_etag(etag)
+        return not_modified
+
+    response = jsonify({
+        'folders': data['folders'],
+        'files': data['files'],
+        'nextContinuationToken': data['next_continuation_token'],
+        'isTruncated': data['is_truncated'],
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+if os.getenv("APP_WARM_UP", "0") == "1":
+    threading.Thread(target=warm_up, daemon=True).start()
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8000)
@@ -0,0 +1,168 @@
+# audio_pool.py
+# Dedicated process pool for the CPU-heavy audio stages (decode, feature
+# extraction, partitioning, fingerprinting).
+#
+# Flask request threads must not run librosa/pydub themselves: those calls hold
+# the GIL for seconds and stall every other request served by the same worker.
+# Instead they hand the work to this pool:
+#
+#   future = audio_pool.submit(audio_pool.split_audio, mp3_path, chunks_dir)
+#   cut_sec = audio_pool.run(audio_pool.partition_point, chunk_path)
+#
+# Workers are long-lived and import numpy/librosa/scipy/pydub once in their
+# initializer, so individual calls don't pay the import cost.
+#
+# Env:
+#   AUDIO_POOL_WORKERS  number of worker processes (default: CPU count).
+#                       0 runs every task inline in the calling thread.
+
+import os
+import sys
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+AUDIO_POOL_WORKERS = int(os.getenv("AUDIO_POOL_WORKERS", os.cpu_count() or 2))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _warm_worker():
+    """
+    Pool initializer: pre-import the heavy audio stack once per worker.
+    Missing optional modules are ignored; the task itself will raise.
+    """
+    for module_name in ("numpy", "scipy.signal", "scipy.ndimage", "librosa", "pydub"):
+        try:
+            __import__(module_name)
+        except Exception as e:
+            print(f"[audio_pool] could not pre-import {module_name}: {e}")
+
+
+def _mp_context():
+    # fork() from a multi-threaded Flask process can deadlock on locks held by
+    # other threads, so never fork the web worker directly.
+    if sys.platform != "win32":
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            print(f"[audio_pool] starting {AUDIO_POOL_WORKERS} worker(s)")
+            _pool = ProcessPoolExecutor(
+                max_workers=AUDIO_POOL_WORKERS,
+                mp_context=_mp_context(),
+                initializer=_warm_worker,
+            )
+        return _pool
+
+
+def _reset_pool(broken):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False)
+
+
+def submit(fn, *args, **kwargs) -> Future:
+    """
+    Schedule fn(*args, **kwargs) on the audio pool and return its Future.
+    fn must be a module-level (picklable) function.
+    """
+    if AUDIO_POOL_WORKERS <= 0:
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    pool = get_pool()
+    try:
+        return pool.submit(fn, *args, **kwargs)
+    except BrokenProcessPool:
+        # A worker died (OOM kill, segfault in a codec...): start a fresh pool
+        print("[audio_pool] pool is broken, restarting it")
+        _reset_pool(pool)
+        return get_pool().submit(fn, *args, **kwargs)
+
+
+def run(fn, *args, timeout=None, **kwargs):
+    """
+    Submit fn to the pool and block until its result is available.
+    Exceptions raised in the worker are re-raised here.
+    """
+    return submit(fn, *args, **kwargs).result(timeout=timeout)
+
+
+def warm_up():
+    """
+    Start every worker now (instead of on the first request) so that the
+    imports in _warm_worker are already paid for.
+    """
+    if AUDIO_POOL_WORKERS <= 0:
+        return
+    futures = [submit(_noop) for _ in range(AUDIO_POOL_WORKERS)]
+    for future in futures:
+        future.result()
+
+
+def shutdown(wait=True):
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+
+# ----------------------------
+# Tasks (run inside the workers)
+# ----------------------------
+def _noop():
+    return os.getpid()
+
+
+def decode_pcm(file_path, frame_rate=16000, channels=1, sample_width=2):
+    """
+    Decode any ffmpeg-readable file to raw little-endian PCM bytes.
+    """
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(file_path)
+    audio = audio.set_sample_width(sample_width).set_frame_rate(frame_rate).set_channels(channels)
+    return audio.raw_data
+
+
+def split_audio(input_file, output_dir, chunk_length_ms=10000):
+    from split_audio import split_audio_file
+    split_audio_file(input_file, output_dir, chunk_length_ms)
+    return len([f for f in os.listdir(output_dir) if f.endswith('.mp3')])
+
+
+def partition_point(file_path):
+    from detect_partition_point import detect_partition_point
+    return detect_partition_point(file_path)
+
+
+def classify_chunk(file_path, thresholds=None):
+    """
+    Local music / no-music verdict for a chunk (see gating.py).
+    """
+    import gating
+    return gating.classify(file_path, thresholds)
+
+
+def fingerprint(file_path, max_time_seconds=8):
+    """
+    Compute the Shazam signatures of a file offline.
+    Returns a list of (offset_seconds, signature_uri).
+    """
+    from ShazamAPI.api import Shazam
+    shazam = Shazam()
+    shazam.max_time_seconds = max_time_seconds
+    return [(offset, sig.encode_to_uri()) for offset, sig in shazam.iter_signatures(file_path)]
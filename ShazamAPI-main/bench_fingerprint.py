@@ -0,0 +1,373 @@
+# bench_fingerprint.py
+# Offline benchmark for the ShazamAPI fingerprinting hot path:
+#   - SignatureGenerator     throughput (seconds of audio per CPU second),
+#                            peak RSS, transient allocations per 128-sample hop,
+#                            fed at once and block by block (streaming)
+#   - DecodedMessage         encode/decode round trips per second
+#   - Shazam.normalize_audio_data
+#                            throughput and peak RSS on 44.1 kHz stereo input
+#
+# Every case runs in a fresh interpreter so peak RSS belongs to that case only.
+# Signature cases also hash every produced signature and compare them with
+# bench_fingerprint_golden.json, so DSP optimizations can be checked for
+# bit-exact output:
+#
+#   python bench_fingerprint.py                        # run + golden check
+#   python bench_fingerprint.py --fixture ep1.wav      # add recorded audio
+#   python bench_fingerprint.py --update-golden        # after an intended change
+#   python bench_fingerprint.py --json out.json
+#
+# Synthetic audio is generated from a fixed seed. Recorded fixtures are decoded
+# with pydub (ffmpeg needed for anything but WAV) and keyed by content hash.
+# Exit code is 1 when a signature differs from its golden value.
+
+import argparse
+import array
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+GOLDEN_PATH = os.path.join(HERE, "bench_fingerprint_golden.json")
+
+FRAME_RATE = 16000
+HOP = 128
+
+
+# ----------------------------
+# Fixtures
+# ----------------------------
+def synthetic_pcm(seconds, frame_rate=FRAME_RATE, channels=1, seed=1234):
+    """
+    Deterministic music-like int16 PCM: a sequence of short notes (a few
+    harmonics with attack/decay envelopes) over low-level noise.
+    Returns interleaved samples as a numpy int16 array.
+    """
+    import numpy as np
+
+    rng = np.random.RandomState(seed)
+    total = int(seconds * frame_rate)
+    t = np.arange(total) / frame_rate
+    signal = rng.normal(0, 0.01, total)
+
+    note_len = int(0.25 * frame_rate)
+    for start in range(0, total, note_len):
+        end = min(start + note_len, total)
+        f0 = 110 * 2 ** (rng.randint(0, 48) / 12)
+        env = np.exp(-np.linspace(0, 4, end - start)) * np.minimum(1, np.linspace(0, 20, end - start))
+        note = np.zeros(end - start)
+        for harmonic, weight in ((1, 1.0), (2, 0.5), (3, 0.25), (5, 0.1)):
+            note += weight * np.sin(2 * np.pi * f0 * harmonic * t[start:end])
+        signal[start:end] += 0.3 * env * note
+
+    pcm = (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+    if channels > 1:
+        pcm = np.repeat(pcm[:, None], channels, axis=1).reshape(-1)
+    return pcm
+
+
+def load_fixture(path):
+    """
+    Decode a recorded file to 16 kHz mono int16 samples (array('h')).
+    """
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(path)
+    audio = audio.set_sample_width(2).set_frame_rate(FRAME_RATE).set_channels(1)
+    return audio.get_array_of_samples()
+
+
+def fixture_id(path):
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    return f"fixture:{os.path.basename(path)}:{digest}"
+
+
+# ----------------------------
+# Measurements
+# ----------------------------
+def peak_rss_mb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def signature_digest(signature):
+    return hashlib.sha256(signature.encode_to_binary()).hexdigest()
+
+
+def allocations_per_hop(samples, hops=200):
+    """
+    Average transient allocation (tracemalloc peak above the starting point)
+    and net growth per process_input() hop of 128 samples.
+    """
+    import tracemalloc
+    from ShazamAPI.algorithm import SignatureGenerator
+
+    generator = SignatureGenerator()
+    hops = min(hops, len(samples) // HOP)
+    batches = [list(samples[i * HOP:(i + 1) * HOP]) for i in range(hops)]
+
+    tracemalloc.start()
+    try:
+        peak_total = 0
+        before_all = tracemalloc.get_traced_memory()[0]
+        for batch in batches:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            generator.process_input(batch)
+            peak_total += tracemalloc.get_traced_memory()[1] - current
+        net = tracemalloc.get_traced_memory()[0] - before_all
+    finally:
+        tracemalloc.stop()
+    return {
+        "hops": hops,
+        "transient_bytes_per_hop": round(peak_total / max(hops, 1)),
+        "net_bytes_per_hop": round(net / max(hops, 1)),
+    }
+
+
+def generate_streaming(generator, samples, block_size=FRAME_RATE):
+    """
+    Feed samples block by block the way Shazam.iter_signatures() streams a
+    file, then flush. Must produce the same signatures as feeding everything.
+    """
+    signatures = []
+    for start in range(0, len(samples), block_size):
+        generator.feed_input(samples[start:start + block_size])
+        signature = generator.get_next_signature(flush=False)
+        while signature is not None:
+            signatures.append(signature)
+            signature = generator.get_next_signature(flush=False)
+    signatures.extend(generator)
+    return signatures
+
+
+def run_signature_case(samples, max_time_seconds, streaming=False):
+    from ShazamAPI.algorithm import SignatureGenerator
+
+    generator = SignatureGenerator()
+    generator.MAX_TIME_SECONDS = max_time_seconds
+
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    if streaming:
+        signatures = generate_streaming(generator, samples)
+    else:
+        generator.feed_input(samples)
+        signatures = list(generator)
+    cpu = time.process_time() - cpu_started
+    wall = time.perf_counter() - wall_started
+
+    audio_seconds = len(samples) / FRAME_RATE
+    result = {
+        "audio_seconds": round(audio_seconds, 2),
+        "cpu_seconds": round(cpu, 3),
+        "wall_seconds": round(wall, 3),
+        "audio_seconds_per_cpu_second": round(audio_seconds / cpu, 3) if cpu else None,
+        "signatures": [signature_digest(sig) for sig in signatures],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    result.update(allocations_per_hop(samples))
+    return result
+
+
+def case_signature_synthetic(args):
+    samples = array.array("h", synthetic_pcm(args.seconds).tobytes())
+    return run_signature_case(samples, args.max_time_seconds)
+
+
+def case_signature_streaming(args):
+    samples = array.array("h", synthetic_pcm(args.seconds).tobytes())
+    return run_signature_case(samples, args.max_time_seconds, streaming=True)
+
+
+def case_signature_fixture(args):
+    return run_signature_case(load_fixture(args.fixture), args.max_time_seconds)
+
+
+def case_decoded_message(args):
+    from ShazamAPI.algorithm import SignatureGenerator
+    from ShazamAPI.signature_format import DecodedMessage
+
+    generator = SignatureGenerator()
+    generator.MAX_TIME_SECONDS = args.max_time_seconds
+    generator.feed_input(array.array("h", synthetic_pcm(min(args.seconds, 10)).tobytes()))
+    signatures = list(generator)
+    binaries = [sig.encode_to_binary() for sig in signatures]
+    uris = [sig.encode_to_uri() for sig in signatures]
+
+    rounds = args.rounds
+    started = time.process_time()
+    for _ in range(rounds):
+        for sig in signatures:
+            sig.encode_to_binary()
+    encode_s = time.process_time() - started
+
+    started = time.process_time()
+    for _ in range(rounds):
+        for data in binaries:
+            DecodedMessage.decode_from_binary(data)
+    decode_s = time.process_time() - started
+
+    started = time.process_time()
+    for _ in range(rounds):
+        for uri in uris:
+            DecodedMessage.decode_from_uri(uri).encode_to_uri()
+    uri_roundtrip_s = time.process_time() - started
+
+    roundtrip_ok = all(
+        DecodedMessage.decode_from_binary(data).encode_to_binary() == data for data in binaries
+    )
+    ops = rounds * len(signatures)
+    return {
+        "messages": len(signatures),
+        "encode_per_second": round(ops / encode_s) if encode_s else None,
+        "decode_per_second": round(ops / decode_s) if decode_s else None,
+        "uri_roundtrip_per_second": round(ops / uri_roundtrip_s) if uri_roundtrip_s else None,
+        "roundtrip_ok": roundtrip_ok,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def case_normalize(args):
+    from pydub import AudioSegment
+    from ShazamAPI.api import Shazam
+
+    pcm = synthetic_pcm(args.normalize_seconds, frame_rate=44100, channels=2)
+    audio = AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=44100, channels=2)
+    del pcm
+    rss_before = peak_rss_mb()
+
+    cpu_started = time.process_time()
+    normalized = Shazam().normalize_audio_data(audio)
+    cpu = time.process_time() - cpu_started
+
+    return {
+        "audio_seconds": round(audio.duration_seconds, 2),
+        "cpu_seconds": round(cpu, 3),
+        "audio_seconds_per_cpu_second": round(audio.duration_seconds / cpu, 3) if cpu else None,
+        "output_frame_rate": normalized.frame_rate,
+        "output_channels": normalized.channels,
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+    }
+
+
+CASES = {
+    "signature_synthetic": case_signature_synthetic,
+    "signature_streaming": case_signature_streaming,
+    "signature_fixture": case_signature_fixture,
+    "decoded_message": case_decoded_message,
+    "normalize": case_normalize,
+}
+
+
+# ----------------------------
+# Driver
+# ----------------------------
+def run_in_subprocess(case, args, fixture=None):
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "--run-case", case,
+        "--seconds", str(args.seconds), "--max-time-seconds", str(args.max_time_seconds),
+        "--rounds", str(args.rounds), "--normalize-seconds", str(args.normalize_seconds),
+    ]
+    if fixture:
+        cmd += ["--fixture", fixture]
+    completed = subprocess.run(cmd, cwd=HERE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if completed.returncode != 0:
+        return {"error": completed.stderr.decode("utf-8", errors="ignore").strip().splitlines()[-1:]}
+    return json.loads(completed.stdout.decode("utf-8").strip().splitlines()[-1])
+
+
+def load_golden():
+    if not os.path.exists(GOLDEN_PATH):
+        return {}
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def golden_key(name, args):
+    # signatures depend on the input and on how much audio goes in each one
+    return f"{name}|seconds={args.seconds}|max_time={args.max_time_seconds}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline fingerprinting path")
+    parser.add_argument("--seconds", type=float, default=12, help="synthetic audio length")
+    parser.add_argument("--max-time-seconds", type=float, default=8, help="audio per signature (Shazam default)")
+    parser.add_argument("--normalize-seconds", type=float, default=300,
+                        help="length of the 44.1 kHz stereo input for normalize_audio_data")
+    parser.add_argument("--rounds", type=int, default=200, help="DecodedMessage round trips per message")
+    parser.add_argument("--fixture", action="append", default=[], help="recorded audio file (repeatable)")
+    parser.add_argument("--update-golden", action="store_true", help="rewrite golden signature hashes")
+    parser.add_argument("--json", help="write measurements to this file")
+    parser.add_argument("--run-case", choices=sorted(CASES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        if args.fixture:
+            args.fixture = args.fixture[0]
+        print(json.dumps(CASES[args.run_case](args)))
+        return
+
+    runs = [
+        ("signature_synthetic", golden_key("synthetic", args), None),
+        # block-by-block feeding is checked against the same golden hashes
+        ("signature_streaming", golden_key("synthetic", args), None),
+    ]
+    for path in args.fixture:
+        runs.append(("signature_fixture", golden_key(fixture_id(path), args), path))
+    runs += [("decoded_message", None, None), ("normalize", None, None)]
+
+    golden = load_golden()
+    results = {}
+    mismatches = []
+    for case, key, fixture in runs:
+        label = f"{key} [{case}]" if key else case
+        result = run_in_subprocess(case, args, fixture)
+        results[label] = result
+        if "error" in result:
+            print(f"{label:<48} failed: {result['error']}")
+            continue
+
+        status = ""
+        if key is not None:
+            signatures = result["signatures"]
+            if args.update_golden and case != "signature_streaming":
+                golden[key] = signatures
+                status = "golden updated"
+            elif key not in golden:
+                status = "no golden (run --update-golden)"
+            elif golden[key] != signatures:
+                status = "SIGNATURE MISMATCH"
+                mismatches.append(label)
+            else:
+                status = f"{len(signatures)} signatures match"
+
+        shown = {k: v for k, v in result.items() if k != "signatures"}
+        print(f"{label:<48} {status}")
+        for name, value in shown.items():
+            print(f"    {name:<32} {value}")
+
+    if args.update_golden:
+        with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+            json.dump(golden, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {GOLDEN_PATH}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version, "results": results}, f, indent=2)
+        print(f"Wrote {args.json}")
+
+    if mismatches:
+        print(f"Signatures differ from golden: {', '.join(mismatches)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# bench_startup.py
+# Startup-time benchmark: imports each module in a fresh interpreter with
+# `python -X importtime` and records its cumulative import time, so we can keep
+# service cold starts under a budget.
+#
+#   python bench_startup.py                    # table + budget check
+#   python bench_startup.py --json out.json    # also write the measurements
+#   python bench_startup.py --budget-ms 800    # override the app.py budget
+#
+# Exit code is 1 when any module exceeds its budget.
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+# Budgets in milliseconds (cumulative import time in a cold interpreter).
+# app.py must stay light: everything heavy is imported on first use.
+BUDGETS_MS = {
+    "app": 400,
+    "audio_pool": 50,
+    "clear": 100,
+    "split_audio": 50,
+    "test": 50,
+    "yt": 50,
+}
+
+# Reported for reference only (these are what the lazy imports avoid).
+REFERENCE_MODULES = [
+    "boto3",
+    "mutagen.mp3",
+    "pydub",
+    "yt_dlp",
+    "librosa",
+    "scipy.signal",
+    "detect_partition_point",
+]
+
+IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure_import(module_name, top=5):
+    """
+    Import module_name in a fresh interpreter.
+    Returns dict with cumulative ms and the heaviest transitive imports.
+    """
+    env = dict(os.environ)
+    # app.py refuses to import without a key; the value is irrelevant here
+    env.setdefault("AUDD_API_KEY", "benchmark")
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    stderr = completed.stderr.decode("utf-8", errors="ignore")
+    if completed.returncode != 0:
+        return {"module": module_name, "error": stderr.strip().splitlines()[-1:]}
+
+    total_us = None
+    direct_children = []
+    pending_children = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        cumulative_us = int(match.group(2))
+        # nested imports are indented by two spaces per level
+        indent = len(match.group(3)) - 1
+        name = match.group(4)
+        # children are listed right before their parent
+        if indent == 0:
+            if name == module_name:
+                total_us = cumulative_us
+                direct_children = pending_children
+            pending_children = []
+        elif indent == 2:
+            pending_children.append((cumulative_us, name))
+
+    heaviest = sorted(direct_children, reverse=True)[:top]
+    return {
+        "module": module_name,
+        "import_ms": round((total_us or 0) / 1000, 1),
+        "heaviest": [{"module": name, "ms": round(us / 1000, 1)} for us, name in heaviest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure per-module import time")
+    parser.add_argument("--json", help="write measurements to this file")
+    parser.add_argument("--budget-ms", type=float, help="override the budget for app.py")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module (best is kept)")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    if args.budget_ms is not None:
+        budgets["app"] = args.budget_ms
+
+    results = []
+    over_budget = []
+    for module_name in list(budgets) + REFERENCE_MODULES:
+        runs = [measure_import(module_name) for _ in range(max(1, args.repeat))]
+        ok_runs = [r for r in runs if "error" not in r]
+        if not ok_runs:
+            result = runs[0]
+            print(f"{module_name:<24} import failed: {result['error']}")
+            results.append(result)
+            continue
+
+        result = min(ok_runs, key=lambda r: r["import_ms"])
+        budget = budgets.get(module_name)
+        result["budget_ms"] = budget
+        results.append(result)
+
+        status = ""
+        if budget is not None:
+            status = "OK" if result["import_ms"] <= budget else "OVER BUDGET"
+            if status != "OK":
+                over_budget.append(module_name)
+        heaviest = ", ".join(f"{h['module']} {h['ms']}ms" for h in result["heaviest"][:3])
+        budget_str = f"/ {budget:>6.0f} ms" if budget is not None else " " * 11
+        print(f"{module_name:<24} {result['import_ms']:>8.1f} ms {budget_str}  {status:<12} {heaviest}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version, "results": results}, f, indent=2)
+        print(f"Wrote {args.json}")
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# coalescing.py
+# Run-length coalescing of chunk results in the detect loops.
+#
+# When AudD recognizes chunk N and reports where the excerpt sits inside the
+# track (timecode) and how long the track is (duration), the end of the track
+# in the episode is predicted as
+#
+#   track_end = chunk_start + duration - timecode
+#
+# Chunks that lie entirely before track_end - COALESCE_MARGIN_SECONDS almost
+# certainly contain the same track: they are not sent to AudD but merged into
+# the cue entry of chunk N. Every COALESCE_VERIFY_EVERY-th of those chunks is
+# still sent as a sparse check; if it disagrees (the track was cut short, an
+# edit...) the prediction is dropped and chunks are queried one by one again.
+#
+#   coalescer = TrackCoalescer()
+#   action = coalescer.plan(start, end)          # "query" | "verify" | "skip"
+#   continues = coalescer.observe(start, details, action, sent=True)
+#
+# A planned query/verify that the music gate drops (gating.py) is observed
+# with sent=False: it ends the predicted track like an unrecognized chunk,
+# but is counted as gated rather than queried.
+#
+# Env:
+#   COALESCE_ENABLED          0 queries every chunk (default 1)
+#   COALESCE_MARGIN_SECONDS   stop skipping this long before the predicted end (default 5)
+#   COALESCE_VERIFY_EVERY     verify every n-th predicted chunk, 0 = never (default 3)
+
+import os
+
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "1") == "1"
+COALESCE_MARGIN_SECONDS = float(os.getenv("COALESCE_MARGIN_SECONDS", 5))
+COALESCE_VERIFY_EVERY = int(os.getenv("COALESCE_VERIFY_EVERY", 3))
+
+QUERY = "query"
+VERIFY = "verify"
+SKIP = "skip"
+
+
+def same_track(a, b):
+    return bool(a and b) and a.get('title') == b.get('title') and a.get('artist') == b.get('artist')
+
+
+class TrackCoalescer:
+    def __init__(self, enabled=None, margin=None, verify_every=None):
+        self.enabled = COALESCE_ENABLED if enabled is None else enabled
+        self.margin = COALESCE_MARGIN_SECONDS if margin is None else margin
+        self.verify_every = COALESCE_VERIFY_EVERY if verify_every is None else verify_every
+
+        self.track = None        # details of the track currently playing
+        self.track_end = None    # predicted end in episode seconds
+        self.run_length = 0      # predicted chunks since the last query
+
+        self.queried = 0
+        self.verified = 0
+        self.skipped = 0
+        self.gated = 0
+        self.mismatches = 0
+
+    def plan(self, start, end):
+        """What to do with the chunk [start, end): QUERY, VERIFY or SKIP."""
+        if not self.enabled or self.track_end is None or end > self.track_end - self.margin:
+            self.run_length = 0
+            return QUERY
+
+        self.run_length += 1
+        if self.verify_every and self.run_length % self.verify_every == 0:
+            return VERIFY
+        self.skipped += 1
+        return SKIP
+
+    def observe(self, start, details, action=QUERY, sent=True):
+        """
+        Record the AudD details (None if nothing was recognized) of a queried
+        or verified chunk starting at `start`; sent=False when the gate kept
+        it from AudD. Returns True when the chunk continues the current track
+        and can be merged into its entry.
+        """
+        continues = same_track(self.track, details)
+        if not sent:
+            self.gated += 1
+        elif action == VERIFY:
+            self.verified += 1
+            if not continues:
+                self.mismatches += 1
+        else:
+            self.queried += 1
+
+        if not details or not details.get('title'):
+            self.track = None
+            self.track_end = None
+            return False
+
+        self.track = details
+        duration = details.get('duration')
+        timecode = details.get('timecode')
+        if duration is not None and timecode is not None and timecode < duration:
+            self.track_end = start + duration - timecode
+        elif not continues:
+            self.track_end = None
+        return continues
+
+    def stats(self):
+        sent = self.queried + self.verified
+        total = sent + self.skipped + self.gated
+        return {
+            "chunks": total,
+            "queried": self.queried,
+            "verified": self.verified,
+            "skipped": self.skipped,
+            "gated": self.gated,
+            "mismatches": self.mismatches,
+            "savedRatio": round(self.skipped / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,162 @@
+# jobs.py
+# Per-job state for the upload -> detect pipeline.
+#
+# Every upload gets a JobState keyed by its userId / parent UUID, holding the
+# progress counters and stage timings that used to live in module globals of
+# app.py (and were shared by every concurrent user). The registry is
+# thread-safe, so the app can serve many jobs from one process with threads:
+#
+#   state = jobs.registry.create(user_id, kind="upload")
+#   state.update(total_chunks=n)
+#   ...
+#   state.advance()
+#
+# Stage timings are added by tracing.span() for spans carrying the job id,
+# gate statistics (gating.GateStats) per episode by the detect loops.
+#
+#   GET /progress/<job_id>  ->  state.to_dict()
+#
+# Finished jobs are kept JOB_STATE_TTL seconds (default 3600) so the frontend
+# can read the final numbers, then dropped.
+
+import os
+import threading
+import time
+
+import gating
+
+JOB_STATE_TTL = int(os.getenv("JOB_STATE_TTL", 3600))
+
+STATUS_CREATED = "created"
+STATUS_UPLOADED = "uploaded"
+STATUS_DETECTING = "detecting"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+FINISHED = (STATUS_DONE, STATUS_FAILED)
+
+
+class JobState:
+    def __init__(self, job_id, kind=None):
+        self.job_id = job_id
+        self.kind = kind
+        self.status = STATUS_CREATED
+        self.total_chunks = 0
+        self.processed_chunks = 0
+        self.video_duration = None
+        self.duration_seconds = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at = None
+        self.timings = {}  # stage -> seconds (accumulated, see tracing.py)
+        self.gating = {}  # episode -> gating.GateStats
+        self._lock = threading.Lock()
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                if name.startswith("_") or not hasattr(self, name):
+                    raise AttributeError(f"JobState has no field {name!r}")
+                setattr(self, name, value)
+            self.updated_at = time.time()
+            if self.status in FINISHED and self.finished_at is None:
+                self.finished_at = self.updated_at
+
+    def add_chunks(self, count):
+        with self._lock:
+            self.total_chunks += count
+            self.updated_at = time.time()
+
+    def advance(self, count=1):
+        with self._lock:
+            self.processed_chunks += count
+            self.updated_at = time.time()
+            return self.processed_chunks
+
+    def add_timing(self, stage, seconds):
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def gate_stats(self, episode):
+        with self._lock:
+            stats = self.gating.get(episode)
+            if stats is None:
+                stats = self.gating[episode] = gating.GateStats(episode)
+            return stats
+
+    def fail(self, error):
+        self.update(status=STATUS_FAILED, error=str(error))
+
+    def to_dict(self):
+        with self._lock:
+            total = self.total_chunks
+            done = self.processed_chunks
+            elapsed = (self.finished_at or time.time()) - self.created_at
+            detect_s = self.timings.get("detect.chunk")
+            eta = None
+            if self.status == STATUS_DETECTING and done and total > done and detect_s:
+                eta = round(detect_s / done * (total - done), 1)
+            return {
+                "jobId": self.job_id,
+                "kind": self.kind,
+                "status": self.status,
+                "totalChunks": total,
+                "processedChunks": done,
+                "progress": round(done / total, 4) if total else 0.0,
+                "videoDuration": self.video_duration,
+                "durationSeconds": self.duration_seconds,
+                "error": self.error,
+                "elapsedSeconds": round(elapsed, 2),
+                "etaSeconds": eta,
+                "timings": {stage: round(s, 3) for stage, s in self.timings.items()},
+                "gating": {episode: stats.to_dict() for episode, stats in self.gating.items()},
+            }
+
+
+class JobRegistry:
+    def __init__(self, ttl=JOB_STATE_TTL):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, **fields):
+        """
+        Register a fresh JobState (replacing any previous one with this id).
+        """
+        state = JobState(job_id, kind=fields.pop("kind", None))
+        if fields:
+            state.update(**fields)
+        with self._lock:
+            self._prune_locked()
+            self._jobs[job_id] = state
+        return state
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def get_or_create(self, job_id, **fields):
+        with self._lock:
+            state = self._jobs.get(job_id)
+        return state if state is not None else self.create(job_id, **fields)
+
+    def remove(self, job_id):
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def snapshot(self):
+        with self._lock:
+            states = list(self._jobs.values())
+        return [state.to_dict() for state in states]
+
+    def _prune_locked(self):
+        cutoff = time.time() - self.ttl
+        for job_id, state in list(self._jobs.items()):
+            finished = state.finished_at is not None and state.finished_at < cutoff
+            # uploads that were never detected would otherwise stay forever
+            abandoned = state.updated_at < cutoff - self.ttl
+            if finished or abandoned:
+                del self._jobs[job_id]
+
+
+registry = JobRegistry()
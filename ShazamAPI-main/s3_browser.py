@@ -0,0 +1,143 @@
+# s3_browser.py
+# S3 access for the folder browser (/api/s3/fetch-s3) and the ingest paths:
+#   - a pool of boto3 clients keyed by credentials (clients are thread-safe
+#     and expensive to build, so they're reused across requests)
+#   - list_s3_objects() with full pagination, or one page at a time with the
+#     continuation token handed back to the caller
+#   - a short-TTL listing cache; every listing carries an ETag computed from
+#     its contents so callers can revalidate with If-None-Match. Nothing here
+#     writes to the buckets, so entries are only dropped by expiry: a listing
+#     can be up to S3_LIST_CACHE_TTL seconds behind changes made elsewhere.
+#
+# Env:
+#   S3_CLIENT_POOL_SIZE   max cached clients (default 32)
+#   S3_LIST_CACHE_TTL     seconds a listing is served from cache (default 30)
+#   S3_LIST_CACHE_SIZE    max cached listings (default 256)
+#   S3_ENDPOINT_URL       S3-compatible endpoint used for listings
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+S3_CLIENT_POOL_SIZE = int(os.getenv("S3_CLIENT_POOL_SIZE", 32))
+S3_LIST_CACHE_TTL = float(os.getenv("S3_LIST_CACHE_TTL", 30))
+S3_LIST_CACHE_SIZE = int(os.getenv("S3_LIST_CACHE_SIZE", 256))
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+
+_clients = OrderedDict()
+_clients_lock = threading.Lock()
+
+_listings = OrderedDict()
+_listings_lock = threading.Lock()
+
+
+def _credentials_id(access_key, secret_key):
+    # never keep raw secrets in dict keys / logs
+    return hashlib.sha256(f"{access_key}:{secret_key}".encode("utf-8")).hexdigest()
+
+
+def get_s3_client(access_key, secret_key, endpoint_url=None):
+    """
+    Return a pooled boto3 S3 client for these credentials (LRU bounded).
+    """
+    pool_key = (_credentials_id(access_key, secret_key), endpoint_url)
+    with _clients_lock:
+        client = _clients.get(pool_key)
+        if client is not None:
+            _clients.move_to_end(pool_key)
+            return client
+
+    import boto3
+    client = boto3.client(
+        's3',
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        endpoint_url=endpoint_url,
+    )
+    with _clients_lock:
+        client = _clients.setdefault(pool_key, client)
+        _clients.move_to_end(pool_key)
+        while len(_clients) > S3_CLIENT_POOL_SIZE:
+            _clients.popitem(last=False)
+    return client
+
+
+def _listing_etag(folders, objects):
+    digest = hashlib.sha1()
+    for prefix in folders:
+        digest.update(b"P" + prefix.encode("utf-8"))
+    for obj in objects:
+        digest.update(b"K" + obj['Key'].encode("utf-8"))
+        digest.update(str(obj.get('ETag', '')).encode("utf-8"))
+        digest.update(str(obj.get('Size', '')).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _fetch_listing(s3_client, bucket_name, prefix, continuation_token, max_keys):
+    params = {'Bucket': bucket_name, 'Prefix': prefix, 'Delimiter': '/'}
+    if max_keys:
+        params['MaxKeys'] = max_keys
+
+    folders = []
+    objects = []
+    next_token = None
+    single_page = bool(max_keys or continuation_token)
+    token = continuation_token
+    while True:
+        if token:
+            params['ContinuationToken'] = token
+        response = s3_client.list_objects_v2(**params)
+        folders.extend(folder['Prefix'] for folder in response.get('CommonPrefixes', []))
+        objects.extend(response.get('Contents', []))
+        token = response.get('NextContinuationToken') if response.get('IsTruncated') else None
+        if single_page or not token:
+            next_token = token if single_page else None
+            break
+
+    return {
+        'folders': folders,
+        'files': [obj['Key'] for obj in objects if obj['Key'] != prefix],
+        'next_continuation_token': next_token,
+        'is_truncated': next_token is not None,
+        'etag': _listing_etag(folders, objects),
+    }
+
+
+def list_s3_objects(access_key, secret_key, bucket_name, prefix='',
+                    continuation_token=None, max_keys=None, refresh=False):
+    """
+    List the folders and files directly under prefix.
+
+    Without continuation_token/max_keys every page is fetched. With either of
+    them a single page is returned along with 'next_continuation_token' to
+    request the next one. Results are cached for S3_LIST_CACHE_TTL seconds;
+    refresh=True bypasses the cache. Returns {'error': ...} on S3 errors.
+    """
+    from botocore.exceptions import BotoCoreError, ClientError
+
+    cache_key = (_credentials_id(access_key, secret_key), bucket_name, prefix, continuation_token, max_keys)
+    now = time.monotonic()
+    if not refresh and S3_LIST_CACHE_TTL > 0:
+        with _listings_lock:
+            cached = _listings.get(cache_key)
+            if cached is not None and cached[0] > now:
+                _listings.move_to_end(cache_key)
+                return dict(cached[1], cached=True)
+
+    try:
+        s3_client = get_s3_client(access_key, secret_key, S3_ENDPOINT_URL)
+        listing = _fetch_listing(s3_client, bucket_name, prefix, continuation_token, max_keys)
+    except (ClientError, BotoCoreError) as e:
+        print(f"Error accessing S3: {e}")
+        return {'error': str(e)}
+
+    if S3_LIST_CACHE_TTL > 0:
+        with _listings_lock:
+            _listings[cache_key] = (now + S3_LIST_CACHE_TTL, listing)
+            _listings.move_to_end(cache_key)
+            while len(_listings) > S3_LIST_CACHE_SIZE:
+                _listings.popitem(last=False)
+
+    return dict(listing, cached=False)
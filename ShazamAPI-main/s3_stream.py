@@ -0,0 +1,137 @@
+# s3_stream.py
+# Streaming S3 ingest: the object body is fetched with ranged GETs and piped
+# straight into ffmpeg's stdin; ffmpeg emits 16 kHz mono s16le PCM on stdout,
+# which is cut into fixed-length chunks for the recognizer. The episode itself
+# is never written to disk, only the chunks a provider needs.
+#
+#   for index, pcm in iter_pcm_chunks(iter_object_ranges(s3, bucket, key)):
+#       ...
+#
+# Note: containers that need seeking (MP4 with the moov atom at the end) can't
+# be decoded from a pipe; ingest_s3_object() raises and the caller should fall
+# back to a staged download for those.
+#
+# Env:
+#   S3_STREAM_RANGE_MB   size of each ranged GET (default 8 MB)
+
+import os
+import subprocess
+import threading
+
+S3_STREAM_RANGE_MB = int(os.getenv("S3_STREAM_RANGE_MB", 8))
+
+PCM_FRAME_RATE = 16000
+PCM_CHANNELS = 1
+PCM_SAMPLE_WIDTH = 2
+PCM_BYTES_PER_SECOND = PCM_FRAME_RATE * PCM_CHANNELS * PCM_SAMPLE_WIDTH
+
+_READ_BLOCK = 256 * 1024
+
+
+def iter_object_ranges(s3, bucket_name, file_key, range_size=None):
+    """
+    Yield the bytes of an S3 object using sequential ranged GETs, so a failed
+    or slow request only costs one range instead of the whole episode.
+    """
+    range_size = range_size or S3_STREAM_RANGE_MB * 1024 * 1024
+    size = s3.head_object(Bucket=bucket_name, Key=file_key)['ContentLength']
+    for start in range(0, size, range_size):
+        end = min(start + range_size, size) - 1
+        response = s3.get_object(Bucket=bucket_name, Key=file_key, Range=f"bytes={start}-{end}")
+        for block in response['Body'].iter_chunks(chunk_size=_READ_BLOCK):
+            yield block
+
+
+def iter_pcm_chunks(byte_iter, chunk_seconds=10):
+    """
+    Decode an encoded audio/video byte stream with ffmpeg and yield
+    (chunk_number, pcm_bytes) for consecutive chunk_seconds windows,
+    chunk numbers starting at 1. The last chunk may be shorter.
+    """
+    cmd = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", "pipe:0",
+        "-vn",
+        "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ac", str(PCM_CHANNELS), "-ar", str(PCM_FRAME_RATE),
+        "pipe:1",
+    ]
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    feed_errors = []
+    stderr_tail = []
+
+    def feed():
+        try:
+            for block in byte_iter:
+                proc.stdin.write(block)
+        except BrokenPipeError:
+            pass  # ffmpeg exited early, its stderr says why
+        except Exception as e:
+            feed_errors.append(e)
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    def drain_stderr():
+        for line in proc.stderr:
+            stderr_tail.append(line)
+            del stderr_tail[:-20]
+
+    feeder = threading.Thread(target=feed, daemon=True)
+    drainer = threading.Thread(target=drain_stderr, daemon=True)
+    feeder.start()
+    drainer.start()
+
+    chunk_bytes = chunk_seconds * PCM_BYTES_PER_SECOND
+    chunk_number = 0
+    finished = False
+    try:
+        while True:
+            pcm = proc.stdout.read(chunk_bytes)
+            if not pcm:
+                break
+            chunk_number += 1
+            yield chunk_number, pcm
+        finished = True
+    finally:
+        if not finished:
+            # consumer stopped early (or failed): don't wait for the full decode
+            proc.kill()
+        proc.stdout.close()
+        returncode = proc.wait()
+        feeder.join()
+        drainer.join()
+
+    if feed_errors:
+        raise feed_errors[0]
+    if returncode != 0:
+        raise RuntimeError(b"".join(stderr_tail).decode("utf-8", errors="ignore") or f"ffmpeg exited with {returncode}")
+
+
+def save_pcm_chunk(pcm, chunk_path, format="mp3"):
+    from pydub import AudioSegment
+    segment = AudioSegment(
+        data=pcm,
+        sample_width=PCM_SAMPLE_WIDTH,
+        frame_rate=PCM_FRAME_RATE,
+        channels=PCM_CHANNELS,
+    )
+    segment.export(chunk_path, format=format)
+
+
+def ingest_s3_object(s3, bucket_name, file_key, chunks_folder, chunk_seconds=10):
+    """
+    Stream one S3 object into chunkNN.mp3 files (same naming as
+    split_audio_file). Every chunk is persisted: the music gate (gating.py)
+    runs later in the detect loop, which needs the full chunk sequence.
+    Returns the decoded duration in seconds.
+    """
+    os.makedirs(chunks_folder, exist_ok=True)
+    total_bytes = 0
+    for chunk_number, pcm in iter_pcm_chunks(iter_object_ranges(s3, bucket_name, file_key), chunk_seconds):
+        total_bytes += len(pcm)
+        chunk_name = f"chunk{str(chunk_number).zfill(2)}.mp3"
+        save_pcm_chunk(pcm, os.path.join(chunks_folder, chunk_name))
+    return total_bytes / PCM_BYTES_PER_SECOND
@@ -0,0 +1,328 @@
+# scratch.py
+# Scratch-space manager for ShazamAPI/chunks and ShazamAPI/eps.
+#
+# Every upload creates a job directory named after its UUID under each scratch
+# folder (chunks/<uuid>, eps/<uuid>). Instead of wiping everything once a day,
+# a periodic sweep evicts whole jobs:
+#   - older than SCRATCH_MAX_AGE_HOURS (last modification or lease heartbeat)
+#   - least recently used first while the total is above the high watermark,
+#     until it drops below the low watermark
+# Jobs that hold a lease are never evicted:
+#
+#   with scratch.lease(parent_uuid):
+#       ... write/read chunks ...
+#
+# Leases are files in <base>/.leases/ refreshed by a heartbeat thread, so they
+# are honoured across gunicorn workers; a crashed worker's lease expires after
+# SCRATCH_LEASE_TTL seconds.
+#
+# Env:
+#   SCRATCH_MAX_AGE_HOURS        evict jobs idle for longer (default 24)
+#   SCRATCH_HIGH_WATERMARK_GB    start LRU eviction above this (default 20)
+#   SCRATCH_LOW_WATERMARK_GB     ...and stop below this (default 15)
+#   SCRATCH_SWEEP_INTERVAL       seconds between sweeps (default 300)
+#   SCRATCH_LEASE_TTL            seconds before an unrefreshed lease expires (default 600)
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+SCRATCH_BASE_DIR = "ShazamAPI"
+SCRATCH_FOLDERS = ["chunks", "eps"]
+SCRATCH_MAX_AGE_HOURS = float(os.getenv("SCRATCH_MAX_AGE_HOURS", 24))
+SCRATCH_HIGH_WATERMARK_GB = float(os.getenv("SCRATCH_HIGH_WATERMARK_GB", 20))
+SCRATCH_LOW_WATERMARK_GB = float(os.getenv("SCRATCH_LOW_WATERMARK_GB", 15))
+SCRATCH_SWEEP_INTERVAL = int(os.getenv("SCRATCH_SWEEP_INTERVAL", 300))
+SCRATCH_LEASE_TTL = int(os.getenv("SCRATCH_LEASE_TTL", 600))
+
+LEASES_DIR = ".leases"
+GB = 1024 ** 3
+
+
+def _tree_stats(path):
+    """
+    Return (total_bytes, newest_mtime) of a directory tree.
+    """
+    total = 0
+    newest = 0.0
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            newest = max(newest, os.stat(current).st_mtime)
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            st = entry.stat(follow_symlinks=False)
+                            total += st.st_size
+                            newest = max(newest, st.st_mtime)
+                    except FileNotFoundError:
+                        pass
+        except FileNotFoundError:
+            pass
+    return total, newest
+
+
+class ScratchManager:
+    def __init__(self, base_dir=SCRATCH_BASE_DIR, folders=SCRATCH_FOLDERS,
+                 max_age_hours=SCRATCH_MAX_AGE_HOURS,
+                 high_watermark_gb=SCRATCH_HIGH_WATERMARK_GB,
+                 low_watermark_gb=SCRATCH_LOW_WATERMARK_GB,
+                 lease_ttl=SCRATCH_LEASE_TTL):
+        self.base_dir = base_dir
+        self.folders = list(folders)
+        self.max_age_seconds = max_age_hours * 3600
+        self.high_watermark = int(high_watermark_gb * GB)
+        self.low_watermark = int(min(low_watermark_gb, high_watermark_gb) * GB)
+        self.lease_ttl = lease_ttl
+
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._leases = {}  # token -> lease file path (held by this process)
+        self._heartbeat = None
+        self._stats = {
+            "sweeps": 0,
+            "evicted_jobs": 0,
+            "evicted_bytes": 0,
+            "last_sweep_at": None,
+            "last_sweep_ms": None,
+            "last_sweep_evicted": [],
+        }
+
+    # ----------------------------
+    # Leases
+    # ----------------------------
+    @property
+    def leases_dir(self):
+        return os.path.join(self.base_dir, LEASES_DIR)
+
+    def acquire(self, job_id):
+        """
+        Take a lease on job_id and return its token. The job's directories
+        won't be evicted until release(token) (or the lease TTL runs out).
+        """
+        job_id = str(job_id)
+        if not job_id or job_id.startswith(".") or os.path.basename(job_id) != job_id:
+            raise ValueError(f"invalid job id: {job_id!r}")
+        os.makedirs(self.leases_dir, exist_ok=True)
+        token = uuid.uuid4().hex
+        path = os.path.join(self.leases_dir, f"{job_id}.{token}")
+        open(path, "w").close()
+        with self._lock:
+            self._leases[token] = path
+            self._ensure_heartbeat()
+        return token
+
+    def release(self, token):
+        with self._lock:
+            path = self._leases.pop(token, None)
+        if path:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @contextmanager
+    def lease(self, job_id):
+        token = self.acquire(job_id)
+        try:
+            yield token
+        finally:
+            self.release(token)
+
+    def _ensure_heartbeat(self):
+        # caller holds self._lock
+        if self._heartbeat is None or not self._heartbeat.is_alive():
+            self._heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+            self._heartbeat.start()
+
+    def _heartbeat_loop(self):
+        interval = max(1, self.lease_ttl // 3)
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                paths = list(self._leases.values())
+            for path in paths:
+                try:
+                    os.utime(path)
+                except FileNotFoundError:
+                    # swept as stale (e.g. clock jump): recreate it
+                    try:
+                        open(path, "w").close()
+                    except OSError as e:
+                        print(f"[scratch] could not refresh lease {path}: {e}")
+
+    def active_leases(self):
+        """
+        Return {job_id: newest_heartbeat} for unexpired leases, removing the
+        expired ones.
+        """
+        leases = {}
+        now = time.time()
+        try:
+            entries = list(os.scandir(self.leases_dir))
+        except FileNotFoundError:
+            return leases
+        for entry in entries:
+            job_id = entry.name.rsplit(".", 1)[0]
+            try:
+                mtime = entry.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if now - mtime > self.lease_ttl:
+                print(f"[scratch] dropping expired lease {entry.name}")
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+                continue
+            leases[job_id] = max(mtime, leases.get(job_id, 0.0))
+        return leases
+
+    def is_leased(self, job_id):
+        return job_id in self.active_leases()
+
+    # ----------------------------
+    # Inventory / eviction
+    # ----------------------------
+    def jobs(self):
+        """
+        Scan the scratch folders. Returns {job_id: {"bytes", "last_used", "paths"}}.
+        """
+        jobs = {}
+        for folder in self.folders:
+            folder_path = os.path.join(self.base_dir, folder)
+            if not os.path.isdir(folder_path):
+                continue
+            for entry in os.scandir(folder_path):
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                size, newest = _tree_stats(entry.path)
+                job = jobs.setdefault(entry.name, {"bytes": 0, "last_used": 0.0, "paths": []})
+                job["bytes"] += size
+                job["last_used"] = max(job["last_used"], newest)
+                job["paths"].append(entry.path)
+        return jobs
+
+    def _evict(self, job_id, job, reason):
+        for path in job["paths"]:
+            shutil.rmtree(path, ignore_errors=True)
+        print(f"[scratch] evicted {job_id} ({job['bytes'] / 1024 ** 2:.1f} MB, {reason})")
+
+    def sweep(self, now=None):
+        """
+        Evict expired jobs, then LRU jobs while above the high watermark.
+        Leased jobs are skipped. Returns a summary of this sweep.
+        """
+        with self._sweep_lock:
+            started = time.perf_counter()
+            now = now or time.time()
+            jobs = self.jobs()
+            leases = self.active_leases()
+            total = sum(job["bytes"] for job in jobs.values())
+
+            evicted = []
+
+            def evict(job_id, reason):
+                nonlocal total
+                # re-check right before deleting: a lease may have just been taken
+                if self.is_leased(job_id):
+                    return False
+                job = jobs.pop(job_id)
+                self._evict(job_id, job, reason)
+                total -= job["bytes"]
+                evicted.append({"job_id": job_id, "bytes": job["bytes"], "reason": reason})
+                return True
+
+            for job_id, job in list(jobs.items()):
+                last_used = max(job["last_used"], leases.get(job_id, 0.0))
+                if job_id not in leases and now - last_used > self.max_age_seconds:
+                    evict(job_id, "age")
+
+            if total > self.high_watermark:
+                lru = sorted(
+                    (job_id for job_id in jobs if job_id not in leases),
+                    key=lambda job_id: jobs[job_id]["last_used"],
+                )
+                for job_id in lru:
+                    if total <= self.low_watermark:
+                        break
+                    evict(job_id, "watermark")
+                if total > self.high_watermark:
+                    print(f"[scratch] still {total / GB:.2f} GB after eviction, "
+                          f"{len(leases)} job(s) are leased")
+
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            with self._lock:
+                self._stats["sweeps"] += 1
+                self._stats["evicted_jobs"] += len(evicted)
+                self._stats["evicted_bytes"] += sum(e["bytes"] for e in evicted)
+                self._stats["last_sweep_at"] = datetime.now().isoformat(timespec="seconds")
+                self._stats["last_sweep_ms"] = elapsed_ms
+                self._stats["last_sweep_evicted"] = evicted
+            return {"evicted": evicted, "total_bytes": total, "elapsed_ms": elapsed_ms}
+
+    def clear(self):
+        """
+        Remove every job that isn't leased (the old daily wipe, made safe).
+        """
+        leases = self.active_leases()
+        for job_id, job in self.jobs().items():
+            if job_id in leases:
+                print(f"[scratch] keeping leased job {job_id}")
+                continue
+            self._evict(job_id, job, "clear")
+
+    def usage(self):
+        """
+        Current scratch usage plus cumulative eviction counters.
+        """
+        jobs = self.jobs()
+        leases = self.active_leases()
+        now = time.time()
+        by_folder = {folder: 0 for folder in self.folders}
+        for job in jobs.values():
+            for path in job["paths"]:
+                folder = os.path.basename(os.path.dirname(path))
+                by_folder[folder] = by_folder.get(folder, 0) + _tree_stats(path)[0]
+        try:
+            disk = shutil.disk_usage(self.base_dir)
+            disk_info = {"total_bytes": disk.total, "free_bytes": disk.free}
+        except OSError:
+            disk_info = None
+        with self._lock:
+            stats = dict(self._stats)
+        return {
+            "total_bytes": sum(job["bytes"] for job in jobs.values()),
+            "bytes_by_folder": by_folder,
+            "jobs": len(jobs),
+            "leased_jobs": len([job_id for job_id in jobs if job_id in leases]),
+            "oldest_job_age_s": round(now - min(job["last_used"] for job in jobs.values())) if jobs else None,
+            "high_watermark_bytes": self.high_watermark,
+            "low_watermark_bytes": self.low_watermark,
+            "max_age_s": self.max_age_seconds,
+            "disk": disk_info,
+            **stats,
+        }
+
+
+manager = ScratchManager()
+
+
+def lease(job_id):
+    return manager.lease(job_id)
+
+
+def usage():
+    return manager.usage()
+
+
+def sweep():
+    return manager.sweep()
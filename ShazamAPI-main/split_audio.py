@@ -1,8 +1,12 @@
 import os
-from pydub import AudioSegment
 
 def split_audio_file(input_file, output_dir, chunk_length_ms=10000):
-    audio = AudioSegment.from_mp3(input_file)
+    from pydub import AudioSegment
+    if input_file.lower().endswith(".mp3"):
+        audio = AudioSegment.from_mp3(input_file)
+    else:
+        # wav/m4a/opus from the YouTube path; wav is read without ffmpeg
+        audio = AudioSegment.from_file(input_file)
     total_chunks = len(audio) // chunk_length_ms
     for i in range(total_chunks + 1):
         start = i * chunk_length_ms
@@ -1,15 +1,56 @@
-import boto3
 import os
+import shutil
 import uuid
-from split_audio import split_audio_file
-from mutagen.mp3 import MP3
-def download_s3_folder(bucket_name, folder_name, local_directory, access_key, secret_key):
-    s3 = boto3.client(
-        's3',
-        aws_access_key_id=access_key,
-        aws_secret_access_key=secret_key
+import audio_pool
+import scratch
+import jobs
+import tracing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Bulk ingest tuning (env overridable):
+#   S3_DOWNLOAD_CONCURRENCY  objects downloaded at the same time
+#   S3_MAX_CONCURRENCY       parallel part requests per object (multipart)
+#   S3_MULTIPART_THRESHOLD_MB / S3_MULTIPART_CHUNKSIZE_MB
+#   S3_ENDPOINT_URL          S3-compatible endpoint (MinIO, moto server...)
+#   S3_STREAM_INGEST         1 = stream objects through ffmpeg instead of staging
+#                            them in eps/ (see s3_stream.py)
+S3_DOWNLOAD_CONCURRENCY = int(os.getenv("S3_DOWNLOAD_CONCURRENCY", 4))
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", 8))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", 16))
+S3_MULTIPART_CHUNKSIZE_MB = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", 16))
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_STREAM_INGEST = os.getenv("S3_STREAM_INGEST", "0") == "1"
+
+
+def s3_transfer_config():
+    from boto3.s3.transfer import TransferConfig
+    return TransferConfig(
+        multipart_threshold=S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+        multipart_chunksize=S3_MULTIPART_CHUNKSIZE_MB * 1024 * 1024,
+        max_concurrency=S3_MAX_CONCURRENCY,
+        use_threads=True,
     )
 
+
+def list_s3_keys(s3, bucket_name, prefix):
+    """
+    Yield every object key under prefix, following list_objects_v2
+    continuation tokens (a single call stops at 1000 keys).
+    """
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj['Key']
+
+
+def download_s3_folder(bucket_name, folder_name, local_directory, access_key, secret_key,
+                       endpoint_url=S3_ENDPOINT_URL, stream=S3_STREAM_INGEST):
+    # mutagen is imported here so that importing this module stays cheap
+    from mutagen.mp3 import MP3
+    from s3_browser import get_s3_client
+
+    s3 = get_s3_client(access_key, secret_key, endpoint_url)
+
     # List to store all parent UUIDs
     parent_uuids = []
     total_duration_seconds = 0
@@ -19,16 +60,21 @@ def download_s3_folder(bucket_name, folder_name, local_directory, access_key, se
     parent_uuids.append(parent_uuid)
     parent_folder = os.path.join(local_directory, parent_uuid)
     os.makedirs(parent_folder, exist_ok=True)
+    state = jobs.registry.create(parent_uuid, kind="s3")
+
+    # Keep the sweeper away from this job while it is being written
+    with scratch.lease(parent_uuid):
+        # Ignore folder keys
+        with tracing.span("s3.list", job_id=parent_uuid):
+            file_keys = [key for key in list_s3_keys(s3, bucket_name, folder_name) if key.split('/')[-1]]
+        if not file_keys:
+            print(f"No files found in the S3 folder: {folder_name}")
+            return parent_uuids, total_duration_seconds  # Return the UUID list even if no files are found
 
-    response = s3.list_objects_v2(Bucket=bucket_name, Prefix=folder_name)
-    if 'Contents' not in response:
-        print(f"No files found in the S3 folder: {folder_name}")
-        return parent_uuids, total_duration_seconds  # Return the UUID list even if no files are found
+        transfer_config = s3_transfer_config()
 
-    for obj in response['Contents']:
-        file_key = obj['Key']
-        file_name = file_key.split('/')[-1]
-        if file_name:  # Ignore folder keys
+        def download(file_key):
+            file_name = file_key.split('/')[-1]
             # Each file gets its own UUID folder inside the parent folder
             file_uuid = str(uuid.uuid4())
             unique_folder = os.path.join(parent_folder, file_uuid)
@@ -38,23 +84,67 @@ def download_s3_folder(bucket_name, folder_name, local_directory, access_key, se
             local_path = os.path.join(unique_folder, file_name)
 
             print(f"Downloading {file_key} to {local_path}...")
-            s3.download_file(bucket_name, file_key, local_path)
-
-            # Process the downloaded file using split_audio_file
-            print(f"Processing file {local_path}...")
-            chunks_folder = os.path.join("ShazamAPI", "chunks", parent_uuid, file_uuid)
-            os.makedirs(chunks_folder, exist_ok=True)
-            split_audio_file(local_path, chunks_folder)
-            print(f"Chunks saved to {chunks_folder}")
+            with tracing.span("s3.download", job_id=parent_uuid, key=file_key):
+                s3.download_file(bucket_name, file_key, local_path, Config=transfer_config)
 
+            duration = 0
             try:
-                audio = MP3(local_path)
-                file_duration_seconds = audio.info.length
-                total_duration_seconds += file_duration_seconds
-                total_duration_seconds = round(total_duration_seconds)
-                print(f"File {file_name} duration: {file_duration_seconds} seconds")
+                duration = MP3(local_path).info.length
+                print(f"File {file_name} duration: {duration} seconds")
             except Exception as e:
                 print(f"Error calculating duration for {file_name}: {e}")
+            return file_uuid, file_name, local_path, duration
+
+        def stream_ingest(file_key):
+            import s3_stream
+
+            file_name = file_key.split('/')[-1]
+            file_uuid = str(uuid.uuid4())
+            unique_folder = os.path.join(parent_folder, file_uuid)
+            os.makedirs(unique_folder, exist_ok=True)
+            # /detectS3 reads the episode metadata from the file name, so keep an
+            # empty placeholder with the original name instead of the full object
+            open(os.path.join(unique_folder, file_name), 'wb').close()
+
+            chunks_folder = os.path.join("ShazamAPI", "chunks", parent_uuid, file_uuid)
+            print(f"Streaming {file_key} into {chunks_folder}...")
+            try:
+                with tracing.span("s3.stream", job_id=parent_uuid, key=file_key):
+                    duration = s3_stream.ingest_s3_object(s3, bucket_name, file_key, chunks_folder)
+            except Exception as e:
+                print(f"Streaming ingest failed for {file_key} ({e}), falling back to download")
+                shutil.rmtree(unique_folder, ignore_errors=True)
+                shutil.rmtree(chunks_folder, ignore_errors=True)
+                return download(file_key)
+            print(f"File {file_name} duration: {duration} seconds")
+            return file_uuid, file_name, None, duration
+
+        # Downloads run on a thread pool; each finished file is handed to the audio
+        # pool for splitting right away, so file N is split while N+1 downloads.
+        splits = []
+        with ThreadPoolExecutor(max_workers=S3_DOWNLOAD_CONCURRENCY) as executor:
+            ingest = stream_ingest if stream else download
+            futures = [executor.submit(ingest, file_key) for file_key in file_keys]
+            for future in as_completed(futures):
+                file_uuid, file_name, local_path, duration = future.result()
+                total_duration_seconds += duration
+                if local_path is None:
+                    # streamed: chunks are already on disk
+                    chunks_folder = os.path.join("ShazamAPI", "chunks", parent_uuid, file_uuid)
+                    state.add_chunks(len([f for f in os.listdir(chunks_folder) if f.endswith('.mp3')]))
+                    continue
+
+                print(f"Processing file {local_path}...")
+                chunks_folder = os.path.join("ShazamAPI", "chunks", parent_uuid, file_uuid)
+                os.makedirs(chunks_folder, exist_ok=True)
+                splits.append((chunks_folder, audio_pool.submit(audio_pool.split_audio, local_path, chunks_folder)))
+
+        for chunks_folder, split_future in splits:
+            with tracing.span("s3.split_wait", job_id=parent_uuid):
+                state.add_chunks(split_future.result())
+            print(f"Chunks saved to {chunks_folder}")
 
-    print(f"All files downloaded and processed successfully under parent folder: {parent_folder}")
+        total_duration_seconds = round(total_duration_seconds)
+        state.update(status=jobs.STATUS_UPLOADED, duration_seconds=total_duration_seconds)
+        print(f"All files downloaded and processed successfully under parent folder: {parent_folder}")
     return parent_uuids, total_duration_seconds  # Return the UUID list
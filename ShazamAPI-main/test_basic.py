@@ -8,25 +8,64 @@ AUDD_API_KEY = os.getenv("AUDD_API_KEY")
 if not AUDD_API_KEY:
     raise ValueError("API Key not found in environment variables!")
 
-def recognize_song(file_path, api_key):
+def parse_timecode(timecode):
+    """AudD timecode ("MM:SS" or "HH:MM:SS") to seconds, None if missing"""
+    try:
+        seconds = 0
+        for part in str(timecode).split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except (TypeError, ValueError):
+        return None
+
+
+def track_duration(song_info):
+    """Track duration in seconds from the spotify / apple_music blocks, None if missing"""
+    spotify = song_info.get('spotify') or {}
+    apple_music = song_info.get('apple_music') or {}
+    for duration_ms in (spotify.get('duration_ms'), apple_music.get('durationInMillis')):
+        if isinstance(duration_ms, (int, float)) and duration_ms > 0:
+            return duration_ms / 1000
+    return None
+
+
+def recognize_song_details(file_path, api_key, return_fields="apple_music,spotify"):
+    """
+    Like recognize_song() but returns a dict with title, artist, song_link,
+    label, plus timecode (seconds into the track where the excerpt matched)
+    and duration (track length in seconds, needs return_fields) when AudD
+    knows them. None when nothing was recognized.
+    """
     url = "https://api.audd.io/"
     with open(file_path, 'rb') as audio_file:
         files = {'file': audio_file}
         data = {'api_token': api_key}
-        
+        if return_fields:
+            data['return'] = return_fields
+
         response = requests.post(url, data=data, files=files)
-        
+
         if response.status_code == 200:
             result = response.json()
             if 'result' in result and result['result']:
                 song_info = result['result']
-                title = song_info.get('title', 'Unknown')
-                artist = song_info.get('artist', 'Unknown')
-                label = song_info.get('label', 'Unknown')
-                song_link = song_info.get('song_link', 'N/A')
-                print(song_link)
-                return title, artist, song_link, label
-        return None 
+                return {
+                    'title': song_info.get('title', 'Unknown'),
+                    'artist': song_info.get('artist', 'Unknown'),
+                    'label': song_info.get('label', 'Unknown'),
+                    'song_link': song_info.get('song_link', 'N/A'),
+                    'timecode': parse_timecode(song_info.get('timecode')),
+                    'duration': track_duration(song_info),
+                }
+        return None
+
+
+def recognize_song(file_path, api_key):
+    details = recognize_song_details(file_path, api_key, return_fields=None)
+    if details is None:
+        return None
+    print(details['song_link'])
+    return details['title'], details['artist'], details['song_link'], details['label']
 
 if __name__ == "__main__":
     file_path = "ShazamAPI/songs/chunk08.mp3"
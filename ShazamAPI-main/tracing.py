@@ -0,0 +1,205 @@
+# tracing.py
+# Lightweight stage timing for the cue-sheet audio path.
+#
+#   with tracing.span("detect.audd", job_id=user_id, chunk=3):
+#       recognize_song(...)
+#
+# Each finished span is
+#   - appended to its job's timeline (GET /progress/<job_id>/timeline)
+#   - added to the job's aggregated timings in jobs.registry
+#   - observed in the cuesheet_stage_seconds histogram (GET /metrics) when
+#     prometheus_client is installed; otherwise /metrics falls back to a
+#     plain count/sum summary per stage
+#
+# Nested spans inherit job_id/chunk from the enclosing span in the same
+# thread (contextvars), so only the outermost span needs them. Worker threads
+# don't inherit context: pass job_id explicitly there.
+#
+# A span costs two perf_counter() calls and a locked list append.
+#
+# Env:
+#   TRACING_ENABLED     0 turns spans into no-ops (default 1)
+#   TRACE_MAX_JOBS      timelines kept in memory (default 200)
+#   TRACE_MAX_SPANS     spans kept per job (default 20000)
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import jobs
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+TRACE_MAX_JOBS = int(os.getenv("TRACE_MAX_JOBS", 200))
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", 20000))
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+_current = ContextVar("tracing_current", default=None)  # (job_id, chunk)
+
+_timelines = OrderedDict()  # job_id -> {"origin": wall time, "spans": [...], "dropped": n}
+_timelines_lock = threading.Lock()
+
+_totals = {}  # stage -> [count, sum]  (fallback exposition)
+_totals_lock = threading.Lock()
+
+# Text exposition format written by both generate_latest() and the fallback
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+# prometheus_client is imported on the first span / scrape, not at import
+# time: it costs ~40 ms and test.py imports this module on startup
+_stage_seconds = None
+_stage_seconds_loaded = False
+_stage_seconds_lock = threading.Lock()
+
+
+def _histogram():
+    """The stage histogram, or None when prometheus_client isn't installed."""
+    global _stage_seconds, _stage_seconds_loaded
+    if _stage_seconds_loaded:
+        return _stage_seconds
+    with _stage_seconds_lock:
+        if not _stage_seconds_loaded:
+            try:
+                from prometheus_client import Histogram
+                _stage_seconds = Histogram(
+                    "cuesheet_stage_seconds",
+                    "Duration of cue-sheet pipeline stages",
+                    ["stage"],
+                    buckets=STAGE_BUCKETS,
+                )
+            except ImportError:
+                _stage_seconds = None
+            _stage_seconds_loaded = True
+    return _stage_seconds
+
+
+def _record(name, job_id, chunk, started_wall, duration, attrs, error):
+    histogram = _histogram()
+    if histogram is not None:
+        histogram.labels(stage=name).observe(duration)
+    with _totals_lock:
+        totals = _totals.setdefault(name, [0, 0.0])
+        totals[0] += 1
+        totals[1] += duration
+
+    if job_id is None:
+        return
+    state = jobs.registry.get(job_id)
+    if state is not None:
+        state.add_timing(name, duration)
+
+    entry = {
+        "name": name,
+        "start": started_wall,
+        "durationMs": round(duration * 1000, 3),
+    }
+    if chunk is not None:
+        entry["chunk"] = chunk
+    if attrs:
+        entry["attrs"] = attrs
+    if error:
+        entry["error"] = error
+
+    with _timelines_lock:
+        timeline = _timelines.get(job_id)
+        if timeline is None:
+            timeline = _timelines[job_id] = {"origin": started_wall, "spans": [], "dropped": 0}
+            while len(_timelines) > TRACE_MAX_JOBS:
+                _timelines.popitem(last=False)
+        else:
+            _timelines.move_to_end(job_id)
+            timeline["origin"] = min(timeline["origin"], started_wall)
+        if len(timeline["spans"]) < TRACE_MAX_SPANS:
+            timeline["spans"].append(entry)
+        else:
+            timeline["dropped"] += 1
+
+
+@contextmanager
+def span(name, job_id=None, chunk=None, **attrs):
+    """
+    Time the enclosed block as stage `name`. Extra keyword arguments are
+    stored with the span in the job timeline.
+    """
+    if not TRACING_ENABLED:
+        yield
+        return
+
+    parent = _current.get()
+    if parent is not None:
+        job_id = parent[0] if job_id is None else job_id
+        chunk = parent[1] if chunk is None else chunk
+    token = _current.set((job_id, chunk))
+    started_wall = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        _current.reset(token)
+        _record(name, job_id, chunk, started_wall, duration, attrs, error)
+
+
+def record(name, started, job_id=None, chunk=None, **attrs):
+    """
+    Record a span that started at perf_counter() value `started` and ends now,
+    for loops where wrapping the whole body in span() isn't practical.
+    """
+    if not TRACING_ENABLED:
+        return
+    duration = time.perf_counter() - started
+    _record(name, job_id, chunk, time.time() - duration, duration, attrs, None)
+
+
+def timeline(job_id):
+    """
+    Spans of a job ordered by start, with offsets relative to the first one.
+    Returns None for unknown jobs.
+    """
+    with _timelines_lock:
+        data = _timelines.get(job_id)
+        if data is None:
+            return None
+        origin = data["origin"]
+        spans = [dict(s) for s in data["spans"]]
+        dropped = data["dropped"]
+
+    spans.sort(key=lambda s: s["start"])
+    for s in spans:
+        s["offsetMs"] = round((s.pop("start") - origin) * 1000, 3)
+
+    stages = {}
+    for s in spans:
+        stage = stages.setdefault(s["name"], {"count": 0, "totalMs": 0.0})
+        stage["count"] += 1
+        stage["totalMs"] = round(stage["totalMs"] + s["durationMs"], 3)
+
+    return {"jobId": job_id, "stages": stages, "spans": spans, "droppedSpans": dropped}
+
+
+def metrics_text():
+    """
+    Prometheus exposition of the stage histograms (or count/sum summaries
+    when prometheus_client isn't installed).
+    """
+    if _histogram() is not None:
+        from prometheus_client import generate_latest
+        return generate_latest()
+
+    lines = [
+        "# HELP cuesheet_stage_seconds Duration of cue-sheet pipeline stages",
+        "# TYPE cuesheet_stage_seconds summary",
+    ]
+    with _totals_lock:
+        items = sorted((stage, list(v)) for stage, v in _totals.items())
+    for stage, (count, total) in items:
+        lines.append(f'cuesheet_stage_seconds_count{{stage="{stage}"}} {count}')
+        lines.append(f'cuesheet_stage_seconds_sum{{stage="{stage}"}} {total}')
+    return ("\n".join(lines) + "\n").encode("utf-8")
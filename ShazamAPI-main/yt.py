@@ -112,7 +112,8 @@
 
 
 # yt.py
-import os, json, re, subprocess, tempfile, yt_dlp
+import os, json, re, subprocess, tempfile
+from typing import Optional
 
 class CollectLogger:
     def __init__(self):
@@ -149,71 +150,163 @@ def _build_extractor_args():
     # default: plain web client (no token)
     return {"youtube": {"player_client": ["web"]}}
 
-def download_youtube_audios(urls: list[str], out_dir: str) -> list[str]:
+# Max links downloaded at the same time by download_youtube_audios_parallel
+YT_MAX_CONCURRENCY = int(os.getenv("YT_MAX_CONCURRENCY", 4))
+
+# What to keep after downloading:
+#   mp3     re-encode to 192 kbps MP3 (historic behaviour)
+#   native  keep the downloaded m4a/opus stream as-is, no transcode at all
+#   pcm     decode once to 16 kHz mono WAV, the format recognition works on
+YT_AUDIO_FORMAT = os.getenv("YT_AUDIO_FORMAT", "mp3").strip().lower()
+AUDIO_FORMATS = ("mp3", "native", "pcm")
+
+def _postprocessors(audio_format: str) -> dict:
+    if audio_format == "native":
+        return {"postprocessors": []}
+    if audio_format == "pcm":
+        return {
+            "postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": "wav"}],
+            "postprocessor_args": {"extractaudio+ffmpeg_o": ["-ar", "16000", "-ac", "1"]},
+        }
+    return {
+        "postprocessors": [{
+            "key": "FFmpegExtractAudio",
+            "preferredcodec": "mp3",
+            "preferredquality": "192",
+        }],
+    }
+
+def _build_ydl_opts(audio_format: str = YT_AUDIO_FORMAT) -> dict:
     """
-    Download each YouTube URL as MP3 into out_dir using yt-dlp (+ffmpeg),
-    writing safe filenames (video ID only) to avoid ffmpeg concat quoting issues.
-    Returns list of absolute MP3 paths.
+    Shared yt-dlp configuration. outtmpl and logger are set per download.
     """
-    os.makedirs(out_dir, exist_ok=True)
-    logger = CollectLogger()
-
+    if audio_format not in AUDIO_FORMATS:
+        raise ValueError(f"audio_format must be one of {AUDIO_FORMATS}, got {audio_format!r}")
     # Try formats that usually don’t need PO tokens
     # m4a is often available with the web client
-    ydl_opts = {
+    opts = {
         "format": "bestaudio[ext=m4a]/bestaudio/best",
-        "outtmpl": os.path.join(out_dir, "%(id)s.%(ext)s"),
         "restrictfilenames": True,
         "windowsfilenames": True,
         "overwrites": True,
         "quiet": True,
         "noprogress": True,
-        "logger": logger,
         "extractor_args": _build_extractor_args(),
         "noplaylist": True,
         # Optional: if running locally with a logged-in browser, uncomment one of these:
         # "cookiesfrombrowser": ("chrome",),   # auto-read cookies from Chrome
         # "cookiefile": "/path/to/cookies.txt",# or export cookies manually
-        "postprocessors": [{
-            "key": "FFmpegExtractAudio",
-            "preferredcodec": "mp3",
-            "preferredquality": "192",
-        }],
     }
+    opts.update(_postprocessors(audio_format))
+    return opts
+
+def _download_one(ydl, url: str, out_dir: str, logger: CollectLogger) -> Optional[str]:
+    """
+    Download a single URL with an open YoutubeDL. Returns the audio file path
+    (.mp3, .wav or the native container depending on the postprocessors), or
+    None (with the reason in logger.errors).
+    """
+    try:
+        info = ydl.extract_info(url, download=True)
+        vid = info.get("id")
+        # yt-dlp reports the final path after post-processing
+        for download in info.get("requested_downloads") or []:
+            candidate = download.get("filepath")
+            if candidate and os.path.exists(candidate):
+                return candidate
+        # last-resort scan
+        for name in os.listdir(out_dir):
+            if vid and vid in name and not name.endswith((".part", ".ytdl")):
+                return os.path.join(out_dir, name)
+        # If nothing downloaded, surface helpful context
+        warn = "\n".join(logger.warnings[-6:])
+        err  = "\n".join(logger.errors[-6:])
+        raise RuntimeError(
+            f"Downloaded files not found for id {vid or '?'}.\n"
+            f"[yt-dlp warnings]\n{warn}\n[yt-dlp errors]\n{err}\n"
+            "Tip: update yt-dlp, try web client+m4a, or set YTDLP_PO_TOKEN_MWEB."
+        )
+    except Exception as e:
+        logger.error(f"{url}: {e}")
+        return None
+
+def download_youtube_audios(urls: list[str], out_dir: str,
+                            audio_format: str = YT_AUDIO_FORMAT) -> list[str]:
+    """
+    Download each YouTube URL as audio into out_dir using yt-dlp (+ffmpeg),
+    writing safe filenames (video ID only) to avoid ffmpeg concat quoting issues.
+    audio_format is one of AUDIO_FORMATS ("mp3" by default).
+    Returns list of absolute audio paths.
+    """
+    import yt_dlp  # heavy; only needed once a link is actually downloaded
+
+    os.makedirs(out_dir, exist_ok=True)
+    logger = CollectLogger()
+    ydl_opts = dict(_build_ydl_opts(audio_format), outtmpl=os.path.join(out_dir, "%(id)s.%(ext)s"), logger=logger)
 
     mp3_paths: list[str] = []
     with yt_dlp.YoutubeDL(ydl_opts) as ydl:
         for url in urls:
-            try:
-                info = ydl.extract_info(url, download=True)
-                vid = info.get("id")
-                # After post-processing, extension will be .mp3
-                candidate = os.path.join(out_dir, f"{vid}.mp3") if vid else None
-                if candidate and os.path.exists(candidate):
-                    mp3_paths.append(candidate)
-                else:
-                    # last-resort scan
-                    found = None
-                    for name in os.listdir(out_dir):
-                        if vid and vid in name and name.lower().endswith(".mp3"):
-                            found = os.path.join(out_dir, name)
-                            break
-                    if found:
-                        mp3_paths.append(found)
-                    else:
-                        # If nothing downloaded, surface helpful context
-                        warn = "\n".join(logger.warnings[-6:])
-                        err  = "\n".join(logger.errors[-6:])
-                        raise RuntimeError(
-                            f"Downloaded files not found for id {vid or '?'}.\n"
-                            f"[yt-dlp warnings]\n{warn}\n[yt-dlp errors]\n{err}\n"
-                            "Tip: update yt-dlp, try web client+m4a, or set YTDLP_PO_TOKEN_MWEB."
-                        )
-            except Exception as e:
-                logger.error(f"{url}: {e}")
+            path = _download_one(ydl, url, out_dir, logger)
+            if path:
+                mp3_paths.append(path)
 
     return mp3_paths
 
+def download_youtube_audios_parallel(jobs: list[tuple[str, str]], on_downloaded=None,
+                                     max_workers: int = YT_MAX_CONCURRENCY,
+                                     audio_format: str = YT_AUDIO_FORMAT) -> list[Optional[str]]:
+    """
+    Download (url, out_dir) jobs concurrently, at most max_workers at a time,
+    all sharing one yt-dlp configuration. YoutubeDL objects aren't thread-safe,
+    so each download gets its own instance built from that configuration.
+
+    on_downloaded(index, path) is called from the worker thread as soon as a
+    file lands, so callers can start splitting it while other links are still
+    downloading. Returns the audio paths in job order (None for failures).
+    """
+    import yt_dlp
+    from concurrent.futures import ThreadPoolExecutor
+
+    base_opts = _build_ydl_opts(audio_format)
+
+    def run(index: int, url: str, out_dir: str) -> Optional[str]:
+        os.makedirs(out_dir, exist_ok=True)
+        logger = CollectLogger()
+        ydl_opts = dict(base_opts, outtmpl=os.path.join(out_dir, "%(id)s.%(ext)s"), logger=logger)
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            path = _download_one(ydl, url, out_dir, logger)
+        if not path:
+            print(f"yt-dlp failed for {url}: {' | '.join(logger.errors[-3:])}")
+            return None
+        if on_downloaded:
+            on_downloaded(index, path)
+        return path
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = [executor.submit(run, i, url, out_dir) for i, (url, out_dir) in enumerate(jobs)]
+        return [future.result() for future in futures]
+
+def audio_duration(path: str) -> float:
+    """
+    Duration in seconds of an mp3/m4a/wav/opus file. mutagen handles most
+    containers; ffprobe covers the rest (e.g. webm).
+    """
+    import mutagen
+    try:
+        audio = mutagen.File(path)
+        if audio is not None and audio.info.length:
+            return float(audio.info.length)
+    except Exception:
+        pass
+    completed = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.decode("utf-8", errors="ignore"))
+    return float(completed.stdout.decode().strip())
+
 def concat_mp3s(mp3_paths: list[str], output_path: str) -> None:
     """(unchanged)"""
     if len(mp3_paths) == 1:
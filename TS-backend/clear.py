@@ -1,28 +1,109 @@
 import os
 import shutil
-import schedule
 import time
 from datetime import datetime
 
+# Scratch cleanup for the TS/ job folders. Instead of wiping everything at
+# 03:00 (including jobs that are still running), a sweep runs every
+# SWEEP_INTERVAL seconds and removes whole job folders:
+#   - idle for longer than MAX_AGE_HOURS
+#   - optionally, least recently used first while the total is above
+#     HIGH_WATERMARK_GB, until it is below LOW_WATERMARK_GB (off by default)
+#
+# "Idle" is the newest mtime in the job folder: the TS job code takes no
+# leases, so recent writes are the only sign that a job is still running.
+# Neither rule touches a job written to within MIN_IDLE_MINUTES. Limitation:
+# a job that writes nothing for MAX_AGE_HOURS (24 h by default) is treated
+# as finished and removed even if its process is still alive.
+
 # Define the base folder paths
 FOLDERS_TO_CLEAR = ["TS"]
+MAX_AGE_HOURS = float(os.getenv("SCRATCH_MAX_AGE_HOURS", 24))
+HIGH_WATERMARK_GB = float(os.getenv("SCRATCH_HIGH_WATERMARK_GB", 0))  # 0 = off
+LOW_WATERMARK_GB = float(os.getenv("SCRATCH_LOW_WATERMARK_GB", 15))
+MIN_IDLE_MINUTES = float(os.getenv("SCRATCH_MIN_IDLE_MINUTES", 60))
+SWEEP_INTERVAL = int(os.getenv("SCRATCH_SWEEP_INTERVAL", 300))
+GB = 1024 ** 3
+
+
+def tree_stats(path):
+    """Return (total_bytes, newest_mtime) of a directory tree"""
+    total = 0
+    newest = os.stat(path).st_mtime
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                st = os.stat(os.path.join(root, name))
+            except FileNotFoundError:
+                continue
+            total += st.st_size
+            newest = max(newest, st.st_mtime)
+    return total, newest
+
+
+def list_jobs(folder_path):
+    jobs = []
+    for subfolder in os.listdir(folder_path):
+        subfolder_path = os.path.join(folder_path, subfolder)
+        if not os.path.isdir(subfolder_path):
+            continue
+        size, last_used = tree_stats(subfolder_path)
+        jobs.append({"name": subfolder, "path": subfolder_path, "bytes": size, "last_used": last_used})
+    return jobs
+
+
+def evict(job, reason):
+    shutil.rmtree(job["path"], ignore_errors=True)
+    print(f"Cleared folder: {job['path']} ({job['bytes'] / 1024 ** 2:.1f} MB, {reason})")
+
+
+def sweep_folders():
+    """Evict expired jobs, then idle LRU jobs above the high watermark (if set)"""
+    try:
+        now = time.time()
+        for folder in FOLDERS_TO_CLEAR:
+            folder_path = os.path.join(folder)
+            if not os.path.exists(folder_path):
+                continue
+
+            # one listing per pass, so both rules see the same state
+            jobs = list_jobs(folder_path)
+            total = sum(job["bytes"] for job in jobs)
+
+            remaining = []
+            for job in jobs:
+                if now - job["last_used"] > MAX_AGE_HOURS * 3600:
+                    evict(job, "age")
+                    total -= job["bytes"]
+                else:
+                    remaining.append(job)
+
+            if HIGH_WATERMARK_GB and total > HIGH_WATERMARK_GB * GB:
+                for job in sorted(remaining, key=lambda j: j["last_used"]):
+                    if total <= LOW_WATERMARK_GB * GB:
+                        break
+                    if now - job["last_used"] < MIN_IDLE_MINUTES * 60:
+                        # possibly still running
+                        break
+                    evict(job, "watermark")
+                    total -= job["bytes"]
+    except Exception as e:
+        print(f"Error sweeping folders: {e}")
+
 
 def clear_folders():
-    """Function to clear folders"""
+    """Function to clear folders (jobs written to within MIN_IDLE_MINUTES are kept)"""
     try:
         print(f"Task started at {datetime.now()} - Clearing folders...")
+        now = time.time()
         for folder in FOLDERS_TO_CLEAR:
             folder_path = os.path.join(folder)
-            
+
             # Check if the folder exists
             if os.path.exists(folder_path):
-                for subfolder in os.listdir(folder_path):
-                    subfolder_path = os.path.join(folder_path, subfolder)
-                    
-                    # Clear only directories
-                    if os.path.isdir(subfolder_path):
-                        shutil.rmtree(subfolder_path)
-                        print(f"Cleared folder: {subfolder_path}")
+                for job in list_jobs(folder_path):
+                    if now - job["last_used"] >= MIN_IDLE_MINUTES * 60:
+                        evict(job, "clear")
             else:
                 print(f"Folder not found: {folder_path}")
 
@@ -30,14 +111,14 @@ def clear_folders():
     except Exception as e:
         print(f"Error clearing folders: {e}")
 
+
 def start_scheduler():
     """Function to start the scheduler"""
-    schedule.every().day.at("03:00").do(clear_folders)
-
-    print("Scheduler started. Waiting for the scheduled time...")
+    print("Scheduler started. Sweeping scratch folders periodically...")
     while True:
-        schedule.run_pending()
-        time.sleep(60)
+        sweep_folders()
+        time.sleep(SWEEP_INTERVAL)
+
 
 if __name__ == "__main__":
     start_scheduler()
@@ -18,9 +18,13 @@ import json
 from models import DetectionResult, UserMinutes
 
 # Import detection utilities
-from utils.video_processor import VideoProcessor
+from utils.video_processor import VideoProcessor, SAMPLING_MODES
+from utils.parallel_sampler import ParallelFrameSampler
 from utils.openai_detector import OpenAIInstrumentDetector
 from utils.owlvit_detector import OwlViTInstrumentDetector
+from utils.model_registry import model_registry
+from utils.classification_cache import classification_cache
+from utils.owlvit_backends import OWLVIT_BACKENDS, DEFAULT_OWLVIT_BACKEND
 from utils.tracker import InstrumentTracker
 from utils.consolidator import InstrumentConsolidator
 from utils.comprehensive_exporter import ComprehensiveExporter
@@ -57,9 +61,9 @@ if not OPENAI_API_KEY:
 # Detection status tracker (in-memory for quick access)
 detection_status = {}
 
-# MongoDB models
-detection_result_model = DetectionResult()
-user_minutes_model = UserMinutes()
+# MongoDB models (created by start_service())
+detection_result_model = None
+user_minutes_model = None
 
 
 def allowed_file(filename):
@@ -104,49 +108,79 @@ def process_video_detection(job_id, video_path, options):
         except Exception as e:
             print(f"Warning: Could not update MongoDB: {e}")
 
-        # Step 1: Sample frames from video
+        # Step 1: Stream frames from video (decoded lazily while the detector consumes
+        # them; only per-frame metadata is kept for the tracker)
         print(f"[{job_id}] Sampling frames from video...")
         video_processor = VideoProcessor()
 
-        frames_data = video_processor.sample_frames(
-            video_path,
-            target_fps=options.get('fps', 0.5),
-            max_dimension=options.get('max_resolution', 1280)
-        )
+        sampling_workers = options.get('sampling_workers', 0)
+        if sampling_workers > 0:
+            # Decode timeline segments in parallel processes, a bounded window ahead
+            frame_stream = ParallelFrameSampler(max_workers=sampling_workers).iter_frames(
+                video_path,
+                target_fps=options.get('fps', 0.5),
+                max_dimension=options.get('max_resolution', 1280)
+            )
+        else:
+            frame_stream = video_processor.iter_frames(
+                video_path,
+                target_fps=options.get('fps', 0.5),
+                max_dimension=options.get('max_resolution', 1280),
+                mode=options.get('sampling_mode', 'auto')
+            )
+        expected_frames = frame_stream.expected_frames
 
         video_info = video_processor.get_video_info(video_path)
         detection_status[job_id]['progress'] = 20
-        detection_status[job_id]['total_frames'] = len(frames_data)
+        detection_status[job_id]['total_frames'] = expected_frames
 
-        print(f"[{job_id}] Sampled {len(frames_data)} frames")
+        print(f"[{job_id}] Expecting {expected_frames} frames")
+
+        def on_frame_progress(current, total):
+            # detection spans 20% -> 60%
+            detection_status[job_id]['progress'] = 20 + int(40 * current / max(total, 1))
 
         # Step 2: Detect instruments
         print(f"[{job_id}] Detecting instruments...")
         detection_method = options.get('method', 'owlvit')
 
-        if detection_method == 'openai':
-            detector = OpenAIInstrumentDetector(
-                api_key=OPENAI_API_KEY,
-                model=options.get('model', 'gpt-4o'),
-                max_workers=options.get('max_workers', 5)
-            )
-        else:  # owlvit (default)
-            detector = OwlViTInstrumentDetector(
-                api_key=OPENAI_API_KEY,
-                model=options.get('model', 'gpt-4o'),
-                image_detail=options.get('image_detail', 'low')
-            )
-
         # Both detectors have the same batch_detect_with_metadata signature
-        detections = detector.batch_detect_with_metadata(
-            frames_data,
-            detect_playing=options.get('detect_playing', True),
-            confidence_threshold=options.get('confidence', 0.5),
-            skip_similar=options.get('skip_similar', True)
-        )
+        detector = None
+        try:
+            if detection_method == 'openai':
+                detector = OpenAIInstrumentDetector(
+                    api_key=OPENAI_API_KEY,
+                    model=options.get('model', 'gpt-4o'),
+                    max_workers=options.get('max_workers', 5)
+                )
+            else:  # owlvit (default)
+                detector = OwlViTInstrumentDetector(
+                    api_key=OPENAI_API_KEY,
+                    model=options.get('model', 'gpt-4o'),
+                    image_detail=options.get('image_detail', 'low'),
+                    batch_size=options.get('owlvit_batch_size', 4),
+                    num_threads=options.get('torch_threads', 0) or None,
+                    instrument_queries=options.get('instrument_queries'),
+                    backend=options.get('owlvit_backend', DEFAULT_OWLVIT_BACKEND),
+                    max_workers=options.get('max_workers', 5),
+                    crop_batch_size=options.get('crop_batch_size', 1)
+                )
+
+            detections = detector.batch_detect_with_metadata(
+                frame_stream,
+                detect_playing=options.get('detect_playing', True),
+                confidence_threshold=options.get('confidence', 0.5),
+                skip_similar=options.get('skip_similar', True),
+                progress_callback=on_frame_progress
+            )
+        finally:
+            if isinstance(detector, OwlViTInstrumentDetector):
+                detector.close()
+        frames_data = frame_stream.metadata
 
         detection_status[job_id]['progress'] = 60
-        print(f"[{job_id}] Detected {len(detections)} total detections")
+        detection_status[job_id]['total_frames'] = len(frames_data)
+        print(f"[{job_id}] Sampled {len(frames_data)} frames, detected {len(detections)} total detections")
 
         # Step 3: Track instruments across frames
         print(f"[{job_id}] Tracking instruments...")
@@ -187,7 +221,7 @@ def process_video_detection(job_id, video_path, options):
             output_path=json_path
         )
 
-        # Save instrument images by extracting crops from frames_data
+        # Save instrument images by extracting crops from the source video
         import cv2
         instrument_images = {}
 
@@ -300,7 +334,9 @@ def index():
     return jsonify({
         "service": "Instrument Detection Microservice",
         "status": "running",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "models": model_registry.stats(),
+        "classification_cache": classification_cache.stats()
     })
 
 
@@ -322,6 +358,13 @@ def upload_video():
         - skip_similar: Skip similar frames (default: true)
         - skip_duplicates: Skip duplicate objects (default: true)
         - image_detail: Image detail level (default: 'low')
+        - sampling_mode: Frame sampling mode, one of read/grab/seek/ffmpeg/auto (default: 'auto')
+        - sampling_workers: Decode video segments in this many processes (at most the CPU count), 0 = one decoder thread (default: 0)
+        - owlvit_batch_size: Frames per OWL-ViT forward pass (default: 4)
+        - torch_threads: torch CPU threads for OWL-ViT, 0 = torch default (default: 0)
+        - instrument_queries: Comma-separated OWL-ViT text queries (default: built-in instrument list)
+        - crop_batch_size: OWL-ViT crops classified per OpenAI request (default: 1)
+        - owlvit_backend: OWL-ViT inference backend, one of torch/torch-int8/onnx (default: OWLVIT_BACKEND env or 'torch')
 
     Returns:
         JSON with job_id for tracking
@@ -363,9 +406,24 @@ def upload_video():
             'max_resolution': int(request.form.get('max_resolution', 1280)),
             'skip_similar': request.form.get('skip_similar', 'true').lower() == 'true',
             'skip_duplicates': request.form.get('skip_duplicates', 'true').lower() == 'true',
-            'image_detail': request.form.get('image_detail', 'low')
+            'image_detail': request.form.get('image_detail', 'low'),
+            'sampling_mode': request.form.get('sampling_mode', 'auto'),
+            'sampling_workers': min(int(request.form.get('sampling_workers', 0)), os.cpu_count() or 1),
+            'owlvit_batch_size': int(request.form.get('owlvit_batch_size', 4)),
+            'torch_threads': int(request.form.get('torch_threads', 0)),
+            'instrument_queries': [
+                q.strip() for q in request.form.get('instrument_queries', '').split(',') if q.strip()
+            ] or None,
+            'owlvit_backend': request.form.get('owlvit_backend', DEFAULT_OWLVIT_BACKEND),
+            'crop_batch_size': int(request.form.get('crop_batch_size', 1))
         }
 
+        if options['sampling_mode'] not in SAMPLING_MODES:
+            return jsonify({"error": f"Invalid sampling_mode. Allowed: {', '.join(SAMPLING_MODES)}"}), 400
+
+        if options['owlvit_backend'] not in OWLVIT_BACKENDS:
+            return jsonify({"error": f"Invalid owlvit_backend. Allowed: {', '.join(OWLVIT_BACKENDS)}"}), 400
+
         # Initialize detection status (in-memory)
         detection_status[job_id] = {
             'job_id': job_id,
@@ -537,12 +595,46 @@ def start_cleanup_scheduler():
         time.sleep(3600)  # Check every hour
 
 
-# Start cleanup scheduler in background
-cleanup_thread = threading.Thread(target=start_cleanup_scheduler, daemon=True)
-cleanup_thread.start()
+def warm_up_owlvit():
+    """Load the shared OWL-ViT model and run one forward pass before the first job"""
+    import numpy as np
+
+    try:
+        detector = OwlViTInstrumentDetector(api_key=OPENAI_API_KEY)
+        try:
+            detector.detect_objects_batch([np.zeros((720, 1280, 3), dtype=np.uint8)])
+        finally:
+            detector.close()
+        print("✓ OWL-ViT warm-up complete")
+    except Exception as e:
+        print(f"Warning: OWL-ViT warm-up failed: {e}")
+
+
+def start_service():
+    """
+    Connect to MongoDB and start the background threads
+
+    Kept out of module scope: sampling worker processes (spawn) re-import this
+    module, and must not connect, schedule cleanups or load OWL-ViT themselves.
+    """
+    global detection_result_model, user_minutes_model
+
+    # MongoDB models
+    detection_result_model = DetectionResult()
+    user_minutes_model = UserMinutes()
+
+    # Start cleanup scheduler in background
+    cleanup_thread = threading.Thread(target=start_cleanup_scheduler, daemon=True)
+    cleanup_thread.start()
+
+    # Warm up the model in background so the first upload does not pay for loading it
+    if os.getenv('OWLVIT_WARMUP', '1') == '1':
+        warmup_thread = threading.Thread(target=warm_up_owlvit, daemon=True)
+        warmup_thread.start()
 
 
 if __name__ == "__main__":
+    start_service()
     port = int(os.getenv('PORT', 8001))
     print(f"Starting Instrument Detection Microservice on port {port}")
     app.run(host="0.0.0.0", port=port, debug=False)
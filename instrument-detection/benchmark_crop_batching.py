@@ -0,0 +1,132 @@
+"""
+Crop batching benchmark
+Classifies the same OWL-ViT crops with different crop_batch_size values and reports
+latency, token cost per crop and agreement with one-request-per-crop
+
+    python benchmark_crop_batching.py video.mp4
+    python benchmark_crop_batching.py video.mp4 --batch-sizes 1 4 8 --frames 8 --model gpt-4o-mini
+    python benchmark_crop_batching.py video.mp4 --json crop_batching.json
+
+Makes real OpenAI requests (OPENAI_API_KEY); the classification cache is disabled
+so every configuration pays for every crop.
+"""
+
+import os
+import argparse
+import json
+import time
+from dotenv import load_dotenv
+
+from benchmark_owlvit import sample_frames
+from utils.owlvit_detector import OwlViTInstrumentDetector
+
+
+def collect_crops(detector: OwlViTInstrumentDetector, frames, max_crops: int):
+    """OWL-ViT crops of the sampled frames"""
+    crops = []
+    for frame, detections in zip(frames, detector.detect_objects_batch(frames)):
+        for det in detections:
+            crop = detector.extract_crop(frame, det['bbox'])
+            if crop is not None:
+                crops.append(crop)
+    return crops[:max_crops]
+
+
+def run_batch_size(detector: OwlViTInstrumentDetector, crops, crop_batch_size: int):
+    """
+    Classify all crops sequentially in requests of crop_batch_size crops
+
+    Returns:
+        Tuple of (classifications, stats dict)
+    """
+    detector.usage = {'requests': 0, 'crops': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+    classifications = []
+    request_seconds = []
+    for start in range(0, len(crops), crop_batch_size):
+        group = crops[start:start + crop_batch_size]
+        request_start = time.perf_counter()
+        classifications.extend(detector.classify_crops_with_openai(group, use_cache=False))
+        request_seconds.append(time.perf_counter() - request_start)
+
+    usage = detector.usage
+    total_seconds = sum(request_seconds)
+    return classifications, {
+        'requests': usage['requests'],
+        'seconds_per_request': round(total_seconds / len(request_seconds), 2),
+        'ms_per_crop': round(total_seconds / len(crops) * 1000, 1),
+        'prompt_tokens_per_crop': round(usage['prompt_tokens'] / len(crops), 1),
+        'completion_tokens_per_crop': round(usage['completion_tokens'] / len(crops), 1)
+    }
+
+
+def agreement(reference, candidate):
+    """Share of crops where both runs give the same instrument (or both reject the crop)"""
+    same = 0
+    for ref, cand in zip(reference, candidate):
+        ref_label = ref['instrument'].lower() if ref else None
+        cand_label = cand['instrument'].lower() if cand else None
+        same += ref_label == cand_label
+    return round(same / len(reference), 4) if reference else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OpenAI crop batch sizes")
+    parser.add_argument("video", help="Video to sample frames from")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--frames", type=int, default=8, help="Frames to run OWL-ViT on (default: 8)")
+    parser.add_argument("--max-crops", type=int, default=32, help="Max crops to classify (default: 32)")
+    parser.add_argument("--model", default="gpt-4o-mini", help="OpenAI model (default: gpt-4o-mini)")
+    parser.add_argument("--image-detail", default="low", help="Image detail level (default: low)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    load_dotenv()
+    detector = OwlViTInstrumentDetector(
+        api_key=os.getenv('OPENAI_API_KEY'),
+        model=args.model,
+        image_detail=args.image_detail
+    )
+
+    try:
+        crops = collect_crops(detector, sample_frames(args.video, args.frames, 1280), args.max_crops)
+        if not crops:
+            print("OWL-ViT found no crops to classify")
+            return
+        print(f"Classifying {len(crops)} crops with {args.model}")
+
+        # One request per crop is the reference
+        batch_sizes = [1] + [size for size in args.batch_sizes if size != 1]
+        results = {}
+        reference = None
+
+        for crop_batch_size in batch_sizes:
+            print(f"\n--- crop_batch_size={crop_batch_size} ---")
+            classifications, stats = run_batch_size(detector, crops, crop_batch_size)
+            if reference is None:
+                reference = classifications
+            stats['agreement'] = agreement(reference, classifications)
+            results[crop_batch_size] = stats
+    finally:
+        detector.close()
+
+    baseline = results[1]
+    print(f"\n{'='*96}")
+    print(f"{'batch':>6}{'requests':>10}{'s/request':>11}{'ms/crop':>10}{'speedup':>9}{'prompt tok/crop':>17}{'compl tok/crop':>16}{'agreement':>11}")
+    print(f"{'='*96}")
+    for crop_batch_size, stats in results.items():
+        speedup = baseline['ms_per_crop'] / stats['ms_per_crop'] if stats['ms_per_crop'] else 0
+        print(
+            f"{crop_batch_size:>6}{stats['requests']:>10}{stats['seconds_per_request']:>11}{stats['ms_per_crop']:>10}"
+            f"{speedup:>8.2f}x{stats['prompt_tokens_per_crop']:>17}{stats['completion_tokens_per_crop']:>16}"
+            f"{stats['agreement']:>11}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'model': args.model, 'crops': len(crops), 'results': results}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
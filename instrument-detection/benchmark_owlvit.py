@@ -0,0 +1,167 @@
+"""
+OWL-ViT backend benchmark
+Runs the same sampled frames through each inference backend and reports latency
+and agreement with the fp32 torch reference
+
+    python benchmark_owlvit.py video.mp4
+    python benchmark_owlvit.py video.mp4 --backends torch torch-int8 onnx --frames 32 --batch-size 4
+    python benchmark_owlvit.py video.mp4 --threads 4 --json owlvit_bench.json
+
+No OpenAI calls are made: only the OWL-ViT stage (detect_objects_batch) is timed.
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+
+from utils.video_processor import VideoProcessor
+from utils.owlvit_detector import OwlViTInstrumentDetector
+from utils.owlvit_backends import OWLVIT_BACKENDS
+from utils.bbox_utils import iou_relative, xywh_to_xyxy
+
+
+def sample_frames(video_path: str, count: int, max_dimension: int):
+    """Evenly spaced frames across the whole video"""
+    video_processor = VideoProcessor()
+    info = video_processor.get_video_info(video_path)
+    target_fps = max(count / max(info['duration'], 1e-6), 1e-3)
+    frames = video_processor.sample_frames(video_path, target_fps=target_fps, max_dimension=max_dimension)
+    return [frame_data['frame'] for frame_data in frames[:count]]
+
+
+def run_backend(backend: str, frames, batch_size: int, threads: int):
+    """
+    Time detect_objects_batch over all frames with one backend
+
+    Returns:
+        Tuple of (per-frame detections, timing dict)
+    """
+    load_start = time.perf_counter()
+    detector = OwlViTInstrumentDetector(
+        api_key="benchmark",
+        backend=backend,
+        batch_size=batch_size,
+        num_threads=threads or None
+    )
+    load_seconds = time.perf_counter() - load_start
+
+    try:
+        # Warm-up pass (allocator, onnxruntime graph caches)
+        detector.detect_objects_batch(frames[:batch_size])
+
+        detections = []
+        batch_seconds = []
+        for start in range(0, len(frames), batch_size):
+            batch = frames[start:start + batch_size]
+            batch_start = time.perf_counter()
+            detections.extend(detector.detect_objects_batch(batch))
+            batch_seconds.append((time.perf_counter() - batch_start) / len(batch))
+    finally:
+        detector.close()
+
+    per_frame = np.array(batch_seconds)
+    return detections, {
+        'load_s': round(load_seconds, 2),
+        'ms_per_frame': round(float(per_frame.mean()) * 1000, 1),
+        'p90_ms_per_frame': round(float(np.percentile(per_frame, 90)) * 1000, 1),
+        'fps': round(1.0 / float(per_frame.mean()), 2)
+    }
+
+
+def compare(reference, candidate, iou_threshold: float = 0.5):
+    """
+    Agreement of candidate detections with the reference, matched greedily per frame
+    by label and IoU
+
+    Returns:
+        Dict with recall, precision and mean absolute score difference of matches
+    """
+    matched = 0
+    reference_total = 0
+    candidate_total = 0
+    score_diffs = []
+
+    for ref_dets, cand_dets in zip(reference, candidate):
+        reference_total += len(ref_dets)
+        candidate_total += len(cand_dets)
+        used = set()
+
+        for ref in ref_dets:
+            best_idx, best_iou = None, iou_threshold
+            for idx, cand in enumerate(cand_dets):
+                if idx in used or cand['label'] != ref['label']:
+                    continue
+                iou = iou_relative(xywh_to_xyxy(ref['bbox']), xywh_to_xyxy(cand['bbox']))
+                if iou >= best_iou:
+                    best_idx, best_iou = idx, iou
+            if best_idx is not None:
+                used.add(best_idx)
+                matched += 1
+                score_diffs.append(abs(ref['score'] - cand_dets[best_idx]['score']))
+
+    return {
+        'reference_detections': reference_total,
+        'detections': candidate_total,
+        'recall': round(matched / reference_total, 4) if reference_total else 1.0,
+        'precision': round(matched / candidate_total, 4) if candidate_total else 1.0,
+        'mean_score_diff': round(float(np.mean(score_diffs)), 4) if score_diffs else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OWL-ViT inference backends")
+    parser.add_argument("video", help="Video to sample frames from")
+    parser.add_argument("--backends", nargs="+", default=list(OWLVIT_BACKENDS), choices=OWLVIT_BACKENDS)
+    parser.add_argument("--frames", type=int, default=24, help="Number of frames (default: 24)")
+    parser.add_argument("--batch-size", type=int, default=4, help="Frames per forward pass (default: 4)")
+    parser.add_argument("--threads", type=int, default=0, help="torch threads, 0 = torch default")
+    parser.add_argument("--max-resolution", type=int, default=1280, help="Max frame dimension (default: 1280)")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    frames = sample_frames(args.video, args.frames, args.max_resolution)
+    print(f"Benchmarking {len(frames)} frames, batch size {args.batch_size}")
+
+    # The fp32 torch backend is the accuracy reference
+    backends = ['torch'] + [b for b in args.backends if b != 'torch']
+    results = {}
+    reference = None
+
+    for backend in backends:
+        print(f"\n--- {backend} ---")
+        try:
+            detections, timing = run_backend(backend, frames, args.batch_size, args.threads)
+        except Exception as e:
+            print(f"⚠️ {backend} failed: {e}")
+            results[backend] = {'error': str(e)}
+            continue
+
+        if reference is None:
+            reference = detections
+        results[backend] = {**timing, **compare(reference, detections)}
+
+    baseline_ms = results.get('torch', {}).get('ms_per_frame')
+
+    print(f"\n{'='*92}")
+    print(f"{'backend':<12}{'load s':>8}{'ms/frame':>10}{'p90 ms':>9}{'speedup':>9}{'dets':>7}{'recall':>9}{'precision':>11}{'score diff':>12}")
+    print(f"{'='*92}")
+    for backend, result in results.items():
+        if 'error' in result:
+            print(f"{backend:<12}  failed: {result['error']}")
+            continue
+        speedup = f"{baseline_ms / result['ms_per_frame']:.2f}x" if baseline_ms else "-"
+        print(
+            f"{backend:<12}{result['load_s']:>8}{result['ms_per_frame']:>10}{result['p90_ms_per_frame']:>9}"
+            f"{speedup:>9}{result['detections']:>7}{result['recall']:>9}{result['precision']:>11}"
+            f"{result['mean_score_diff']:>12}"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({'frames': len(frames), 'batch_size': args.batch_size, 'results': results}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Persistent crop classification cache
+SQLite store of OpenAI crop classifications keyed by a perceptual hash (dHash),
+shared by all jobs in the process and by every worker process on the host
+
+Lookups find the closest stored hash within CLASSIFICATION_CACHE_MAX_DISTANCE bits
+(Hamming distance). The 64-bit hash is split into HASH_BANDS 16-bit bands, each
+indexed; two hashes within HASH_BANDS - 1 bits always share at least one band
+(pigeonhole), so candidates are fetched by band and compared exactly.
+"""
+
+import os
+import time
+import json
+import sqlite3
+import threading
+import cv2
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+CLASSIFICATION_CACHE_PATH = os.getenv('CLASSIFICATION_CACHE_PATH', 'cache/classifications.sqlite')
+# Max entries kept; least recently used entries are evicted beyond this
+CLASSIFICATION_CACHE_MAX_ENTRIES = int(os.getenv('CLASSIFICATION_CACHE_MAX_ENTRIES', 50000))
+# Max Hamming distance between dHashes that still counts as the same crop
+# (at most HASH_BANDS - 1; larger values are clamped)
+CLASSIFICATION_CACHE_MAX_DISTANCE = int(os.getenv('CLASSIFICATION_CACHE_MAX_DISTANCE', 3))
+
+HASH_BITS = 64
+HASH_BANDS = 4
+BAND_BITS = HASH_BITS // HASH_BANDS
+
+# Check the size bound every this many inserts
+EVICTION_CHECK_INTERVAL = 100
+
+
+def dhash(crop: np.ndarray, hash_size: int = 8) -> int:
+    """
+    Difference hash of an image: one bit per horizontally adjacent pixel pair
+    of a (hash_size + 1) x hash_size grayscale thumbnail
+
+    Args:
+        crop: Image (BGR or grayscale)
+        hash_size: Bits per row (8 -> 64-bit hash)
+
+    Returns:
+        Hash as an unsigned int
+    """
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits"""
+    return bin(a ^ b).count('1')
+
+
+def hash_bands(value: int) -> Tuple[int, ...]:
+    """Split a hash into HASH_BANDS bands of BAND_BITS bits"""
+    mask = (1 << BAND_BITS) - 1
+    return tuple((value >> (band * BAND_BITS)) & mask for band in range(HASH_BANDS))
+
+
+def _to_signed(value: int) -> int:
+    # SQLite integers are signed 64-bit
+    return value - (1 << HASH_BITS) if value >= (1 << (HASH_BITS - 1)) else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+class ClassificationCache:
+    """SQLite-backed, size-bounded cache of crop classifications with Hamming lookup"""
+
+    def __init__(
+        self,
+        path: str = CLASSIFICATION_CACHE_PATH,
+        max_entries: int = CLASSIFICATION_CACHE_MAX_ENTRIES,
+        max_distance: int = CLASSIFICATION_CACHE_MAX_DISTANCE
+    ):
+        """
+        Args:
+            path: SQLite database file (shared by worker processes)
+            max_entries: Max cached classifications (LRU eviction beyond)
+            max_distance: Max dHash Hamming distance for a hit (at most HASH_BANDS - 1)
+        """
+        self.path = path
+        self.max_entries = max_entries
+
+        # Band lookup only guarantees finding hashes within HASH_BANDS - 1 bits
+        if max_distance > HASH_BANDS - 1:
+            print(
+                f"⚠️ Warning: Classification cache max_distance {max_distance} exceeds "
+                f"{HASH_BANDS - 1} (HASH_BANDS - 1), using {HASH_BANDS - 1}"
+            )
+            max_distance = HASH_BANDS - 1
+        self.max_distance = max(0, max_distance)
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._inserts_since_check = 0
+
+        # Process-wide counters
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are not shared across threads)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            # WAL lets other workers read while one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+
+        with self._lock:
+            if not self._initialized:
+                band_columns = ", ".join(f"band{band} INTEGER NOT NULL" for band in range(HASH_BANDS))
+                with conn:
+                    conn.execute(f"""
+                        CREATE TABLE IF NOT EXISTS classifications (
+                            id INTEGER PRIMARY KEY,
+                            namespace TEXT NOT NULL,
+                            hash INTEGER NOT NULL,
+                            {band_columns},
+                            result TEXT,
+                            created_at REAL NOT NULL,
+                            last_used REAL NOT NULL,
+                            hits INTEGER NOT NULL DEFAULT 0
+                        )
+                    """)
+                    for band in range(HASH_BANDS):
+                        conn.execute(
+                            f"CREATE INDEX IF NOT EXISTS idx_classifications_band{band} "
+                            f"ON classifications (namespace, band{band})"
+                        )
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_classifications_last_used ON classifications (last_used)")
+                self._initialized = True
+
+        return conn
+
+    def lookup(self, namespace: str, crop_hash: int) -> Tuple[bool, Optional[Dict]]:
+        """
+        Find the classification of the closest cached crop
+
+        Args:
+            namespace: Separates incompatible entries (e.g. the OpenAI model)
+            crop_hash: dHash of the crop
+
+        Returns:
+            Tuple of (hit, classification or None)
+        """
+        bands = hash_bands(crop_hash)
+        where = " OR ".join(f"band{band} = ?" for band in range(HASH_BANDS))
+
+        try:
+            conn = self._connection()
+            rows = conn.execute(
+                f"SELECT id, hash, result FROM classifications WHERE namespace = ? AND ({where})",
+                (namespace, *bands)
+            ).fetchall()
+
+            best = None
+            for entry_id, stored_hash, result in rows:
+                distance = hamming_distance(crop_hash, _to_unsigned(stored_hash))
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, entry_id, result)
+
+            if best is None:
+                with self._lock:
+                    self.misses += 1
+                return False, None
+
+            distance, entry_id, result = best
+            with conn:
+                conn.execute(
+                    "UPDATE classifications SET last_used = ?, hits = hits + 1 WHERE id = ?",
+                    (time.time(), entry_id)
+                )
+            with self._lock:
+                self.hits += 1
+                if distance > 0:
+                    self.near_hits += 1
+            return True, (json.loads(result) if result is not None else None)
+
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+                self.misses += 1
+            print(f"⚠️ Warning: Classification cache lookup failed: {e}")
+            return False, None
+
+    def store(self, namespace: str, crop_hash: int, classification: Optional[Dict]):
+        """
+        Cache a classification (None = not an instrument)
+
+        Args:
+            namespace: Separates incompatible entries (e.g. the OpenAI model)
+            crop_hash: dHash of the crop
+            classification: Result of classify_crop_with_openai
+        """
+        now = time.time()
+        try:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    f"INSERT INTO classifications (namespace, hash, "
+                    f"{', '.join(f'band{band}' for band in range(HASH_BANDS))}, result, created_at, last_used) "
+                    f"VALUES (?, ?, {', '.join('?' * HASH_BANDS)}, ?, ?, ?)",
+                    (
+                        namespace,
+                        _to_signed(crop_hash),
+                        *hash_bands(crop_hash),
+                        json.dumps(classification) if classification is not None else None,
+                        now,
+                        now
+                    )
+                )
+
+            with self._lock:
+                self.stores += 1
+                self._inserts_since_check += 1
+                check = self._inserts_since_check >= EVICTION_CHECK_INTERVAL
+                if check:
+                    self._inserts_since_check = 0
+            if check:
+                self.evict()
+
+        except sqlite3.Error as e:
+            with self._lock:
+                self.errors += 1
+            print(f"⚠️ Warning: Classification cache store failed: {e}")
+
+    def evict(self) -> int:
+        """
+        Drop least recently used entries beyond max_entries
+
+        Returns:
+            Number of evicted entries
+        """
+        conn = self._connection()
+        count = conn.execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return 0
+
+        with conn:
+            conn.execute(
+                "DELETE FROM classifications WHERE id IN "
+                "(SELECT id FROM classifications ORDER BY last_used LIMIT ?)",
+                (excess,)
+            )
+        with self._lock:
+            self.evictions += excess
+        print(f"♻️ Evicted {excess} classification cache entries")
+        return excess
+
+    def stats(self) -> Dict:
+        """Hit-rate metrics of this process plus the size of the shared store"""
+        try:
+            entries = self._connection().execute("SELECT COUNT(*) FROM classifications").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'path': self.path,
+                'entries': entries,
+                'max_entries': self.max_entries,
+                'max_distance': self.max_distance,
+                'lookups': lookups,
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'errors': self.errors
+            }
+
+
+# Shared by every detector in the process
+classification_cache = ClassificationCache()
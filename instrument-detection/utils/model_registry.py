@@ -0,0 +1,212 @@
+"""
+OWL-ViT Model Registry
+Loads each model once per process and lets jobs share it through an inference queue
+"""
+
+import os
+import time
+import queue
+import threading
+import torch
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+from transformers import OwlViTProcessor, OwlViTForObjectDetection
+from utils.owlvit_backends import load_backend, DEFAULT_OWLVIT_BACKEND
+
+OWLVIT_MODEL_NAME = "google/owlvit-base-patch32"
+
+# Upper bound for resident model weights in MB (0 = unlimited)
+MODEL_MEMORY_BUDGET_MB = int(os.getenv('OWLVIT_MEMORY_BUDGET_MB', 0))
+
+
+def model_size_mb(model: torch.nn.Module) -> float:
+    """Size of a model's state (including packed quantized weights) in MB"""
+    total = 0
+    for value in model.state_dict().values():
+        for tensor in (value if isinstance(value, tuple) else (value,)):
+            if isinstance(tensor, torch.Tensor):
+                total += tensor.numel() * tensor.element_size()
+    return total / (1024 * 1024)
+
+
+class ModelHandle:
+    """
+    A loaded model shared by all jobs in the process
+
+    Preprocessing can run in the job threads; forward passes are submitted to
+    run() and executed one at a time by a dedicated inference thread, so
+    concurrent jobs queue up instead of fighting over the same CPU threads.
+    """
+
+    def __init__(self, key: str, processor, model, device: str, backend: str, vision_forward: Callable):
+        self.key = key
+        self.processor = processor
+        self.model = model
+        self.device = device
+        self.backend = backend
+        # vision_forward(pixel_values, query_embeds, query_mask) -> (pred_logits, pred_boxes)
+        self.vision_forward = vision_forward
+        self.size_mb = model_size_mb(model) + getattr(vision_forward, 'size_mb', 0)
+        self.borrowers = 0
+        self.last_used = time.time()
+        self.inference_count = 0
+
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._serve, daemon=True, name=f"inference-{key}")
+        self._thread.start()
+
+    def _serve(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            future, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def run(self, fn: Callable, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the inference thread and wait for the result
+
+        Args:
+            fn: Function performing the forward pass (enters its own no_grad/inference_mode)
+
+        Returns:
+            Whatever fn returns (exceptions are re-raised in the caller)
+        """
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        result = future.result()
+        self.last_used = time.time()
+        self.inference_count += 1
+        return result
+
+    def queue_depth(self) -> int:
+        """Forward passes waiting for the inference thread"""
+        return self._queue.qsize()
+
+    def shutdown(self):
+        """Stop the inference thread after queued work has finished"""
+        self._queue.put(None)
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded OWL-ViT models with a memory budget"""
+
+    def __init__(self, memory_budget_mb: int = MODEL_MEMORY_BUDGET_MB):
+        """
+        Args:
+            memory_budget_mb: Max MB of loaded weights (0 = unlimited)
+        """
+        self.memory_budget_mb = memory_budget_mb
+        self._handles: Dict[str, ModelHandle] = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _load(self, model_name: str, device: str, backend: str) -> ModelHandle:
+        print(f"Loading OWL-ViT model {model_name} ({backend})...")
+        processor = OwlViTProcessor.from_pretrained(model_name)
+        model = OwlViTForObjectDetection.from_pretrained(model_name)
+        model.to(device)
+        model.eval()
+        model, vision_forward = load_backend(model, model_name, backend, device)
+        self.loads += 1
+
+        handle = ModelHandle(f"{model_name}@{device}:{backend}", processor, model, device, backend, vision_forward)
+        print(f"✓ OWL-ViT model loaded on {device} ({backend}, {handle.size_mb:.0f} MB)")
+        return handle
+
+    def _resident_mb(self) -> float:
+        return sum(handle.size_mb for handle in self._handles.values())
+
+    def _enforce_budget(self, keep: str):
+        """Evict idle models (least recently used first) until within budget"""
+        if not self.memory_budget_mb:
+            return
+
+        idle = sorted(
+            (h for k, h in self._handles.items() if k != keep and h.borrowers == 0),
+            key=lambda h: h.last_used
+        )
+        while self._resident_mb() > self.memory_budget_mb and idle:
+            handle = idle.pop(0)
+            del self._handles[handle.key]
+            handle.shutdown()
+            self.evictions += 1
+            print(f"♻️ Evicted OWL-ViT model {handle.key} ({handle.size_mb:.0f} MB)")
+
+        if self._resident_mb() > self.memory_budget_mb:
+            handle = self._handles.pop(keep)
+            handle.shutdown()
+            raise RuntimeError(
+                f"OWL-ViT memory budget exceeded: {handle.size_mb:.0f} MB needed, "
+                f"{self.memory_budget_mb} MB budget with models in use"
+            )
+
+    def acquire(
+        self,
+        model_name: str = OWLVIT_MODEL_NAME,
+        device: Optional[str] = None,
+        backend: str = DEFAULT_OWLVIT_BACKEND
+    ) -> ModelHandle:
+        """
+        Borrow a model, loading it on first use
+
+        Args:
+            model_name: Hugging Face model id
+            device: 'cuda' or 'cpu' (default: cuda if available, always cpu for torch-int8)
+            backend: One of OWLVIT_BACKENDS
+
+        Returns:
+            ModelHandle (give it back with release())
+        """
+        if device is None:
+            device = "cuda" if torch.cuda.is_available() and backend != 'torch-int8' else "cpu"
+        key = f"{model_name}@{device}:{backend}"
+
+        # Loading under the lock means concurrent jobs wait for one load
+        # instead of each reading the weights
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is None:
+                handle = self._load(model_name, device, backend)
+                self._handles[key] = handle
+                self._enforce_budget(keep=key)
+            handle.borrowers += 1
+            handle.last_used = time.time()
+            return handle
+
+    def release(self, handle: ModelHandle):
+        """Give back a model obtained from acquire()"""
+        with self._lock:
+            handle.borrowers = max(0, handle.borrowers - 1)
+
+    def stats(self) -> Dict:
+        """Loaded models and counters"""
+        with self._lock:
+            return {
+                'memory_budget_mb': self.memory_budget_mb,
+                'resident_mb': round(self._resident_mb(), 1),
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'models': [
+                    {
+                        'key': handle.key,
+                        'size_mb': round(handle.size_mb, 1),
+                        'borrowers': handle.borrowers,
+                        'queue_depth': handle.queue_depth(),
+                        'inference_count': handle.inference_count
+                    }
+                    for handle in self._handles.values()
+                ]
+            }
+
+
+# Shared by every detector in the process
+model_registry = ModelRegistry()
@@ -6,7 +6,7 @@ Uses GPT-4o/GPT-4o-mini with structured outputs for bounding box detection
 import base64
 import cv2
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Optional, Tuple
 from openai import OpenAI
 import json
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -15,6 +15,9 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 class OpenAIInstrumentDetector:
     """Detects musical instruments using OpenAI vision models"""
 
+    # batch_detect_with_metadata() works on windows of max_workers * this many frames
+    STREAM_WINDOW_PER_WORKER = 4
+
     # Comprehensive list of musical instruments organized by category
     INSTRUMENTS = {
         "strings": [
@@ -473,7 +476,8 @@ Return valid JSON with all instruments found."""
         detect_playing: bool = True,
         confidence_threshold: float = 0.5,
         skip_similar: bool = True,
-        similarity_threshold: float = 0.95
+        similarity_threshold: float = 0.95,
+        previous: Optional[Tuple[np.ndarray, List[Dict]]] = None
     ) -> List[List[Dict]]:
         """
         Detect instruments in multiple frames with parallel processing
@@ -484,6 +488,8 @@ Return valid JSON with all instruments found."""
             confidence_threshold: Minimum confidence threshold
             skip_similar: Skip frames that are very similar to previous frame
             similarity_threshold: Threshold for frame similarity (0-1)
+            previous: (frame, detections) of the frame before frames[0], so that
+                similar-frame skipping carries over between consecutive batches
 
         Returns:
             List of detection lists, one per frame
@@ -492,8 +498,12 @@ Return valid JSON with all instruments found."""
         frames_to_process = []
 
         # Determine which frames to process (skip similar frames)
-        if skip_similar and len(frames) > 1:
-            frames_to_process.append((0, frames[0]))  # Always process first frame
+        if skip_similar and (len(frames) > 1 or previous is not None):
+            # Always process first frame, unless it repeats the previous batch's last one
+            if previous is not None and self.is_similar_frame(previous[0], frames[0], similarity_threshold):
+                results[0] = "COPY_PREVIOUS"
+            else:
+                frames_to_process.append((0, frames[0]))
 
             for idx in range(1, len(frames)):
                 if not self.is_similar_frame(frames[idx-1], frames[idx], similarity_threshold):
@@ -525,16 +535,17 @@ Return valid JSON with all instruments found."""
                     print(f"Error processing frame {idx}: {e}")
                     results[idx] = []
 
-        # Fill in copied results
+        # Fill in copied results (copy each detection: frame metadata is added per frame later)
         for idx in range(len(results)):
-            if results[idx] == "COPY_PREVIOUS" and idx > 0:
-                results[idx] = results[idx - 1].copy() if results[idx - 1] else []
+            if isinstance(results[idx], str) and results[idx] == "COPY_PREVIOUS":
+                source = results[idx - 1] if idx > 0 else previous[1]
+                results[idx] = [dict(det) for det in source] if source else []
 
         return results
 
     def batch_detect_with_metadata(
         self,
-        frames_data: List[Dict],
+        frames_data: Iterable[Dict],
         detect_playing: bool = True,
         confidence_threshold: float = 0.5,
         skip_similar: bool = True,
@@ -543,8 +554,12 @@ Return valid JSON with all instruments found."""
         """
         Detect instruments with frame metadata and progress tracking
 
+        Frames are consumed in windows of max_workers * STREAM_WINDOW_PER_WORKER, so
+        frames_data can be a list or a streaming source such as
+        VideoProcessor.iter_frames() without holding every frame in memory
+
         Args:
-            frames_data: List of dicts with 'frame', 'frame_idx', 'timestamp'
+            frames_data: List (or iterable) of dicts with 'frame', 'frame_idx', 'timestamp'
             detect_playing: Whether to detect playing status
             confidence_threshold: Minimum confidence threshold
             skip_similar: Skip similar consecutive frames
@@ -553,24 +568,44 @@ Return valid JSON with all instruments found."""
         Returns:
             List of detections with metadata
         """
-        frames = [fd['frame'] for fd in frames_data]
-        batch_results = self.batch_detect(
-            frames,
-            detect_playing=detect_playing,
-            confidence_threshold=confidence_threshold,
-            skip_similar=skip_similar
-        )
+        total_frames = len(frames_data) if isinstance(frames_data, list) else getattr(frames_data, 'expected_frames', 0)
+        window_size = max(1, self.max_workers * self.STREAM_WINDOW_PER_WORKER)
 
         all_detections = []
-        for idx, (frame_data, detections) in enumerate(zip(frames_data, batch_results)):
-            # Add frame metadata to each detection
-            for det in detections:
-                det['frame_idx'] = frame_data['frame_idx']
-                det['timestamp'] = frame_data['timestamp']
+        window = []
+        previous = None
+        done = 0
+
+        def flush():
+            nonlocal previous, done
+            batch_results = self.batch_detect(
+                [fd['frame'] for fd in window],
+                detect_playing=detect_playing,
+                confidence_threshold=confidence_threshold,
+                skip_similar=skip_similar,
+                previous=previous
+            )
+
+            for frame_data, detections in zip(window, batch_results):
+                # Add frame metadata to each detection
+                for det in detections:
+                    det['frame_idx'] = frame_data['frame_idx']
+                    det['timestamp'] = frame_data['timestamp']
+
+                all_detections.extend(detections)
+                done += 1
+
+                if progress_callback:
+                    progress_callback(done, max(total_frames, done))
 
-            all_detections.extend(detections)
+            previous = (window[-1]['frame'], batch_results[-1])
+            window.clear()
 
-            if progress_callback:
-                progress_callback(idx + 1, len(frames_data))
+        for frame_data in frames_data:
+            window.append(frame_data)
+            if len(window) >= window_size:
+                flush()
+        if window:
+            flush()
 
         return all_detections
@@ -0,0 +1,170 @@
+"""
+OWL-ViT Inference Backends
+Alternative implementations of the vision forward pass for CPU-only nodes:
+
+- torch:      fp32 PyTorch (reference)
+- torch-int8: torch dynamic int8 quantization of all nn.Linear layers
+- onnx:       vision tower + heads exported to ONNX and run with onnxruntime
+
+Each backend returns a vision_forward(pixel_values, query_embeds, query_mask)
+callable producing (pred_logits, pred_boxes) torch tensors
+"""
+
+import os
+import torch
+from typing import Callable, Tuple
+
+OWLVIT_BACKENDS = ('torch', 'torch-int8', 'onnx')
+
+# Backend used when a job does not choose one
+DEFAULT_OWLVIT_BACKEND = os.getenv('OWLVIT_BACKEND', 'torch')
+
+# Where exported ONNX graphs are kept between restarts
+ONNX_EXPORT_DIR = os.getenv('OWLVIT_ONNX_DIR', 'models/onnx')
+ONNX_OPSET = 17
+
+
+class OwlViTVisionHead(torch.nn.Module):
+    """Vision tower + class/box heads of OwlViTForObjectDetection, text embeddings as input"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, pixel_values, query_embeds, query_mask):
+        feature_map, _ = self.model.image_embedder(pixel_values=pixel_values)
+        batch_size, num_patches_h, num_patches_w, hidden_dim = feature_map.shape
+        image_feats = feature_map.reshape(batch_size, num_patches_h * num_patches_w, hidden_dim)
+
+        pred_logits, _ = self.model.class_predictor(image_feats, query_embeds, query_mask)
+        pred_boxes = self.model.box_predictor(image_feats, feature_map)
+        return pred_logits, pred_boxes
+
+
+def quantize_int8(model):
+    """
+    Dynamic int8 quantization of the Linear layers (weights int8, activations quantized on the fly)
+
+    Args:
+        model: fp32 OwlViTForObjectDetection on CPU
+
+    Returns:
+        Quantized copy of the model
+    """
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export_onnx(model, model_name: str, export_dir: str = ONNX_EXPORT_DIR) -> str:
+    """
+    Export the vision head to ONNX (once, reused afterwards)
+
+    Args:
+        model: fp32 OwlViTForObjectDetection
+        model_name: Hugging Face model id (used for the file name)
+        export_dir: Directory for exported graphs
+
+    Returns:
+        Path to the .onnx file
+    """
+    path = os.path.join(export_dir, f"{model_name.replace('/', '__')}_vision.onnx")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(export_dir, exist_ok=True)
+    print(f"Exporting OWL-ViT vision head to {path}...")
+
+    device = next(model.parameters()).device
+    image_size = model.config.vision_config.image_size
+    query_dim = model.owlvit.text_projection.out_features
+
+    dummy_pixels = torch.zeros(1, 3, image_size, image_size, device=device)
+    dummy_queries = torch.zeros(1, 2, query_dim, device=device)
+    dummy_mask = torch.ones(1, 2, dtype=torch.bool, device=device)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            OwlViTVisionHead(model).eval(),
+            (dummy_pixels, dummy_queries, dummy_mask),
+            tmp_path,
+            input_names=['pixel_values', 'query_embeds', 'query_mask'],
+            output_names=['pred_logits', 'pred_boxes'],
+            dynamic_axes={
+                'pixel_values': {0: 'batch'},
+                'query_embeds': {0: 'batch', 1: 'queries'},
+                'query_mask': {0: 'batch', 1: 'queries'},
+                'pred_logits': {0: 'batch', 2: 'queries'},
+                'pred_boxes': {0: 'batch'}
+            },
+            opset_version=ONNX_OPSET
+        )
+    os.replace(tmp_path, path)
+    print(f"✓ Exported OWL-ViT vision head ({os.path.getsize(path) / (1024 * 1024):.0f} MB)")
+    return path
+
+
+def onnx_vision_forward(path: str, device: str = "cpu") -> Callable:
+    """
+    onnxruntime session wrapped as a vision_forward callable
+
+    Args:
+        path: Exported .onnx file
+        device: 'cuda' uses the CUDA provider when onnxruntime has it
+
+    Returns:
+        vision_forward(pixel_values, query_embeds, query_mask) -> (pred_logits, pred_boxes)
+    """
+    try:
+        import onnxruntime as ort
+    except ImportError:
+        raise RuntimeError("The 'onnx' OWL-ViT backend requires onnxruntime (pip install -r requirements-onnx.txt)")
+
+    providers = ['CPUExecutionProvider']
+    if device == "cuda" and 'CUDAExecutionProvider' in ort.get_available_providers():
+        providers.insert(0, 'CUDAExecutionProvider')
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if torch.get_num_threads() > 0:
+        options.intra_op_num_threads = torch.get_num_threads()
+    session = ort.InferenceSession(path, sess_options=options, providers=providers)
+
+    def vision_forward(pixel_values, query_embeds, query_mask):
+        pred_logits, pred_boxes = session.run(None, {
+            'pixel_values': pixel_values.detach().cpu().numpy(),
+            'query_embeds': query_embeds.detach().cpu().numpy(),
+            'query_mask': query_mask.detach().cpu().numpy()
+        })
+        return torch.from_numpy(pred_logits), torch.from_numpy(pred_boxes)
+
+    # The session keeps its own copy of the weights
+    vision_forward.size_mb = os.path.getsize(path) / (1024 * 1024)
+    return vision_forward
+
+
+def load_backend(model, model_name: str, backend: str, device: str) -> Tuple[torch.nn.Module, Callable]:
+    """
+    Prepare a loaded fp32 model for the requested backend
+
+    Args:
+        model: fp32 OwlViTForObjectDetection (already on device)
+        model_name: Hugging Face model id
+        backend: One of OWLVIT_BACKENDS
+        device: 'cuda' or 'cpu'
+
+    Returns:
+        Tuple of (model used for the text tower, vision_forward callable)
+    """
+    if backend not in OWLVIT_BACKENDS:
+        raise ValueError(f"Unknown OWL-ViT backend '{backend}'. Allowed: {', '.join(OWLVIT_BACKENDS)}")
+
+    if backend == 'torch-int8':
+        if device != "cpu":
+            raise ValueError("The 'torch-int8' OWL-ViT backend only runs on CPU")
+        model = quantize_int8(model)
+    elif backend == 'onnx':
+        vision_forward = onnx_vision_forward(export_onnx(model, model_name), device)
+        # The torch model stays loaded for the (cached) text embeddings
+        return model, vision_forward
+
+    return model, OwlViTVisionHead(model)
@@ -6,16 +6,37 @@ Then uses OpenAI for classification and metadata
 
 import cv2
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterable, Optional
 import torch
 from PIL import Image
-from transformers import OwlViTProcessor, OwlViTForObjectDetection
+from transformers.models.owlvit.modeling_owlvit import OwlViTObjectDetectionOutput
 from openai import OpenAI
 import base64
 import json
 from torchvision.ops import nms
+from utils.query_embeddings import query_embedding_cache
+from utils.model_registry import model_registry, OWLVIT_MODEL_NAME
+from utils.owlvit_backends import DEFAULT_OWLVIT_BACKEND
+from utils.rate_limiter import get_rate_limiter, OPENAI_REQUESTS_PER_MINUTE
+from utils.classification_cache import classification_cache, dhash
 import hashlib
 import copy
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Text queries for musical instruments
+DEFAULT_INSTRUMENT_QUERIES = [
+    "a musical instrument",
+    "a violin",
+    "a guitar",
+    "a piano",
+    "a drum",
+    "a trumpet",
+    "a saxophone",
+    "a flute",
+    "a cello",
+    "a clarinet"
+]
 
 
 class OwlViTInstrumentDetector:
@@ -30,7 +51,15 @@ class OwlViTInstrumentDetector:
         api_key: str,
         model: str = "gpt-4o-mini",
         image_detail: str = "low",
-        owlvit_threshold: float = 0.1
+        owlvit_threshold: float = 0.1,
+        batch_size: int = 4,
+        num_threads: Optional[int] = None,
+        inference_mode: bool = True,
+        instrument_queries: Optional[List[str]] = None,
+        backend: str = DEFAULT_OWLVIT_BACKEND,
+        max_workers: int = 5,
+        crop_batch_size: int = 1,
+        requests_per_minute: int = OPENAI_REQUESTS_PER_MINUTE
     ):
         """
         Initialize OWL-ViT + OpenAI detector
@@ -40,56 +69,71 @@ class OwlViTInstrumentDetector:
             model: OpenAI model for classification
             image_detail: Image detail level for OpenAI
             owlvit_threshold: Confidence threshold for OWL-ViT detections
+            batch_size: Frames per OWL-ViT forward pass
+            num_threads: torch intra-op threads (process-wide, None = torch default)
+            inference_mode: Use torch.inference_mode() instead of torch.no_grad()
+            instrument_queries: OWL-ViT text queries (default: DEFAULT_INSTRUMENT_QUERIES)
+            backend: OWL-ViT inference backend, one of OWLVIT_BACKENDS ('torch', 'torch-int8', 'onnx')
+            max_workers: Concurrent OpenAI crop classifications
+            crop_batch_size: Crops per OpenAI request (1 = one request per crop)
+            requests_per_minute: OpenAI request limit shared by all detectors using this API key
         """
         self.client = OpenAI(api_key=api_key)
         self.model = model
         self.image_detail = image_detail
         self.owlvit_threshold = owlvit_threshold
+        self.batch_size = max(1, batch_size)
+        self.inference_mode = inference_mode
 
-        # Initialize OWL-ViT model
-        print("Loading OWL-ViT model...")
-        self.processor = OwlViTProcessor.from_pretrained("google/owlvit-base-patch32")
-        self.owlvit_model = OwlViTForObjectDetection.from_pretrained("google/owlvit-base-patch32")
-
-        # Move to GPU if available
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.owlvit_model.to(self.device)
-        print(f"✓ OWL-ViT model loaded on {self.device}")
-
-        # Text queries for musical instruments
-        self.instrument_queries = [
-            "a musical instrument",
-            "a violin",
-            "a guitar",
-            "a piano",
-            "a drum",
-            "a trumpet",
-            "a saxophone",
-            "a flute",
-            "a cello",
-            "a clarinet"
-        ]
-
-        # Cache for OpenAI classifications to avoid redundant API calls
-        self.classification_cache = {}
-        self.api_calls_saved = 0
+        self.classification_pool = None
 
-    def compute_crop_hash(self, crop: np.ndarray) -> str:
+        # Borrow the process-wide OWL-ViT model (loaded on first use, on GPU if available);
+        # forward passes go through its inference queue
+        self.owlvit = model_registry.acquire(OWLVIT_MODEL_NAME, backend=backend)
+        try:
+            self.backend = backend
+            self.processor = self.owlvit.processor
+            self.owlvit_model = self.owlvit.model
+            self.device = self.owlvit.device
+            print(f"✓ OWL-ViT model ready on {self.device} ({backend})")
+
+            if num_threads:
+                # Set on the inference thread, where the forward passes run
+                self.owlvit.run(torch.set_num_threads, num_threads)
+
+            # Text embeddings come from the shared cache, so custom query lists
+            # only pay for the text tower the first time they are seen
+            self.instrument_queries = list(instrument_queries or DEFAULT_INSTRUMENT_QUERIES)
+            self.encode_queries()
+
+            # Persistent cache of OpenAI classifications shared across jobs and workers,
+            # keyed by crop dHash; entries are only reused for the same model and detail
+            self.classification_cache = classification_cache
+            self.cache_namespace = f"{model}:{image_detail}"
+            self.api_calls_saved = 0
+            self.cache_lock = threading.Lock()
+            self.usage = {'requests': 0, 'crops': 0, 'prompt_tokens': 0, 'completion_tokens': 0}
+
+            # Crops are classified concurrently, paced per API key
+            self.crop_batch_size = max(1, crop_batch_size)
+            self.classification_pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="crop-classify")
+            self.rate_limiter = get_rate_limiter(api_key, requests_per_minute)
+        except Exception:
+            # Don't leak the borrowed model (or the pool) when setup fails
+            self.close()
+            raise
+
+    def compute_crop_hash(self, crop: np.ndarray) -> int:
         """
-        Compute a hash of the crop for caching purposes
+        Compute a perceptual hash of the crop for caching purposes
 
         Args:
             crop: Cropped image
 
         Returns:
-            Hash string
+            64-bit dHash (near-identical crops differ in a few bits)
         """
-        # Resize to small size for faster hashing
-        small_crop = cv2.resize(crop, (64, 64))
-        # Convert to bytes and hash
-        crop_bytes = small_crop.tobytes()
-        crop_hash = hashlib.md5(crop_bytes).hexdigest()
-        return crop_hash
+        return dhash(crop)
 
     def apply_nms(self, detections: List[Dict], iou_threshold: float = 0.5) -> List[Dict]:
         """
@@ -126,6 +170,73 @@ class OwlViTInstrumentDetector:
 
         return filtered_detections
 
+    def inference_context(self):
+        """Context manager for OWL-ViT forward passes"""
+        return torch.inference_mode() if self.inference_mode else torch.no_grad()
+
+    def encode_queries(self):
+        """
+        Load text embeddings for self.instrument_queries from the query cache
+
+        Stores query_embeds [1, num_queries, dim] and query_mask [1, num_queries]
+        so detection only has to run the vision tower
+        """
+        # int8 weights give slightly different text embeddings, so the backend is part of the key
+        self.query_embeds, self.query_mask = query_embedding_cache.get(
+            f"{OWLVIT_MODEL_NAME}:{self.backend}",
+            self.instrument_queries,
+            self.compute_query_embeddings,
+            device=self.device
+        )
+
+    def compute_query_embeddings(self) -> tuple:
+        """
+        Run the OWL-ViT text tower on self.instrument_queries
+
+        Returns:
+            Tuple of (query_embeds [1, num_queries, dim], query_mask [1, num_queries])
+        """
+        text_inputs = self.processor(text=self.instrument_queries, return_tensors="pt")
+        input_ids = text_inputs["input_ids"].to(self.device)
+        attention_mask = text_inputs["attention_mask"].to(self.device)
+
+        query_embeds = self.owlvit.run(self._text_forward, input_ids, attention_mask)
+
+        # clone() outside inference mode so the cached tensors are ordinary tensors
+        query_embeds = query_embeds.clone().unsqueeze(0)
+        # If first token is 0, then this is a padded query
+        query_mask = (input_ids[:, 0] > 0).unsqueeze(0)
+        return query_embeds, query_mask
+
+    def _text_forward(self, input_ids, attention_mask):
+        """Text tower forward pass (runs on the model's inference thread)"""
+        with self.inference_context():
+            query_embeds = self.owlvit_model.owlvit.get_text_features(
+                input_ids=input_ids,
+                attention_mask=attention_mask
+            )
+            # Same normalization as the full OwlViTModel forward pass
+            return query_embeds / torch.linalg.norm(query_embeds, ord=2, dim=-1, keepdim=True)
+
+    def _vision_forward(self, pixel_values):
+        """Vision tower + heads against the cached queries (runs on the model's inference thread)"""
+        batch_size = pixel_values.shape[0]
+
+        with self.inference_context():
+            return self.owlvit.vision_forward(
+                pixel_values,
+                self.query_embeds.expand(batch_size, -1, -1),
+                self.query_mask.expand(batch_size, -1)
+            )
+
+    def close(self):
+        """Return the shared OWL-ViT model to the registry and stop the classification threads"""
+        if self.classification_pool is not None:
+            self.classification_pool.shutdown(wait=True)
+        if self.owlvit is not None:
+            model_registry.release(self.owlvit)
+            self.owlvit = None
+
     def detect_objects_with_owlvit(self, frame: np.ndarray) -> List[Dict]:
         """
         Use OWL-ViT to detect instruments in frame
@@ -136,56 +247,125 @@ class OwlViTInstrumentDetector:
         Returns:
             List of detections with bbox, score, label
         """
+        return self.detect_objects_batch([frame])[0]
+
+    def detect_objects_batch(self, frames: List[np.ndarray]) -> List[List[Dict]]:
+        """
+        Use OWL-ViT to detect instruments in several frames with one forward pass
+
+        Args:
+            frames: OpenCV frames (BGR)
+
+        Returns:
+            One list of detections (bbox, score, label) per frame
+        """
+        if len(frames) == 0:
+            return []
+
         # Convert BGR to RGB
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        image_pil = Image.fromarray(frame_rgb)
-
-        # Prepare inputs
-        inputs = self.processor(
-            text=self.instrument_queries,
-            images=image_pil,
-            return_tensors="pt"
-        )
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        images_pil = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in frames]
+
+        # Prepare inputs (images only, text embeddings are cached)
+        pixel_values = self.processor(images=images_pil, return_tensors="pt")["pixel_values"].to(self.device)
 
         # Get predictions
-        with torch.no_grad():
-            outputs = self.owlvit_model(**inputs)
+        pred_logits, pred_boxes = self.owlvit.run(self._vision_forward, pixel_values)
+        outputs = OwlViTObjectDetectionOutput(logits=pred_logits, pred_boxes=pred_boxes)
 
         # Process results
-        target_sizes = torch.Tensor([image_pil.size[::-1]]).to(self.device)
+        target_sizes = torch.Tensor([image_pil.size[::-1] for image_pil in images_pil]).to(self.device)
         results = self.processor.post_process_object_detection(
             outputs=outputs,
             threshold=self.owlvit_threshold,
             target_sizes=target_sizes
         )
 
-        detections = []
-        boxes, scores, labels = results[0]["boxes"], results[0]["scores"], results[0]["labels"]
+        batch_detections = []
+        for result in results:
+            detections = []
+            boxes, scores, labels = result["boxes"], result["scores"], result["labels"]
 
-        for box, score, label in zip(boxes, scores, labels):
-            box = box.cpu().numpy()
-            score = score.cpu().item()
-            label = label.cpu().item()
+            for box, score, label in zip(boxes, scores, labels):
+                box = box.cpu().numpy()
+                score = score.cpu().item()
+                label = label.cpu().item()
 
-            # Convert box to [x, y, w, h]
-            x1, y1, x2, y2 = box
-            x = int(x1)
-            y = int(y1)
-            w = int(x2 - x1)
-            h = int(y2 - y1)
+                # Convert box to [x, y, w, h]
+                x1, y1, x2, y2 = box
+                x = int(x1)
+                y = int(y1)
+                w = int(x2 - x1)
+                h = int(y2 - y1)
 
-            detections.append({
-                'bbox': [x, y, w, h],
-                'score': score,
-                'label': self.instrument_queries[label],
-                'owlvit_confidence': score
-            })
+                detections.append({
+                    'bbox': [x, y, w, h],
+                    'score': score,
+                    'label': self.instrument_queries[label],
+                    'owlvit_confidence': score
+                })
 
-        # Apply NMS to remove duplicate detections of the same object
-        detections = self.apply_nms(detections, iou_threshold=0.5)
+            # Apply NMS to remove duplicate detections of the same object
+            batch_detections.append(self.apply_nms(detections, iou_threshold=0.5))
+
+        return batch_detections
+
+    def lookup_classification(self, crop_hash: int) -> tuple:
+        """
+        Look up a cached classification (closest crop within the cache's Hamming distance)
+
+        Returns:
+            Tuple of (hit, classification or None)
+        """
+        hit, cached = self.classification_cache.lookup(self.cache_namespace, crop_hash)
+        if not hit:
+            return False, None
+
+        with self.cache_lock:
+            self.api_calls_saved += 1
+            print(f"    💾 Using cached result (saved {self.api_calls_saved} API calls)")
+        return True, cached
+
+    def store_classification(self, crop_hash: int, classification: Optional[Dict]):
+        """Cache a classification (even if None) to avoid re-checking non-instruments"""
+        self.classification_cache.store(self.cache_namespace, crop_hash, classification)
+
+    def record_usage(self, response, crops: int):
+        """Accumulate OpenAI token usage for the job summary"""
+        usage = getattr(response, 'usage', None)
+        with self.cache_lock:
+            self.usage['requests'] += 1
+            self.usage['crops'] += crops
+            if usage is not None:
+                self.usage['prompt_tokens'] += usage.prompt_tokens or 0
+                self.usage['completion_tokens'] += usage.completion_tokens or 0
+
+    def encode_crop(self, crop: np.ndarray) -> Dict:
+        """Crop as an image_url message part"""
+        _, buffer = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        crop_base64 = base64.b64encode(buffer).decode('utf-8')
+        return {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:image/jpeg;base64,{crop_base64}",
+                "detail": self.image_detail
+            }
+        }
+
+    def parse_classification(self, result: Dict) -> Optional[Dict]:
+        """
+        Convert the model's JSON answer for one crop into a classification
 
-        return detections
+        Returns:
+            Dict with instrument info or None if not an instrument
+        """
+        if result.get('is_instrument', False) and result.get('instrument') != 'not_instrument':
+            return {
+                'instrument': result.get('instrument', 'unknown'),
+                'confidence': result.get('confidence', 0.5),
+                'is_being_played': result.get('is_being_played', False),
+                'notes': result.get('notes', '')
+            }
+        return None
 
     def classify_crop_with_openai(self, crop: np.ndarray, use_cache: bool = True) -> Optional[Dict]:
         """
@@ -201,14 +381,9 @@ class OwlViTInstrumentDetector:
         # Check cache first to avoid redundant API calls
         if use_cache:
             crop_hash = self.compute_crop_hash(crop)
-            if crop_hash in self.classification_cache:
-                self.api_calls_saved += 1
-                print(f"    💾 Using cached result (saved {self.api_calls_saved} API calls)")
-                return self.classification_cache[crop_hash].copy()
-
-        # Encode crop
-        _, buffer = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, 85])
-        crop_base64 = base64.b64encode(buffer).decode('utf-8')
+            hit, cached = self.lookup_classification(crop_hash)
+            if hit:
+                return cached
 
         prompt = """Identify the musical instrument in this image.
 
@@ -222,6 +397,7 @@ Return JSON:
 }"""
 
         try:
+            self.rate_limiter.acquire()
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
@@ -233,13 +409,7 @@ Return JSON:
                         "role": "user",
                         "content": [
                             {"type": "text", "text": prompt},
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{crop_base64}",
-                                    "detail": self.image_detail
-                                }
-                            }
+                            self.encode_crop(crop)
                         ]
                     }
                 ],
@@ -247,21 +417,12 @@ Return JSON:
                 temperature=0.1,
                 max_tokens=200
             )
+            self.record_usage(response, crops=1)
 
-            result = json.loads(response.choices[0].message.content)
-
-            classification_result = None
-            if result.get('is_instrument', False) and result.get('instrument') != 'not_instrument':
-                classification_result = {
-                    'instrument': result.get('instrument', 'unknown'),
-                    'confidence': result.get('confidence', 0.5),
-                    'is_being_played': result.get('is_being_played', False),
-                    'notes': result.get('notes', '')
-                }
+            classification_result = self.parse_classification(json.loads(response.choices[0].message.content))
 
-            # Cache the result (even if None) to avoid re-checking non-instruments
             if use_cache:
-                self.classification_cache[crop_hash] = classification_result
+                self.store_classification(crop_hash, classification_result)
 
             return classification_result
 
@@ -269,6 +430,118 @@ Return JSON:
             print(f"OpenAI classification error: {e}")
             return None
 
+    def classify_crops_with_openai(self, crops: List[np.ndarray], use_cache: bool = True) -> List[Optional[Dict]]:
+        """
+        Classify several crops with a single OpenAI Vision request
+
+        The crops are sent as numbered image parts and the model answers with one
+        JSON entry per index. Crops whose entry is missing or unparseable fall back
+        to classify_crop_with_openai(); if the request itself fails they are None.
+
+        Args:
+            crops: Cropped regions (BGR)
+            use_cache: Whether to use cached results
+
+        Returns:
+            One classification (same format as classify_crop_with_openai) or None per crop
+        """
+        results: List[Optional[Dict]] = [None] * len(crops)
+        crop_hashes = [None] * len(crops)
+        to_send = []
+
+        for idx, crop in enumerate(crops):
+            if use_cache:
+                crop_hashes[idx] = self.compute_crop_hash(crop)
+                hit, cached = self.lookup_classification(crop_hashes[idx])
+                if hit:
+                    results[idx] = cached
+                    continue
+            to_send.append(idx)
+
+        if len(to_send) == 0:
+            return results
+        if len(to_send) == 1:
+            results[to_send[0]] = self.classify_crop_with_openai(crops[to_send[0]], use_cache=use_cache)
+            return results
+
+        prompt = f"""Identify the musical instrument in each of the {len(to_send)} images below.
+Each image is preceded by its label "Image <index>".
+
+Return JSON with exactly one entry per image:
+{{
+    "results": [
+        {{
+            "index": 0,
+            "is_instrument": true/false,
+            "instrument": "violin" or "not_instrument",
+            "confidence": 0.0-1.0,
+            "is_being_played": true/false,
+            "notes": "brief description"
+        }}
+    ]
+}}"""
+
+        content = [{"type": "text", "text": prompt}]
+        for position, idx in enumerate(to_send):
+            content.append({"type": "text", "text": f"Image {position}"})
+            content.append(self.encode_crop(crops[idx]))
+
+        try:
+            self.rate_limiter.acquire()
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": "You are an expert at identifying musical instruments. Return JSON only."
+                    },
+                    {
+                        "role": "user",
+                        "content": content
+                    }
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.1,
+                max_tokens=120 * len(to_send) + 50
+            )
+        except Exception as e:
+            # Per-crop retries would most likely fail the same way
+            print(f"OpenAI batch classification error: {e}")
+            return results
+
+        answered = set()
+        try:
+            entries = json.loads(response.choices[0].message.content).get('results', [])
+            for entry in entries:
+                try:
+                    position = int(entry.get('index'))
+                except (TypeError, ValueError):
+                    continue
+                if not 0 <= position < len(to_send) or position in answered:
+                    continue
+
+                idx = to_send[position]
+                answered.add(position)
+                results[idx] = self.parse_classification(entry)
+                if use_cache:
+                    self.store_classification(crop_hashes[idx], results[idx])
+
+        except Exception as e:
+            print(f"OpenAI batch classification parse error: {e}")
+
+        # Tokens are attributed to the crops this request answered; the
+        # individual retries below record their own
+        self.record_usage(response, crops=len(answered))
+
+        # Anything the model skipped gets its own request
+        missing = [idx for position, idx in enumerate(to_send) if position not in answered]
+        if missing:
+            print(f"    ↩ {len(missing)}/{len(to_send)} crops missing from batch answer, classifying individually")
+            for idx in missing:
+                results[idx] = self.classify_crop_with_openai(crops[idx], use_cache=use_cache)
+
+        return results
+
     def detect_instruments(
         self,
         frame: np.ndarray,
@@ -288,42 +561,120 @@ Return JSON:
         """
         # Stage 1: OWL-ViT detection
         owlvit_detections = self.detect_objects_with_owlvit(frame)
-        print(f"OWL-ViT found {len(owlvit_detections)} potential instruments")
 
-        # Early exit if no instruments detected - skip OpenAI API calls
-        if len(owlvit_detections) == 0:
-            print("  ⏭ No instruments detected by OWL-ViT, skipping frame")
-            return []
+        # Stage 2: OpenAI classification
+        return self.classify_detections(frame, owlvit_detections, confidence_threshold)
 
-        final_detections = []
+    def classify_detections(
+        self,
+        frame: np.ndarray,
+        owlvit_detections: List[Dict],
+        confidence_threshold: float = 0.3
+    ) -> List[Dict]:
+        """
+        Classify OWL-ViT detections of a frame with OpenAI
 
-        # Stage 2: OpenAI classification for each detection
-        for idx, det in enumerate(owlvit_detections):
-            bbox = det['bbox']
-            x, y, w, h = bbox
+        Args:
+            frame: Input frame (BGR)
+            owlvit_detections: Detections from detect_objects_with_owlvit / detect_objects_batch
+            confidence_threshold: Minimum confidence for final detections
+
+        Returns:
+            List of detections with instrument metadata
+        """
+        outcomes = self.classify_crops_batch([frame], [owlvit_detections])[0]
+        return self.assemble_detections(outcomes, confidence_threshold)
 
-            # Extract crop
-            frame_h, frame_w = frame.shape[:2]
-            x = max(0, min(x, frame_w - 1))
-            y = max(0, min(y, frame_h - 1))
-            w = max(1, min(w, frame_w - x))
-            h = max(1, min(h, frame_h - y))
+    def extract_crop(self, frame: np.ndarray, bbox: List[int]) -> Optional[np.ndarray]:
+        """
+        Cut a detection out of the frame, clamped to the frame bounds
 
-            crop = frame[y:y+h, x:x+w].copy()
+        Args:
+            frame: Input frame (BGR)
+            bbox: [x, y, w, h]
 
-            if crop.size == 0:
-                continue
+        Returns:
+            Crop copy, or None if empty
+        """
+        x, y, w, h = bbox
+        frame_h, frame_w = frame.shape[:2]
+        x = max(0, min(x, frame_w - 1))
+        y = max(0, min(y, frame_h - 1))
+        w = max(1, min(w, frame_w - x))
+        h = max(1, min(h, frame_h - y))
+
+        crop = frame[y:y+h, x:x+w].copy()
+        return crop if crop.size > 0 else None
+
+    def classify_crops_batch(self, frames: List[np.ndarray], batch_owlvit: List[List[Dict]]) -> List[List[tuple]]:
+        """
+        Classify the OWL-ViT detections of several frames concurrently
+
+        All crops are submitted to the classification pool at once (bounded by
+        max_workers, paced by the per-key rate limiter) in requests of up to
+        crop_batch_size crops, and reassembled per frame
+
+        Args:
+            frames: Input frames (BGR)
+            batch_owlvit: OWL-ViT detections per frame
+
+        Returns:
+            Per frame, a list of (owlvit_detection, classification or None) in detection order
+        """
+        crops = []
+        for frame_pos, (frame, owlvit_detections) in enumerate(zip(frames, batch_owlvit)):
+            for det in owlvit_detections:
+                crop = self.extract_crop(frame, det['bbox'])
+                if crop is not None:
+                    crops.append((frame_pos, det, crop))
+
+        # Crops of neighbouring frames may share a request
+        groups = [crops[i:i + self.crop_batch_size] for i in range(0, len(crops), self.crop_batch_size)]
+        futures = [
+            self.classification_pool.submit(self.classify_crops_with_openai, [crop for _, _, crop in group])
+            for group in groups
+        ]
+
+        outcomes = [[] for _ in frames]
+        for group, future in zip(groups, futures):
+            try:
+                classifications = future.result()
+            except Exception as e:
+                print(f"OpenAI classification error: {e}")
+                classifications = [None] * len(group)
+            for (frame_pos, det, _), classification in zip(group, classifications):
+                outcomes[frame_pos].append((det, classification))
+
+        return outcomes
+
+    def assemble_detections(self, outcomes: List[tuple], confidence_threshold: float = 0.3) -> List[Dict]:
+        """
+        Combine OWL-ViT detections with their OpenAI classifications
+
+        Args:
+            outcomes: (owlvit_detection, classification) pairs of one frame
+            confidence_threshold: Minimum confidence for final detections
+
+        Returns:
+            List of detections with instrument metadata
+        """
+        print(f"OWL-ViT found {len(outcomes)} potential instruments")
+
+        # Early exit if no instruments detected - no OpenAI API calls were made
+        if len(outcomes) == 0:
+            print("  ⏭ No instruments detected by OWL-ViT, skipping frame")
+            return []
 
-            print(f"  Classifying detection {idx+1}/{len(owlvit_detections)} (OWL-ViT: {det['label']})...")
+        final_detections = []
 
-            # Classify with OpenAI
-            classification = self.classify_crop_with_openai(crop)
+        for idx, (det, classification) in enumerate(outcomes):
+            print(f"  Classified detection {idx+1}/{len(outcomes)} (OWL-ViT: {det['label']})...")
 
             if classification and classification['confidence'] >= confidence_threshold:
                 # Combine OWL-ViT detection with OpenAI classification
                 final_det = {
                     'instrument': classification['instrument'],
-                    'bbox': bbox,
+                    'bbox': det['bbox'],
                     'confidence': classification['confidence'],
                     'is_being_played': classification.get('is_being_played', False),
                     'notes': classification.get('notes', ''),
@@ -603,7 +954,7 @@ Return JSON:
 
     def batch_detect_with_metadata(
         self,
-        frames_data: List[Dict],
+        frames_data: Iterable[Dict],
         detect_playing: bool = True,
         confidence_threshold: float = 0.3,
         skip_similar: bool = True,
@@ -614,8 +965,14 @@ Return JSON:
         Robust batch detection with frame metadata
         Handles edge cases: empty frames, corrupted data, None values, etc.
 
+        Frames are consumed as they arrive, so frames_data can be a list or a
+        streaming source such as VideoProcessor.iter_frames(). Frames that need
+        detection are buffered and sent through OWL-ViT self.batch_size at a time,
+        then all crops of the batch are classified concurrently; results are
+        reported in frame order.
+
         Args:
-            frames_data: List of dicts with 'frame', 'frame_idx', 'timestamp'
+            frames_data: List (or iterable) of dicts with 'frame', 'frame_idx', 'timestamp'
             detect_playing: Whether to detect playing status
             confidence_threshold: Minimum confidence threshold
             skip_similar: Skip frames that are very similar to previous frame (only consecutive)
@@ -632,11 +989,78 @@ Return JSON:
         error_count = 0
 
         # Edge case: Check if frames_data is valid
-        if not frames_data or len(frames_data) == 0:
+        if frames_data is None or (isinstance(frames_data, list) and len(frames_data) == 0):
             print("⚠️ Warning: No frames provided for processing")
             return []
 
+        # Streams only know how many frames they expect
+        total_frames = len(frames_data) if isinstance(frames_data, list) else getattr(frames_data, 'expected_frames', 0)
+        frame_count = 0
+
+        # Frames waiting for the next OWL-ViT batch, plus the skipped frames between
+        # them so everything is reported in order: (idx, frame_data or None if skipped)
+        pending = []
+        pending_detect = 0
+
+        def report_progress(idx):
+            if progress_callback:
+                try:
+                    progress_callback(idx + 1, max(total_frames, idx + 1))
+                except Exception as e:
+                    print(f"⚠️ Warning: Progress callback failed: {e}")
+
+        def flush():
+            nonlocal no_instrument_count, error_count, pending_detect
+
+            batch = [frame_data['frame'] for _, frame_data in pending if frame_data is not None]
+            batch_outcomes = None
+            if batch:
+                try:
+                    # OWL-ViT for the whole batch, then every crop of the batch classified concurrently
+                    batch_owlvit = self.detect_objects_batch(batch)
+                    batch_outcomes = iter(self.classify_crops_batch(batch, batch_owlvit))
+                except Exception as e:
+                    print(f"⚠️ Error detecting instruments in {len(batch)} frames: {e}")
+
+            for idx, frame_data in pending:
+                if frame_data is None:
+                    report_progress(idx)
+                    continue
+
+                # Process frame
+                print(f"\n{'='*60}")
+                print(f"Processing frame {idx+1}/{total_frames} (Frame idx: {frame_data.get('frame_idx', idx)}, Time: {frame_data.get('timestamp', 0):.2f}s)")
+                print(f"{'='*60}")
+
+                try:
+                    if batch_outcomes is None:
+                        raise RuntimeError("detection batch failed")
+                    detections = self.assemble_detections(
+                        next(batch_outcomes),
+                        confidence_threshold=confidence_threshold
+                    )
+                except Exception as e:
+                    print(f"⚠️ Error detecting instruments in frame {idx+1}: {e}")
+                    detections = []
+                    error_count += 1
+
+                # Track frames with no instruments
+                if len(detections) == 0:
+                    no_instrument_count += 1
+
+                # Add metadata to each detection
+                for det in detections:
+                    det['frame_idx'] = frame_data.get('frame_idx', idx)
+                    det['timestamp'] = frame_data.get('timestamp', 0)
+
+                all_detections.extend(detections)
+                report_progress(idx)
+
+            pending.clear()
+            pending_detect = 0
+
         for idx, frame_data in enumerate(frames_data):
+            frame_count += 1
             try:
                 # Edge case: Validate frame_data structure
                 if not isinstance(frame_data, dict):
@@ -674,58 +1098,43 @@ Return JSON:
                         should_skip = False
 
                 if should_skip:
-                    print(f"⏩ Skipping similar frame {idx+1}/{len(frames_data)} (Time: {frame_data.get('timestamp', 0):.2f}s)")
+                    print(f"⏩ Skipping similar frame {idx+1}/{total_frames} (Time: {frame_data.get('timestamp', 0):.2f}s)")
+                    if pending:
+                        pending.append((idx, None))
+                    else:
+                        report_progress(idx)
                 else:
-                    # Process frame
-                    print(f"\n{'='*60}")
-                    print(f"Processing frame {idx+1}/{len(frames_data)} (Frame idx: {frame_data.get('frame_idx', idx)}, Time: {frame_data.get('timestamp', 0):.2f}s)")
-                    print(f"{'='*60}")
-
-                    try:
-                        detections = self.detect_instruments(
-                            frame,
-                            detect_playing=detect_playing,
-                            confidence_threshold=confidence_threshold
-                        )
-                    except Exception as e:
-                        print(f"⚠️ Error detecting instruments in frame {idx+1}: {e}")
-                        detections = []
-                        error_count += 1
-
-                    # Track frames with no instruments
-                    if len(detections) == 0:
-                        no_instrument_count += 1
-
-                    # Add metadata to each detection
-                    for det in detections:
-                        det['frame_idx'] = frame_data.get('frame_idx', idx)
-                        det['timestamp'] = frame_data.get('timestamp', 0)
-
-                    all_detections.extend(detections)
+                    pending.append((idx, frame_data))
+                    pending_detect += 1
                     prev_frame = frame.copy()
 
-                if progress_callback:
-                    try:
-                        progress_callback(idx + 1, len(frames_data))
-                    except Exception as e:
-                        print(f"⚠️ Warning: Progress callback failed: {e}")
+                    if pending_detect >= self.batch_size:
+                        flush()
 
             except Exception as e:
                 print(f"⚠️ Error processing frame {idx+1}: {e}")
                 error_count += 1
                 continue
 
+        flush()
+
         print(f"\n{'='*60}")
         print(f"PROCESSING SUMMARY")
         print(f"{'='*60}")
-        print(f"✓ Total frames: {len(frames_data)}")
-        print(f"✓ Processed: {len(frames_data) - skipped_count - error_count}")
+        print(f"✓ Total frames: {frame_count}")
+        print(f"✓ Processed: {frame_count - skipped_count - error_count}")
         print(f"✓ Skipped (similar): {skipped_count}")
         print(f"✓ Skipped (no instruments): {no_instrument_count}")
-        print(f"✓ Frames with detections: {len(frames_data) - skipped_count - no_instrument_count - error_count}")
+        print(f"✓ Frames with detections: {frame_count - skipped_count - no_instrument_count - error_count}")
         if error_count > 0:
             print(f"⚠️ Errors encountered: {error_count}")
         print(f"💾 Saved {self.api_calls_saved} OpenAI API calls via caching")
+        cache_lookups = self.api_calls_saved + self.usage['crops']
+        if cache_lookups > 0:
+            print(f"💾 Classification cache hit rate: {self.api_calls_saved / cache_lookups:.1%} (shared cache: {self.classification_cache.stats()['hit_rate']:.1%})")
+        if self.usage['crops'] > 0:
+            tokens = self.usage['prompt_tokens'] + self.usage['completion_tokens']
+            print(f"🧾 OpenAI: {self.usage['requests']} requests for {self.usage['crops']} crops, {tokens / self.usage['crops']:.0f} tokens/crop")
         print(f"💰 Cost savings: ~${self.api_calls_saved * 0.01:.2f} (estimated)")
         print(f"{'='*60}\n")
         return all_detections
@@ -0,0 +1,211 @@
+"""
+Parallel segment-wise frame sampling
+Splits the video timeline into segments decoded by separate worker processes
+
+Segments are decoded into shared memory at most one per worker ahead of the consumer
+and released as soon as their frames have been yielded, so /dev/shm use is bounded by
+PARALLEL_SAMPLER_SHM_MB rather than by the video length.
+"""
+
+import os
+import cv2
+import numpy as np
+from collections import deque
+from typing import List, Dict, Iterator, Optional
+from multiprocessing import get_context, shared_memory
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.video_processor import VideoProcessor, FrameStream, FRAME_PREFETCH
+
+# Segments shorter than this many kept frames are not worth a process of their own
+MIN_FRAMES_PER_SEGMENT = 8
+
+# Shared memory for all segments in flight (Docker's default /dev/shm is 64 MB)
+PARALLEL_SAMPLER_SHM_MB = int(os.getenv('PARALLEL_SAMPLER_SHM_MB', 48))
+
+
+def _frame_shape(width: int, height: int, max_dimension: int) -> tuple:
+    """Shape of a frame after VideoProcessor.resize_frame()"""
+    if max_dimension <= 0 or max(height, width) <= max_dimension:
+        return (height, width, 3)
+    if height > width:
+        return (max_dimension, int(width * (max_dimension / height)), 3)
+    return (int(height * (max_dimension / width)), max_dimension, 3)
+
+
+def _sample_segment(video_path: str, frame_indices: List[int], frame_interval: int,
+                    max_dimension: int, shm_name: str, frame_shape: tuple) -> List[int]:
+    """
+    Worker: decode the kept frames of one segment into a shared memory buffer
+
+    Each process opens its own VideoCapture, seeks to the segment start and writes
+    frame k of the segment to slot k of the buffer, so no array is pickled back.
+
+    Returns:
+        frame_idx of every slot written, in order
+    """
+    processor = VideoProcessor()
+    cap = cv2.VideoCapture(video_path)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    written = []
+
+    try:
+        if not cap.isOpened():
+            raise ValueError(f"Could not open video: {video_path}")
+
+        original_fps = cap.get(cv2.CAP_PROP_FPS)
+        slots = np.ndarray((len(frame_indices),) + frame_shape, dtype=np.uint8, buffer=shm.buf)
+
+        frames = processor._iter_seek(
+            cap,
+            original_fps,
+            frame_interval,
+            frame_indices[-1] + 1,
+            start_frame=frame_indices[0]
+        )
+        for slot, (frame_idx, frame) in enumerate(frames):
+            if max_dimension > 0:
+                frame = processor.resize_frame(frame, max_dimension)
+            if frame.shape != frame_shape:
+                frame = cv2.resize(frame, (frame_shape[1], frame_shape[0]), interpolation=cv2.INTER_AREA)
+            slots[slot] = frame
+            written.append(frame_idx)
+
+        del slots
+    finally:
+        cap.release()
+        shm.close()
+
+    return written
+
+
+class ParallelFrameSampler:
+    """Samples frames like VideoProcessor.iter_frames() using several processes"""
+
+    def __init__(self, max_workers: Optional[int] = None, shm_budget_mb: int = PARALLEL_SAMPLER_SHM_MB):
+        """
+        Args:
+            max_workers: Number of worker processes (default and maximum: CPU count)
+            shm_budget_mb: Shared memory for the segments in flight
+        """
+        cpu_count = os.cpu_count() or 1
+        self.max_workers = max(1, min(max_workers or cpu_count, cpu_count))
+        self.shm_budget_mb = shm_budget_mb
+        self.video_processor = VideoProcessor()
+
+    def plan_segments(self, total_frames: int, frame_interval: int,
+                      frame_bytes: int = 0) -> List[List[int]]:
+        """
+        Split the kept frame indices into contiguous segments
+
+        Segments are spread over the workers, but no longer than what fits in a
+        worker's share of the shared memory budget (at least one frame).
+        """
+        kept = list(range(0, total_frames, frame_interval))
+        if not kept:
+            return []
+
+        count = max(1, min(self.max_workers, len(kept) // MIN_FRAMES_PER_SEGMENT))
+        size = -(-len(kept) // count)
+        if frame_bytes > 0:
+            per_worker = self.shm_budget_mb * 1024 * 1024 // count
+            size = max(1, min(size, per_worker // frame_bytes))
+        return [kept[i:i + size] for i in range(0, len(kept), size)]
+
+    def generate_frames(self, video_path: str, target_fps: float = 3,
+                        max_dimension: int = 1280) -> Iterator[Dict]:
+        """
+        Generator behind iter_frames() / sample_frames()
+
+        Yields:
+            Dicts with 'frame', 'frame_idx', 'timestamp', 'frame_shape' in timestamp order
+        """
+        info = self.video_processor.get_video_info(video_path)
+        original_fps = info['fps']
+
+        if original_fps == 0:
+            raise ValueError("Could not determine video FPS")
+
+        frame_interval = max(1, int(original_fps / target_fps))
+        frame_shape = _frame_shape(info['width'], info['height'], max_dimension)
+        frame_bytes = int(np.prod(frame_shape))
+        segments = deque(self.plan_segments(info['frame_count'], frame_interval, frame_bytes))
+        if not segments:
+            return
+
+        workers = min(self.max_workers, len(segments))
+        # (shared memory, future) per submitted segment, oldest first
+        in_flight = deque()
+
+        # spawn: forking a process that runs Flask/detector threads is unsafe
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'))
+        try:
+            while segments or in_flight:
+                # Keep one segment per worker decoding ahead of the consumer
+                while segments and len(in_flight) < workers:
+                    segment = segments.popleft()
+                    shm = shared_memory.SharedMemory(create=True, size=max(1, len(segment) * frame_bytes))
+                    in_flight.append((shm, executor.submit(
+                        _sample_segment,
+                        video_path,
+                        segment,
+                        frame_interval,
+                        max_dimension,
+                        shm.name,
+                        frame_shape
+                    )))
+
+                shm, future = in_flight[0]
+                written = future.result()
+                slots = np.ndarray((len(written),) + frame_shape, dtype=np.uint8, buffer=shm.buf)
+                try:
+                    for slot, frame_idx in enumerate(written):
+                        frame = slots[slot].copy()
+                        yield {
+                            'frame': frame,
+                            'frame_idx': frame_idx,
+                            'timestamp': frame_idx / original_fps,
+                            'frame_shape': frame.shape
+                        }
+                finally:
+                    del slots
+
+                in_flight.popleft()
+                shm.close()
+                shm.unlink()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            for shm, _ in in_flight:
+                shm.close()
+                shm.unlink()
+
+    def iter_frames(self, video_path: str, target_fps: float = 3, max_dimension: int = 1280,
+                    prefetch: int = FRAME_PREFETCH) -> FrameStream:
+        """
+        Stream sampled frames, decoding segments in parallel
+
+        Args:
+            video_path: Path to video file
+            target_fps: Frames per second to sample
+            max_dimension: Maximum width or height (0 = no resize)
+            prefetch: Number of decoded frames buffered ahead of the consumer
+
+        Returns:
+            FrameStream yielding the same dicts as VideoProcessor.iter_frames(), ordered by timestamp
+        """
+        return FrameStream(
+            self.generate_frames(video_path, target_fps, max_dimension),
+            prefetch=prefetch,
+            expected_frames=self.video_processor.expected_frame_count(video_path, target_fps)
+        )
+
+    def sample_frames(self, video_path: str, target_fps: float = 3, max_dimension: int = 1280) -> List[Dict]:
+        """
+        Sample frames at target FPS with optional resizing, decoding segments in parallel
+
+        Every sampled frame is kept in memory; use iter_frames() for long videos.
+
+        Returns:
+            Same list of dicts as VideoProcessor.sample_frames(), ordered by timestamp
+        """
+        return list(self.generate_frames(video_path, target_fps, max_dimension))
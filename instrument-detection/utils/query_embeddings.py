@@ -0,0 +1,135 @@
+"""
+OWL-ViT Text Query Embedding Cache
+Keeps text-tower outputs for a query list so detectors only run the vision tower
+"""
+
+import os
+import json
+import hashlib
+import threading
+import torch
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Directory for persisted embeddings (unset = memory only)
+QUERY_CACHE_DIR = os.getenv('OWLVIT_QUERY_CACHE_DIR')
+
+
+def query_cache_key(model_name: str, queries: List[str]) -> str:
+    """
+    Cache key for a model + ordered query list
+
+    Args:
+        model_name: Hugging Face model id
+        queries: Text queries (order matters, labels index into it)
+
+    Returns:
+        Hex digest
+    """
+    payload = json.dumps([model_name, list(queries)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class QueryEmbeddingCache:
+    """
+    Process-wide cache of (query_embeds, query_mask) per model + query list,
+    optionally persisted to disk so restarts skip the text tower as well
+    """
+
+    def __init__(self, cache_dir: Optional[str] = QUERY_CACHE_DIR):
+        """
+        Args:
+            cache_dir: Directory for .pt files (None = memory only)
+        """
+        self.cache_dir = cache_dir
+        self._entries: Dict[str, Tuple[torch.Tensor, torch.Tensor]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f"owlvit_queries_{key}.pt")
+
+    def _load(self, key: str, queries: List[str]) -> Optional[Tuple[torch.Tensor, torch.Tensor]]:
+        path = self._path(key)
+        if path is None or not os.path.exists(path):
+            return None
+
+        try:
+            data = torch.load(path, map_location='cpu')
+            if data.get('queries') != list(queries):
+                return None
+            return data['query_embeds'], data['query_mask']
+        except Exception as e:
+            print(f"⚠️ Warning: Could not load query embeddings from {path}: {e}")
+            return None
+
+    def _save(self, key: str, model_name: str, queries: List[str], entry: Tuple[torch.Tensor, torch.Tensor]):
+        path = self._path(key)
+        if path is None:
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            torch.save({
+                'model': model_name,
+                'queries': list(queries),
+                'query_embeds': entry[0].detach().cpu(),
+                'query_mask': entry[1].detach().cpu()
+            }, tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ Warning: Could not save query embeddings to {path}: {e}")
+
+    def get(
+        self,
+        model_name: str,
+        queries: List[str],
+        compute: Callable[[], Tuple[torch.Tensor, torch.Tensor]],
+        device: str = "cpu"
+    ) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Get cached embeddings, computing them on first use
+
+        Args:
+            model_name: Hugging Face model id
+            queries: Text queries
+            compute: Returns (query_embeds, query_mask) when nothing is cached
+            device: Device the tensors are returned on
+
+        Returns:
+            Tuple of (query_embeds [1, Q, D], query_mask [1, Q])
+        """
+        key = query_cache_key(model_name, queries)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+            else:
+                entry = self._load(key, queries)
+                if entry is not None:
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+                    entry = compute()
+                    self._save(key, model_name, queries, entry)
+                self._entries[key] = entry
+
+        return entry[0].to(device), entry[1].to(device)
+
+    def stats(self) -> Dict:
+        """Cache counters"""
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses
+        }
+
+
+# Shared by every detector in the process
+query_embedding_cache = QueryEmbeddingCache()
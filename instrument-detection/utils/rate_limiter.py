@@ -0,0 +1,74 @@
+"""
+OpenAI request rate limiting
+Spaces out request starts per API key, shared by all jobs and threads in the process
+"""
+
+import os
+import time
+import hashlib
+import threading
+from typing import Dict
+
+# Requests per minute allowed per API key (0 = unlimited)
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', 500))
+
+
+class RateLimiter:
+    """Lets request starts through at most requests_per_minute, evenly spaced"""
+
+    def __init__(self, requests_per_minute: int):
+        """
+        Args:
+            requests_per_minute: Allowed request starts per minute (0 = unlimited)
+        """
+        self.requests_per_minute = requests_per_minute
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.waited_seconds = 0.0
+
+    def acquire(self) -> float:
+        """
+        Block until the caller may start a request
+
+        Returns:
+            Seconds waited
+        """
+        with self._lock:
+            self.requests += 1
+            if not self.interval:
+                return 0.0
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+            wait = slot - now
+            self.waited_seconds += wait
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_key: str, requests_per_minute: int = OPENAI_REQUESTS_PER_MINUTE) -> RateLimiter:
+    """
+    Shared limiter for an API key (the key itself is only kept as a hash)
+
+    Args:
+        api_key: OpenAI API key
+        requests_per_minute: Limit used when the key is seen for the first time
+
+    Returns:
+        RateLimiter
+    """
+    key = hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = RateLimiter(requests_per_minute)
+            _limiters[key] = limiter
+        return limiter
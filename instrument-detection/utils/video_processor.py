@@ -5,21 +5,51 @@ Extracts frames from video at specified FPS
 
 import cv2
 import numpy as np
-from typing import List, Dict
+from typing import List, Dict, Iterator, Tuple
 import base64
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+
+# Sampling modes for sample_frames():
+#   read    decode and convert every frame, keep one per interval (original behaviour)
+#   grab    cap.grab() skipped frames (no colour conversion/copy), retrieve() kept ones
+#   seek    jump to each kept frame with CAP_PROP_POS_MSEC; only the frames from the
+#           preceding keyframe are decoded, so cost follows the number of kept frames
+#   ffmpeg  decode in an ffmpeg subprocess (threaded) that selects and scales the
+#           kept frames itself and pipes raw BGR
+#   auto    seek for sparse sampling, grab otherwise
+SAMPLING_MODES = ('read', 'grab', 'seek', 'ffmpeg', 'auto')
+
+# Frame interval from which 'auto' seeks instead of grabbing: seeking decodes up to a
+# GOP per kept frame, typical broadcast/web GOPs are 1-5 s
+SEEK_MIN_INTERVAL = 60
+
+# In 'seek' mode, gaps shorter than this are grabbed through rather than seeked over
+SEEK_MIN_GAP = 30
+
+# Frames decoded ahead of the consumer by iter_frames()
+FRAME_PREFETCH = 8
 
 
 class VideoProcessor:
     """Handles video frame extraction and preprocessing"""
 
-    def sample_frames(self, video_path: str, target_fps: int = 3, max_dimension: int = 1280) -> List[Dict]:
+    def sample_frames(self, video_path: str, target_fps: int = 3, max_dimension: int = 1280,
+                      mode: str = 'auto') -> List[Dict]:
         """
         Sample frames from video at target FPS with optional resizing
 
+        Every sampled frame is kept in memory; use iter_frames() for long videos.
+
         Args:
             video_path: Path to video file
             target_fps: Frames per second to sample
             max_dimension: Maximum width or height (0 = no resize)
+            mode: Sampling mode, one of SAMPLING_MODES. Every mode returns the same
+                frame_idx/timestamp values (frame_idx is a multiple of the interval)
 
         Returns:
             List of dicts containing frame data:
@@ -30,6 +60,55 @@ class VideoProcessor:
                 'frame_shape': tuple
             }
         """
+        return list(self.generate_frames(video_path, target_fps, max_dimension, mode))
+
+    def iter_frames(self, video_path: str, target_fps: int = 3, max_dimension: int = 1280,
+                    mode: str = 'auto', prefetch: int = FRAME_PREFETCH) -> 'FrameStream':
+        """
+        Stream sampled frames instead of materializing them
+
+        Frames are decoded in a background thread at most `prefetch` frames ahead of
+        the consumer. Only the per-frame metadata is retained (FrameStream.metadata),
+        so memory stays bounded by the lookahead window instead of the video length.
+
+        Args:
+            video_path: Path to video file
+            target_fps: Frames per second to sample
+            max_dimension: Maximum width or height (0 = no resize)
+            mode: Sampling mode, one of SAMPLING_MODES
+            prefetch: Number of decoded frames buffered ahead of the consumer
+
+        Returns:
+            FrameStream yielding the same dicts as sample_frames()
+        """
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {mode} (expected one of {', '.join(SAMPLING_MODES)})")
+
+        return FrameStream(
+            self.generate_frames(video_path, target_fps, max_dimension, mode),
+            prefetch=prefetch,
+            expected_frames=self.expected_frame_count(video_path, target_fps)
+        )
+
+    def expected_frame_count(self, video_path: str, target_fps: float) -> int:
+        """Number of frames sampling at target_fps should produce (from the container frame count)"""
+        info = self.get_video_info(video_path)
+        if not info['fps']:
+            return 0
+        frame_interval = max(1, int(info['fps'] / target_fps))
+        return -(-info['frame_count'] // frame_interval)
+
+    def generate_frames(self, video_path: str, target_fps: int = 3, max_dimension: int = 1280,
+                        mode: str = 'auto') -> Iterator[Dict]:
+        """
+        Generator behind sample_frames() / iter_frames(), decodes in the calling thread
+
+        Yields:
+            Dicts with 'frame', 'frame_idx', 'timestamp', 'frame_shape'
+        """
+        if mode not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode: {mode} (expected one of {', '.join(SAMPLING_MODES)})")
+
         cap = cv2.VideoCapture(video_path)
 
         if not cap.isOpened():
@@ -40,40 +119,134 @@ class VideoProcessor:
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
 
         if original_fps == 0:
+            cap.release()
             raise ValueError("Could not determine video FPS")
 
         # Calculate frame interval
         frame_interval = max(1, int(original_fps / target_fps))
 
-        frames_data = []
+        if mode == 'auto':
+            mode = 'seek' if frame_interval >= SEEK_MIN_INTERVAL and total_frames > 0 else 'grab'
+        if mode == 'ffmpeg' and shutil.which('ffmpeg') is None:
+            print("⚠️ Warning: ffmpeg not found, sampling with cap.grab() instead")
+            mode = 'grab'
+
+        try:
+            if mode == 'ffmpeg':
+                cap.release()
+                frames = self._iter_ffmpeg(video_path, frame_interval, max_dimension)
+            elif mode == 'seek':
+                frames = self._iter_seek(cap, original_fps, frame_interval, total_frames)
+            else:
+                frames = self._iter_sequential(cap, frame_interval, grab=(mode == 'grab'))
+
+            for frame_idx, frame in frames:
+                timestamp = frame_idx / original_fps
+
+                # Resize if needed (ffmpeg frames are already scaled)
+                if max_dimension > 0:
+                    frame = self.resize_frame(frame, max_dimension)
+
+                yield {
+                    'frame': frame,
+                    'frame_idx': frame_idx,
+                    'timestamp': timestamp,
+                    'frame_shape': frame.shape
+                }
+        finally:
+            cap.release()
+
+    def _iter_sequential(self, cap, frame_interval: int, grab: bool) -> Iterator[Tuple[int, np.ndarray]]:
+        """Walk every frame; with grab=True skipped frames are only demuxed/decoded, not converted"""
         frame_idx = 0
 
         while True:
-            ret, frame = cap.read()
+            if frame_idx % frame_interval == 0 or not grab:
+                ret, frame = cap.read()
+            else:
+                ret, frame = cap.grab(), None
 
             if not ret:
                 break
 
             # Sample frame based on interval
             if frame_idx % frame_interval == 0:
-                timestamp = frame_idx / original_fps
+                yield frame_idx, frame
 
-                # Resize if needed
-                if max_dimension > 0:
-                    frame = self.resize_frame(frame, max_dimension)
+            frame_idx += 1
 
-                frames_data.append({
-                    'frame': frame,
-                    'frame_idx': frame_idx,
-                    'timestamp': timestamp,
-                    'frame_shape': frame.shape
-                })
+    def _iter_seek(self, cap, original_fps: float, frame_interval: int,
+                   total_frames: int, start_frame: int = 0) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Seek to every kept frame instead of decoding the ones in between
 
-            frame_idx += 1
+        Yields the kept frames in [start_frame, total_frames); start_frame must be a
+        multiple of frame_interval and cap positioned at frame 0
+        """
+        position = 0  # index of the next frame cap.read() returns
 
-        cap.release()
+        for frame_idx in range(start_frame, total_frames, frame_interval):
+            # Close targets are cheaper to reach by grabbing than by a keyframe seek
+            if frame_idx - position >= SEEK_MIN_GAP:
+                cap.set(cv2.CAP_PROP_POS_MSEC, frame_idx / original_fps * 1000)
+            else:
+                while position < frame_idx and cap.grab():
+                    position += 1
 
-        return frames_data
+            ret, frame = cap.read()
+            if not ret:
+                break
+            position = frame_idx + 1
+
+            yield frame_idx, frame
+
+    def _iter_ffmpeg(self, video_path: str, frame_interval: int,
+                     max_dimension: int) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Let ffmpeg pick (select filter) and scale the kept frames, read raw BGR from its stdout
+
+        Scaled dimensions are rounded down to even values (required by ffmpeg's scaler),
+        so frame_shape can be a pixel smaller than with the OpenCV modes. Raises
+        RuntimeError with ffmpeg's error output if it fails before producing a frame.
+        """
+        info = self.get_video_info(video_path)
+        width, height = info['width'], info['height']
+        if max_dimension > 0 and max(width, height) > max_dimension:
+            scale = max_dimension / max(width, height)
+            width, height = int(width * scale), int(height * scale)
+        width -= width % 2
+        height -= height % 2
+
+        cmd = [
+            'ffmpeg', '-v', 'error', '-i', video_path, '-an',
+            '-vf', f"select='not(mod(n\\,{frame_interval}))',scale={width}:{height}:flags=area",
+            '-vsync', '0', '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1',
+        ]
+        # stderr goes to a file: a pipe nobody reads could fill up and stall ffmpeg
+        stderr = tempfile.TemporaryFile()
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr)
+        frame_bytes = width * height * 3
+        try:
+            kept = 0
+            while True:
+                buffer = proc.stdout.read(frame_bytes)
+                if len(buffer) < frame_bytes:
+                    break
+                yield kept * frame_interval, np.frombuffer(buffer, dtype=np.uint8).reshape(height, width, 3).copy()
+                kept += 1
+
+            returncode = proc.wait()
+            if returncode != 0:
+                stderr.seek(0)
+                message = stderr.read()[-2000:].decode('utf-8', errors='ignore').strip()
+                if kept == 0:
+                    raise RuntimeError(f"ffmpeg failed on {video_path} (exit {returncode}): {message}")
+                print(f"⚠️ Warning: ffmpeg exited with {returncode} after {kept} frames: {message}")
+        finally:
+            proc.kill()
+            proc.stdout.close()
+            proc.wait()
+            stderr.close()
 
     def encode_frame_to_base64(self, frame: np.ndarray, quality: int = 85) -> str:
         """
@@ -152,3 +325,72 @@ class VideoProcessor:
         resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_AREA)
 
         return resized
+
+
+class FrameStream:
+    """
+    Iterable over sampled frames decoded in a background thread
+
+    The decoder runs at most `prefetch` frames ahead of the consumer. Frames are not
+    kept after they have been yielded; `metadata` accumulates the frame_idx,
+    timestamp and frame_shape of every yielded frame, which is all the tracker needs.
+    A stream can be iterated once.
+    """
+
+    _END = object()
+
+    def __init__(self, frames: Iterator[Dict], prefetch: int = FRAME_PREFETCH, expected_frames: int = 0):
+        self.expected_frames = expected_frames
+        self.metadata: List[Dict] = []
+        self._frames = frames
+        self._queue = queue.Queue(maxsize=max(1, prefetch))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _produce(self):
+        try:
+            for frame_data in self._frames:
+                if not self._put(frame_data):
+                    return
+            self._put(self._END)
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._frames.close()
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        if self._thread is not None:
+            raise RuntimeError("FrameStream can only be iterated once")
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+        try:
+            while True:
+                item = self._queue.get()
+                if item is self._END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                self.metadata.append({
+                    'frame_idx': item['frame_idx'],
+                    'timestamp': item['timestamp'],
+                    'frame_shape': item['frame_shape']
+                })
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop the decoder thread (e.g. when the consumer gives up early)"""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()